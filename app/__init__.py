@@ -0,0 +1,8 @@
+# Imported before anything else in the app, so the startup report's clock
+# (and the optional import profiler) cover every module the worker loads
+import os
+
+from app.startup import startup_report
+
+if os.environ.get("STARTUP_PROFILE_IMPORTS") in ("1", "true", "True"):
+    startup_report.profile_imports()
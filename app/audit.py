@@ -0,0 +1,206 @@
+"""Audit trail of authentication events.
+
+Routes call ``audit_log.record(...)``, which only appends to an in-memory
+buffer; a background task writes everything pending in one batch per
+flush to the configured sink (the ``auth_events`` table or a JSONL file).
+The buffer is bounded: when the sink falls behind, new events are dropped
+and counted rather than slowing down logins or growing without limit.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import orjson
+from sqlalchemy import insert, text
+from app.auth.rate_limit import client_ip
+from app.database import AsyncSessionLocal
+from app.metrics import registry, timed
+from app.models import AuthEvent
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Serialises partition maintenance across workers (see app/migrations)
+_PARTITION_LOCK_KEY = 0x61756474
+
+DROPPED = registry.counter("audit_events_dropped_total", "Audit events lost, by reason", ("reason",))
+
+
+class AuditSink:
+    """Destination for batches of audit events"""
+
+    async def write(self, events: list):
+        raise NotImplementedError
+
+
+class DatabaseAuditSink(AuditSink):
+    """Batched INSERTs into auth_events. On PostgreSQL the sink keeps daily
+    partitions for today and tomorrow in place and drops those older than
+    ``retention_days``; elsewhere expired rows are deleted once a day."""
+
+    def __init__(self, session_factory, retention_days: int = 90):
+        self.session_factory = session_factory
+        self.retention_days = retention_days
+        self._maintained_on = None
+
+    async def _maintain(self, db, today):
+        if db.bind.dialect.name == "postgresql":
+            # Workers start each day's maintenance together, and concurrent
+            # CREATE TABLE IF NOT EXISTS ... PARTITION OF can still fail
+            await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PARTITION_LOCK_KEY})
+            for day in (today, today + timedelta(days=1)):
+                await db.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS auth_events_{day:%Y%m%d} PARTITION OF auth_events "
+                    f"FOR VALUES FROM ('{day.isoformat()} 00:00+00') TO ('{day + timedelta(days=1)} 00:00+00')"
+                ))
+            if self.retention_days:
+                cutoff = f"auth_events_{today - timedelta(days=self.retention_days):%Y%m%d}"
+                partitions = await db.scalars(text(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'auth_events'"
+                ))
+                for name in partitions.all():
+                    if name < cutoff:
+                        await db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        elif self.retention_days:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+            await db.execute(AuthEvent.__table__.delete().where(AuthEvent.created_at < cutoff))
+
+    async def write(self, events: list):
+        today = datetime.now(timezone.utc).date()
+        async with self.session_factory() as db:
+            if self._maintained_on != today:
+                await self._maintain(db, today)
+                self._maintained_on = today
+            await db.execute(insert(AuthEvent.__table__), events)
+            await db.commit()
+
+
+class JsonlAuditSink(AuditSink):
+    """Appends one JSON object per line to ``path`` (rotate it with logrotate)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _append(self, data: bytes):
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+    async def write(self, events: list):
+        data = b"".join(orjson.dumps(event) + b"\n" for event in events)
+        await asyncio.get_running_loop().run_in_executor(None, self._append, data)
+
+
+class AuditLog:
+    def __init__(self, sink: Optional[AuditSink], queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0):
+        self.sink = sink
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._wakeup = None
+        self._task = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+
+    def record(self, event: str, request=None, email: str = None, **detail):
+        """Queue an event; never blocks and never raises into the caller"""
+        if self.sink is None:
+            return
+        if len(self._pending) >= self.queue_size:
+            self.dropped += 1
+            DROPPED.labels("queue_full").inc()
+            return
+        self._pending.append({
+            "id": uuid.uuid4().hex,
+            "created_at": datetime.now(timezone.utc),
+            "event": event,
+            "email": email,
+            "ip": client_ip(request) if request is not None else None,
+            "user_agent": request.headers.get("user-agent") if request is not None else None,
+            "detail": orjson.dumps(detail).decode() if detail else None,
+        })
+        self.recorded += 1
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def flush(self):
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            try:
+                with timed("audit_flush"):
+                    await self.sink.write(batch)
+            except Exception as e:
+                # Not retried: a failing sink must not hold memory or block later events
+                self.dropped += len(batch)
+                DROPPED.labels("write_failed").inc(len(batch))
+                logger.warning(f"Dropped {len(batch)} audit events: {str(e)}")
+                continue
+            self.written += len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None and self.sink is not None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        if self.sink is not None:
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "sink": type(self.sink).__name__ if self.sink is not None else None,
+            "pending": self.pending,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+AUDIT_SINKS = ("database", "jsonl", "off")
+
+
+def _sink() -> Optional[AuditSink]:
+    if settings.AUDIT_SINK == "database":
+        return DatabaseAuditSink(AsyncSessionLocal, retention_days=settings.AUDIT_RETENTION_DAYS)
+    if settings.AUDIT_SINK == "jsonl":
+        return JsonlAuditSink(settings.AUDIT_JSONL_PATH)
+    if settings.AUDIT_SINK == "off":
+        return None
+    # A typo must not quietly turn auditing off
+    raise ValueError(f"AUDIT_SINK must be one of {', '.join(AUDIT_SINKS)}, not {settings.AUDIT_SINK!r}")
+
+
+audit_log = AuditLog(
+    _sink(),
+    queue_size=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+)
+
+registry.callback("audit_events_pending", "Audit events waiting for the next batch write", lambda: audit_log.pending)
+registry.callback("audit_events_written_total", "Audit events persisted", lambda: audit_log.written, type="counter")
@@ -1,20 +1,96 @@
+import re
+import time
 from config import settings
 
+# Characters allowed in a cookie value without quoting (RFC 6265 cookie-octet);
+# JWTs and state tokens only ever use these
+_COOKIE_VALUE = re.compile(r"[!#-+\--:<-\[\]-~]*\Z")
+
+
+class CookiePolicy:
+    """Set-Cookie attributes compiled once from the cookie settings.
+
+    Everything after ``name=value`` is formatted up front, and deletions are
+    complete header values, so setting a cookie is a concatenation plus an
+    append to the response's raw headers. Deletions carry the same Domain
+    and Path as the cookies they remove; browsers ignore them otherwise.
+    """
+
+    def __init__(self, domain: str, secure: bool, refresh_max_age: int, state_max_age: int = 300):
+        is_local = domain in (None, "", "localhost", "127.0.0.1")
+        attributes = "; HttpOnly; Path=/; SameSite=lax"
+        if not is_local:
+            attributes += f"; Domain={domain}"
+            if secure:
+                attributes += "; Secure"
+        self._attributes = attributes
+        self.refresh_max_age = refresh_max_age
+        self.state_max_age = state_max_age
+        self._deletions = {}
+        self._expires_second = None
+        self._expires = {}  # max_age -> Expires attribute for the current second
+
+    def _expiry(self, max_age: int) -> str:
+        # Expires (for old clients) is formatted at most once per second per max_age
+        now = int(time.time())
+        if now != self._expires_second:
+            self._expires_second = now
+            self._expires = {}
+        expiry = self._expires.get(max_age)
+        if expiry is None:
+            expires = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(now + max_age))
+            expiry = self._expires[max_age] = f"; Max-Age={max_age}; Expires={expires}"
+        return expiry
+
+    def header(self, name: str, value: str, max_age: int = None) -> bytes:
+        """Set-Cookie value; a session cookie unless ``max_age`` (seconds) is given"""
+        if not _COOKIE_VALUE.match(value):
+            raise ValueError(f"Cookie {name} value needs quoting")
+        expiry = self._expiry(max_age) if max_age else ""
+        return f"{name}={value}{expiry}{self._attributes}".encode("latin-1")
+
+    def deletion(self, name: str) -> bytes:
+        header = self._deletions.get(name)
+        if header is None:
+            header = self._deletions[name] = (
+                f'{name}=""; Max-Age=0; Expires=Thu, 01 Jan 1970 00:00:00 GMT{self._attributes}'
+            ).encode("latin-1")
+        return header
+
+    @staticmethod
+    def _append(response, header: bytes):
+        response.raw_headers.append((b"set-cookie", header))
+
+    def set(self, response, name: str, value: str, max_age: int = None):
+        self._append(response, self.header(name, value, max_age))
+
+    def set_access(self, response, token: str):
+        self._append(response, self.header("access_token", token))
+
+    def set_refresh(self, response, token: str):
+        self._append(response, self.header("refresh_token", token, self.refresh_max_age))
+
+    def set_state(self, response, state: str):
+        self._append(response, self.header("oauth_state", state, self.state_max_age))
+
+    def delete(self, response, *names: str):
+        for name in names:
+            self._append(response, self.deletion(name))
+
+
+_policy = None
+_policy_key = None
+
+def cookie_policy() -> CookiePolicy:
+    """The policy for the current settings, recompiled only if they change"""
+    global _policy, _policy_key
+    key = (settings.COOKIE_DOMAIN, settings.COOKIE_SECURE, settings.JWT_REFRESH_EXPIRE_DAYS, settings.OAUTH_STATE_MAX_AGE)
+    if key != _policy_key:
+        domain, secure, refresh_days, state_max_age = key
+        _policy = CookiePolicy(domain, secure.lower() == "true", refresh_max_age=refresh_days * 86400,
+                               state_max_age=state_max_age)
+        _policy_key = key
+    return _policy
+
 def set_cookie(response, key, value, expires_minutes=None):
-    domain = settings.COOKIE_DOMAIN
-    secure = settings.COOKIE_SECURE.lower() == "true"
-    is_local = domain in (None, "", "localhost", "127.0.0.1")
-    GLOBAL_PATH = settings.GLOBAL_PATH
-
-    cookie_params = {
-        "httponly": True,
-        "secure": secure if not is_local else False,
-        "domain": domain if not is_local else None,
-        "samesite": "lax",
-    }
-    if expires_minutes:
-        from datetime import datetime, timedelta
-        expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
-        cookie_params["expires"] = expire.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
-
-    response.set_cookie(key, value, **{k: v for k, v in cookie_params.items() if v is not None})
+    cookie_policy().set(response, key, value, int(expires_minutes * 60) if expires_minutes else None)
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from passlib.hash import argon2
+from app.metrics import STAGE_DURATION, registry
+from config import settings
+
+
+def build_password_context(
+    schemes: str = "bcrypt",
+    bcrypt_rounds: int = 12,
+    argon2_time_cost: int = 3,
+    argon2_memory_cost: int = 65536,
+    argon2_parallelism: int = 4,
+) -> CryptContext:
+    """CryptContext for a hashing profile.
+
+    ``schemes`` is a comma separated list; the first one hashes new passwords
+    and the rest are only verified. A stored hash in another scheme, or with
+    cost parameters other than the configured ones, reports ``needs_update``
+    so it is replaced on the user's next login.
+    """
+    names = [name.strip() for name in schemes.split(",") if name.strip()]
+    if "argon2" in names and not argon2.has_backend():
+        raise RuntimeError("PASSWORD_SCHEMES includes argon2 but argon2-cffi is not installed")
+    return CryptContext(
+        schemes=names,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        bcrypt__max_rounds=bcrypt_rounds,
+        argon2__type="ID",
+        argon2__rounds=argon2_time_cost,
+        argon2__min_rounds=argon2_time_cost,
+        argon2__max_rounds=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+class HashingPool:
+    """Runs bcrypt work on a dedicated thread pool so it never blocks the event loop.
+
+    bcrypt releases the GIL, so threads give real parallelism. At most
+    ``workers`` operations run at once and at most ``queue_size`` more may wait;
+    anything beyond that is rejected with a 503 instead of piling up.
+    """
+
+    def __init__(self, workers: int = 0, queue_size: int = 64):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self._executor = None
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return min(self._pending, self.workers)
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self._pending - self.workers, 0)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def run(self, fn, *args, stage: str = "password_hash"):
+        """Run ``fn(*args)`` on the pool, shedding load when the queue is full.
+
+        Run time is recorded under ``stage`` and queue wait under ``<stage>_queue_wait``.
+        """
+        if self._pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        submitted = time.perf_counter()
+        timings = {}
+
+        def timed():
+            started = time.perf_counter()
+            timings["wait"] = started - submitted
+            try:
+                return fn(*args)
+            finally:
+                timings["run"] = time.perf_counter() - started
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), timed)
+        finally:
+            self._pending -= 1
+            if "run" in timings:
+                self.completed += 1
+                self.wait_seconds_total += timings["wait"]
+                self.hash_seconds_total += timings["run"]
+                self.hash_seconds_max = max(self.hash_seconds_max, timings["run"])
+                STAGE_DURATION.labels(stage).observe(timings["run"])
+                STAGE_DURATION.labels(f"{stage}_queue_wait").observe(timings["wait"])
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds_total / self.completed * 1000, 3) if self.completed else 0.0,
+            "avg_hash_ms": round(self.hash_seconds_total / self.completed * 1000, 3) if self.completed else 0.0,
+            "max_hash_ms": round(self.hash_seconds_max * 1000, 3),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
+
+registry.callback("password_hash_queue_depth", "Password operations waiting for a worker",
+                  lambda: hashing_pool.queue_depth)
+registry.callback("password_hash_in_flight", "Password operations running", lambda: hashing_pool.in_flight)
+registry.callback("password_hash_rejected_total", "Password operations shed with 503",
+                  lambda: hashing_pool.rejected, type="counter")
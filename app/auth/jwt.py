@@ -1,28 +1,88 @@
-from jose import jwt
+import hashlib
+import uuid
+from jose import jwt, ExpiredSignatureError
 from datetime import datetime, timedelta
+from app.cache import TTLCache
+from app.auth.keys import keyring
+from app.auth.revocation import revocation_store
+from app.metrics import registry, timed
 from config import settings
 
-def create_access_token(data: dict) -> str:
+# Verified payloads keyed by token digest, each expiring at the token's own exp.
+# Shared by JWTBearer and verify_token so a token is only decoded once.
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
+registry.callback("token_cache_hits_total", "Verified-token cache hits", lambda: token_cache.hits, type="counter")
+registry.callback("token_cache_misses_total", "Verified-token cache misses", lambda: token_cache.misses, type="counter")
+registry.callback("token_cache_size", "Verified tokens cached", lambda: len(token_cache))
+
+class TokenExpiredError(ValueError):
+    pass
+
+def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(
+    expire = datetime.utcnow() + (expires_delta or timedelta(
         minutes=settings.JWT_EXPIRE_MINUTES
-    )
+    ))
     to_encode.update({"exp": expire})
-    return jwt.encode(
-        to_encode,
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    with timed("jwt_encode"):
+        if keyring is not None:
+            key = keyring.signing_key()
+            return jwt.encode(to_encode, key.private_key, algorithm=key.alg, headers={"kid": key.kid})
+        return jwt.encode(
+            to_encode,
+            settings.JWT_SECRET,
+            algorithm=settings.JWT_ALGORITHM
+        )
+
+def create_refresh_token(email: str, family_id: str):
+    """Long-lived refresh token; returns (token, jti, expiry)"""
+    jti = uuid.uuid4().hex
+    expires_delta = timedelta(days=settings.JWT_REFRESH_EXPIRE_DAYS)
+    token = create_access_token(
+        {"sub": email, "typ": "refresh", "fam": family_id, "jti": jti},
+        expires_delta=expires_delta,
+    )
+    return token, jti, datetime.utcnow() + expires_delta
+
+def _decode(token: str) -> dict:
+    if keyring is not None:
+        key = keyring.verification_key(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise ValueError("Unknown signing key")
+        return jwt.decode(token, key.public_key, algorithms=[key.alg])
+    return jwt.decode(
+        token,
         settings.JWT_SECRET,
-        algorithm=settings.JWT_ALGORITHM
+        algorithms=[settings.JWT_ALGORITHM]
     )
 
-def verify_token(token: str) -> dict:
+def verify_token(token: str, token_type: str = "access") -> dict:
+    """Decode and verify a JWT, serving repeat tokens from token_cache.
+
+    Revocation and the token type are checked on every call, cached or not.
+    The returned payload is shared with later callers; do not mutate it.
+    """
+    key = hashlib.sha256(token.encode()).digest() if token else None
+    payload = token_cache.get(key) if key else None
+    if payload is None:
+        payload = _verify_signature(token, key)
+    if payload.get("typ", "access") != token_type:
+        raise ValueError(f"Invalid token: not an {token_type} token")
+    if revocation_store.is_revoked(payload):
+        raise ValueError("Invalid token: revoked")
+    return payload
+
+def _verify_signature(token: str, key: bytes) -> dict:
     try:
-        payload = jwt.decode(
-            token,
-            settings.JWT_SECRET,
-            algorithms=[settings.JWT_ALGORITHM]
-        )
+        with timed("jwt_decode"):
+            payload = _decode(token)
         if payload.get("exp") < datetime.utcnow().timestamp():
             raise ValueError("Token expired")
-        return payload
+    except ExpiredSignatureError as e:
+        raise TokenExpiredError(f"Invalid token: {str(e)}")
     except Exception as e:
         raise ValueError(f"Invalid token: {str(e)}")
+    token_cache.set(key, payload, expires_at=payload["exp"])
+    return payload
@@ -0,0 +1,318 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwk
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Algorithms python-jose can sign with asymmetrically (it has no EdDSA support)
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+
+_EC_CURVES = {"ES256": ec.SECP256R1, "ES384": ec.SECP384R1, "ES512": ec.SECP521R1}
+
+
+def generate_private_key_pem(alg: str) -> str:
+    if alg.startswith("RS"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        private_key = ec.generate_private_key(_EC_CURVES[alg]())
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+@dataclass
+class SigningKey:
+    """One keyring entry. Published in the JWKS from creation, used for
+    signing from ``activates_at``, and accepted until ``expires_at``."""
+    kid: str
+    alg: str
+    private_pem: str
+    created_at: float
+    activates_at: float
+    expires_at: Optional[float] = None
+
+    def __post_init__(self):
+        # Constructed once so encode/decode never re-parse the PEM
+        self.private_key = jwk.construct(self.private_pem, self.alg)
+        self.public_key = self.private_key.public_key()
+
+    @classmethod
+    def generate(cls, alg: str, activates_at: float = None) -> "SigningKey":
+        now = time.time()
+        return cls(
+            kid=uuid.uuid4().hex,
+            alg=alg,
+            private_pem=generate_private_key_pem(alg),
+            created_at=now,
+            activates_at=now if activates_at is None else activates_at,
+        )
+
+    def public_jwk(self) -> dict:
+        return {**self.public_key.to_dict(), "kid": self.kid, "use": "sig"}
+
+    def to_dict(self) -> dict:
+        return {
+            "kid": self.kid,
+            "alg": self.alg,
+            "private_key": self.private_pem,
+            "created_at": self.created_at,
+            "activates_at": self.activates_at,
+            "expires_at": self.expires_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SigningKey":
+        return cls(
+            kid=data["kid"],
+            alg=data["alg"],
+            private_pem=data["private_key"],
+            created_at=data["created_at"],
+            activates_at=data["activates_at"],
+            expires_at=data.get("expires_at"),
+        )
+
+
+class KeyRing:
+    """Asymmetric JWT signing keys identified by ``kid``.
+
+    Keys live in a JSON file (``path``) shared by every worker; each worker
+    reloads it when it changes, and rotation is serialised with a file lock.
+    A new key is published ``publish_lead`` seconds before it starts signing
+    so downstream JWKS caches see it first; the key it replaces keeps
+    verifying for ``grace`` seconds afterwards. Without a path the ring is
+    process-local, which only suits single-worker deployments.
+    """
+
+    def __init__(
+        self,
+        alg: str,
+        path: str = "",
+        rotation_interval: float = 30 * 86400,
+        grace: float = 3600,
+        publish_lead: float = 300,
+        refresh_interval: float = 60,
+    ):
+        if alg not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Unsupported signing algorithm {alg}")
+        self.alg = alg
+        self.path = path
+        self.rotation_interval = rotation_interval
+        self.grace = grace
+        self.publish_lead = publish_lead
+        self.refresh_interval = refresh_interval
+        self.keys = {}
+        self._mtime = None
+        self._jwks = None
+        self._task = None
+
+    # --- Lookup ---
+    def signing_key(self) -> SigningKey:
+        now = time.time()
+        active = [k for k in self.keys.values() if k.activates_at <= now and not self._expired(k, now)]
+        if not active:
+            self.load()
+            active = [k for k in self.keys.values() if k.activates_at <= now and not self._expired(k, now)]
+        return max(active, key=lambda k: k.activates_at)
+
+    def verification_key(self, kid: str) -> Optional[SigningKey]:
+        key = self.keys.get(kid)
+        if key is None and self.path:
+            # Possibly rotated by another worker since our last refresh
+            self.reload_if_changed()
+            key = self.keys.get(kid)
+        if key is None or self._expired(key, time.time()):
+            return None
+        return key
+
+    @staticmethod
+    def _expired(key: SigningKey, now: float) -> bool:
+        return key.expires_at is not None and key.expires_at <= now
+
+    # --- JWKS ---
+    def jwks(self):
+        """(body bytes, strong ETag) for the public key set, rebuilt only on change"""
+        if not self.keys:
+            self.load()
+        if self._jwks is None:
+            now = time.time()
+            keys = sorted(
+                (k for k in self.keys.values() if not self._expired(k, now)),
+                key=lambda k: k.created_at,
+            )
+            body = json.dumps({"keys": [k.public_jwk() for k in keys]}, separators=(",", ":")).encode()
+            self._jwks = (body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+        return self._jwks
+
+    # --- Persistence ---
+    def _set_keys(self, keys):
+        self.keys = {k.kid: k for k in keys}
+        self._jwks = None
+
+    def load(self):
+        """Load keys from ``path`` (creating the first key if none exist)"""
+        if not self.path:
+            if not self.keys:
+                self._set_keys([SigningKey.generate(self.alg)])
+            return
+        with self._file_lock():
+            self._read()
+            if not self.keys:
+                self._set_keys([SigningKey.generate(self.alg)])
+                self._write()
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self._read()
+
+    def _read(self):
+        try:
+            # stat first: if the file is replaced mid-read we simply reload again
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        self._mtime = mtime
+        self._set_keys(SigningKey.from_dict(k) for k in data["keys"])
+
+    def _write(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"keys": [k.to_dict() for k in self.keys.values()]}, f)
+        os.replace(tmp, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def _file_lock(self):
+        return _FileLock(self.path + ".lock")
+
+    # --- Rotation ---
+    def rotation_due(self, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        newest = max(self.keys.values(), key=lambda k: k.created_at, default=None)
+        return newest is None or newest.created_at + self.rotation_interval <= now
+
+    def _rotate_locked(self, now: float):
+        new_key = SigningKey.generate(self.alg, activates_at=now + self.publish_lead)
+        for key in self.keys.values():
+            if key.expires_at is None:
+                key.expires_at = new_key.activates_at + self.grace
+        keys = [k for k in self.keys.values() if not self._expired(k, now)]
+        self._set_keys(keys + [new_key])
+        logger.info(f"Rotated JWT signing key, new kid {new_key.kid}")
+        return new_key
+
+    def rotate(self) -> SigningKey:
+        """Add a new signing key now and schedule the current one for retirement"""
+        if not self.path:
+            return self._rotate_locked(time.time())
+        with self._file_lock():
+            self._read()
+            new_key = self._rotate_locked(time.time())
+            self._write()
+            return new_key
+
+    def maintain(self):
+        """Pick up other workers' rotations and rotate if the schedule says so"""
+        if self.path:
+            self.reload_if_changed()
+        if self.rotation_due():
+            if not self.path:
+                self._rotate_locked(time.time())
+                return
+            with self._file_lock():
+                self._read()
+                if self.rotation_due():
+                    self._rotate_locked(time.time())
+                    self._write()
+        # Drop expired keys from the published set
+        if any(self._expired(k, time.time()) for k in self.keys.values()):
+            self._jwks = None
+
+    async def _run(self):
+        # First load happens here rather than in start() so reading (or
+        # generating) keys does not hold up startup; it stays on the loop
+        # thread so it cannot race a request that needs a key first
+        if not self.keys:
+            try:
+                self.load()
+            except Exception as e:
+                logger.error(f"JWT key load failed: {str(e)}")
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.maintain)
+            except Exception as e:
+                logger.error(f"JWT key maintenance failed: {str(e)}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class _FileLock:
+    """Exclusive advisory lock on a sidecar file (serialises rotation across workers)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+def is_asymmetric(alg: str) -> bool:
+    return alg in ASYMMETRIC_ALGORITHMS
+
+
+def retired_key_grace() -> float:
+    """Seconds a replaced key keeps verifying: at least JWT_KEY_GRACE_MINUTES and
+    never less than the longest-lived token it may have signed (refresh tokens),
+    so rotation does not log everyone out"""
+    return max(
+        settings.JWT_KEY_GRACE_MINUTES * 60,
+        settings.JWT_EXPIRE_MINUTES * 60,
+        settings.JWT_REFRESH_EXPIRE_DAYS * 86400,
+    )
+
+
+keyring = KeyRing(
+    settings.JWT_ALGORITHM,
+    path=settings.JWT_KEYS_FILE,
+    rotation_interval=settings.JWT_KEY_ROTATION_DAYS * 86400,
+    grace=retired_key_grace(),
+    publish_lead=settings.JWKS_MAX_AGE,
+) if is_asymmetric(settings.JWT_ALGORITHM) else None
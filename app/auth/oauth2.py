@@ -1,14 +1,208 @@
-from authlib.integrations.httpx_client import AsyncOAuth2Client
+import asyncio
+import logging
+import re
+import time
+from app.metrics import timed
 from config import settings
 
-async def get_oauth_client(provider: str):
-    if provider == "google":
-        return AsyncOAuth2Client(
-            client_id=settings.GOOGLE_CLIENT_ID,
-            client_secret=settings.GOOGLE_CLIENT_SECRET,
-            redirect_uri=settings.REDIRECT_URI,
-            authorize_url="https://accounts.google.com/o/oauth2/auth",
-            access_token_url="https://oauth2.googleapis.com/token",
-            userinfo_endpoint="https://www.googleapis.com/oauth2/v3/userinfo",
+logger = logging.getLogger(__name__)
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+# httpx and authlib are imported where first used: together they are the
+# slowest part of importing the app, and most workers see their first
+# OAuth login long after they started serving requests.
+
+
+def _max_age(response, default: float) -> float:
+    """TTL from the response's Cache-Control header, else ``default``"""
+    match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+    return float(match.group(1)) if match else default
+
+
+class OAuthProvider:
+    """A long-lived OAuth2/OpenID client for one provider.
+
+    Owns a single keep-alive httpx pool and caches the provider's discovery
+    document and JWKS, honouring their Cache-Control max-age. The client is
+    shared across requests, so per-user tokens are never stored on it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        client_id: str,
+        client_secret: str,
+        redirect_uri: str,
+        discovery_url: str,
+        scope: str = "openid email profile",
+        issuers=None,
+        metadata_ttl: float = 3600.0,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        transport=None,
+    ):
+        self.name = name
+        self.client_id = client_id
+        self.discovery_url = discovery_url
+        self.issuers = issuers
+        self.metadata_ttl = metadata_ttl
+        import httpx
+        from authlib.integrations.httpx_client import AsyncOAuth2Client
+        self.client = AsyncOAuth2Client(
+            client_id=client_id,
+            client_secret=client_secret,
+            redirect_uri=redirect_uri,
+            scope=scope,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60.0,
+            ),
+            transport=transport,
         )
-    raise NotImplementedError(f"Provider {provider} not supported")
+        self._metadata = None
+        self._metadata_expires = 0.0
+        self._jwks = None
+        self._jwks_expires = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _fetch_json(self, url: str):
+        with timed("oauth_metadata"):
+            response = await self.client.request("GET", url, withhold_token=True)
+        response.raise_for_status()
+        return response.json(), _max_age(response, self.metadata_ttl)
+
+    async def metadata(self) -> dict:
+        """OpenID discovery document, refreshed when its TTL lapses"""
+        if self._metadata is None or time.monotonic() >= self._metadata_expires:
+            async with self._lock:
+                if self._metadata is None or time.monotonic() >= self._metadata_expires:
+                    self._metadata, ttl = await self._fetch_json(self.discovery_url)
+                    self._metadata_expires = time.monotonic() + ttl
+        return self._metadata
+
+    async def jwks(self, refresh: bool = False):
+        """Provider signing keys, refreshed on TTL expiry or on demand (unknown kid)"""
+        if refresh or self._jwks is None or time.monotonic() >= self._jwks_expires:
+            metadata = await self.metadata()
+            async with self._lock:
+                if refresh or self._jwks is None or time.monotonic() >= self._jwks_expires:
+                    keys, ttl = await self._fetch_json(metadata["jwks_uri"])
+                    from authlib.jose import JsonWebKey
+                    self._jwks = JsonWebKey.import_key_set(keys)
+                    self._jwks_expires = time.monotonic() + ttl
+        return self._jwks
+
+    async def get_authorize_url(self, state: str) -> str:
+        metadata = await self.metadata()
+        url, _ = self.client.create_authorization_url(metadata["authorization_endpoint"], state=state)
+        return url
+
+    async def get_access_token(self, code: str) -> dict:
+        metadata = await self.metadata()
+        with timed("oauth_token"):
+            token = await self.client.fetch_token(metadata["token_endpoint"], code=code)
+        self.client.token = None  # fetch_token stores it on the shared client
+        return dict(token)
+
+    async def validate_id_token(self, id_token: str) -> dict:
+        """Verify an id_token's signature and claims locally against the cached JWKS"""
+        from authlib.jose import jwt
+        metadata = await self.metadata()
+        claims_options = {
+            "iss": {"essential": True, "values": self.issuers or [metadata["issuer"]]},
+            "aud": {"essential": True, "value": self.client_id},
+            "exp": {"essential": True},
+        }
+        try:
+            with timed("oauth_id_token"):
+                claims = jwt.decode(id_token, await self.jwks(), claims_options=claims_options)
+        except ValueError:
+            # Unknown kid: the provider rotated keys since we cached them
+            claims = jwt.decode(id_token, await self.jwks(refresh=True), claims_options=claims_options)
+        claims.validate(leeway=60)
+        return dict(claims)
+
+    async def get_user_info(self, token: dict) -> dict:
+        """User claims, from the id_token when present, else the userinfo endpoint"""
+        if token.get("id_token"):
+            return await self.validate_id_token(token["id_token"])
+        metadata = await self.metadata()
+        with timed("oauth_userinfo"):
+            response = await self.client.request(
+                "GET",
+                metadata["userinfo_endpoint"],
+                headers={"Authorization": f"Bearer {token['access_token']}"},
+                withhold_token=True,
+            )
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def _google_provider() -> OAuthProvider:
+    return OAuthProvider(
+        "google",
+        client_id=settings.GOOGLE_CLIENT_ID,
+        client_secret=settings.GOOGLE_CLIENT_SECRET,
+        redirect_uri=settings.REDIRECT_URI,
+        discovery_url="https://accounts.google.com/.well-known/openid-configuration",
+        issuers=["https://accounts.google.com", "accounts.google.com"],
+        metadata_ttl=settings.OAUTH_METADATA_TTL,
+        timeout=settings.OAUTH_HTTP_TIMEOUT,
+        max_connections=settings.OAUTH_MAX_CONNECTIONS,
+    )
+
+
+class OAuthRegistry:
+    """One OAuthProvider per supported provider for the life of the process"""
+
+    factories = {"google": _google_provider}
+
+    def __init__(self):
+        self._providers = {}
+        self._warmups = []
+
+    def register(self, provider: OAuthProvider):
+        self._providers[provider.name] = provider
+
+    def get(self, name: str) -> OAuthProvider:
+        if name not in self._providers:
+            if name not in self.factories:
+                raise NotImplementedError(f"Provider {name} not supported")
+            self.register(self.factories[name]())
+        return self._providers[name]
+
+    async def _warm(self, name: str):
+        import httpx
+        from authlib.jose.errors import JoseError
+        provider = self.get(name)
+        try:
+            await provider.jwks()
+        except (httpx.HTTPError, JoseError, KeyError, ValueError) as e:
+            logger.warning(f"Could not prefetch {provider.name} OAuth metadata: {str(e)}")
+
+    def startup(self):
+        """Create every provider and prefetch discovery/JWKS in the background,
+        so neither the client imports nor the fetches delay the worker's start"""
+        loop = asyncio.get_running_loop()
+        for name in self.factories:
+            self._warmups.append(loop.create_task(self._warm(name)))
+
+    async def aclose(self):
+        for task in self._warmups:
+            task.cancel()
+        self._warmups.clear()
+        for provider in self._providers.values():
+            await provider.aclose()
+        self._providers.clear()
+
+
+oauth_registry = OAuthRegistry()
+
+async def get_oauth_client(provider: str) -> OAuthProvider:
+    return oauth_registry.get(provider)
@@ -1,18 +1,82 @@
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from app.models import User
+import asyncio
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth.hashing import build_password_context, hashing_pool
+from app.crud.users import get_user_by_email_async, update_password_hash_async
+from app.database import AsyncSessionLocal
+from app.metrics import registry
+from config import settings
 from fastapi import HTTPException
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+pwd_context = build_password_context(
+    schemes=settings.PASSWORD_SCHEMES,
+    bcrypt_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    argon2_time_cost=settings.PASSWORD_ARGON2_TIME_COST,
+    argon2_memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+    argon2_parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+)
+
+REHASHES = registry.counter("password_rehashes_total", "Login-time hash upgrades by outcome", ("result",))
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_and_update_password(plain_password, hashed_password)[0]
+
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """(valid, new_hash) where new_hash is set when the stored hash is outdated.
+
+    Unrecognised hashes (e.g. the "oauth_user" placeholder) never verify.
+    """
+    try:
+        if not settings.PASSWORD_REHASH_ON_LOGIN:
+            return pwd_context.verify(plain_password, hashed_password), None
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except ValueError:
+        return False, None
 
 def get_password_hash(password: str):
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await hashing_pool.run(verify_password, plain_password, hashed_password, stage="bcrypt_verify")
+
+async def get_password_hash_async(password: str):
+    return await hashing_pool.run(get_password_hash, password, stage="bcrypt_hash")
+
+# --- Background persistence of upgraded hashes ---
+_rehash_tasks = set()
+
+async def _persist_rehash(user_id: int, old_hash: str, new_hash: str):
+    try:
+        async with AsyncSessionLocal() as db:
+            persisted = await update_password_hash_async(db, user_id, old_hash, new_hash)
+        REHASHES.labels("persisted" if persisted else "stale").inc()
+    except Exception as e:
+        REHASHES.labels("failed").inc()
+        logger.warning(f"Persisting upgraded password hash failed: {str(e)}")
+
+def schedule_rehash(user_id: int, old_hash: str, new_hash: str):
+    """Write ``new_hash`` after the response instead of on the login path"""
+    task = asyncio.get_running_loop().create_task(_persist_rehash(user_id, old_hash, new_hash))
+    _rehash_tasks.add(task)
+    task.add_done_callback(_rehash_tasks.discard)
+
+async def drain_rehashes():
+    if _rehash_tasks:
+        await asyncio.gather(*_rehash_tasks, return_exceptions=True)
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    # Always reads the row: the user cache is per worker, and a negative entry
+    # there may predate a registration handled by another worker
+    user = await get_user_by_email_async(db, email)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    valid, new_hash = await hashing_pool.run(
+        verify_and_update_password, password, user.hashed_password, stage="bcrypt_verify"
+    )
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    return user
\ No newline at end of file
+    if new_hash:
+        schedule_rehash(user.id, user.hashed_password, new_hash)
+    return user
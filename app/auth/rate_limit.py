@@ -0,0 +1,187 @@
+import heapq
+import logging
+import math
+import time
+import zlib
+from fastapi import HTTPException, Request, status
+from app.metrics import registry
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = registry.counter("rate_limit_rejections_total", "Requests rejected by rate limit rule", ("rule",))
+
+
+def parse_rule(spec: str):
+    """'10/60' -> (10, 60.0): at most 10 hits per 60 seconds"""
+    limit, window = spec.split("/")
+    return int(limit), float(window)
+
+
+class RateLimitBackend:
+    """Counter storage. ``incr`` returns the new count and sets ``ttl`` on first use."""
+
+    async def incr(self, key: str, ttl: float) -> int:
+        raise NotImplementedError
+
+    async def get(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Per-process counters split across shards.
+
+    Rules with different windows share shards, so insertion order says
+    nothing about expiry order. A shard is swept for expired counters at
+    most every ``sweep_interval`` seconds when new keys arrive, and a shard
+    that is still full drops the live counters closest to expiring, an
+    eighth of the shard at a time so it is not rescanned for every new key.
+    Counters are only touched from the event loop thread, so no locks.
+    """
+
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 50000, sweep_interval: float = 1.0):
+        self._shards = [{} for _ in range(shards)]
+        self._swept_at = [float("-inf")] * shards
+        self.max_keys_per_shard = max_keys_per_shard
+        self.sweep_interval = sweep_interval
+
+    def _index(self, key: str) -> int:
+        return zlib.crc32(key.encode()) % len(self._shards)
+
+    def _shard(self, key: str) -> dict:
+        return self._shards[self._index(key)]
+
+    @staticmethod
+    def _evict(shard: dict, now: float, max_keys: int):
+        for key in [key for key, entry in shard.items() if entry[1] <= now]:
+            del shard[key]
+        excess = len(shard) - max_keys
+        if excess > 0:
+            excess = max(excess, max_keys // 8)
+            for key in heapq.nsmallest(excess, shard, key=lambda key: shard[key][1]):
+                del shard[key]
+
+    async def incr(self, key: str, ttl: float) -> int:
+        now = time.monotonic()
+        index = self._index(key)
+        shard = self._shards[index]
+        entry = shard.get(key)
+        if entry is None or entry[1] <= now:
+            shard.pop(key, None)
+            if len(shard) >= self.max_keys_per_shard or now - self._swept_at[index] >= self.sweep_interval:
+                self._evict(shard, now, self.max_keys_per_shard - 1)
+                self._swept_at[index] = now
+            entry = shard[key] = [0, now + ttl]
+        entry[0] += 1
+        return entry[0]
+
+    async def get(self, key: str) -> int:
+        entry = self._shard(key).get(key)
+        return entry[0] if entry is not None and entry[1] > time.monotonic() else 0
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+
+class KeyValueRateLimitBackend(RateLimitBackend):
+    """Shared counters over a redis-style async client (``incr``, ``expire``,
+    ``get``) so every worker enforces one budget."""
+
+    def __init__(self, client, prefix: str = "rl:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def incr(self, key: str, ttl: float) -> int:
+        count = await self.client.incr(self.prefix + key)
+        if count == 1:
+            await self.client.expire(self.prefix + key, math.ceil(ttl))
+        return count
+
+    async def get(self, key: str) -> int:
+        value = await self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+
+class RateLimiter:
+    """Sliding-window limiter (weighted current + previous fixed window).
+
+    Backend failures fail open: a broken shared store must not lock
+    everyone out of logging in.
+    """
+
+    def __init__(self, backend: RateLimitBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+
+    async def hit(self, rule: str, key: str, limit: int, window: float) -> float:
+        """Count a hit; return seconds to wait if over the limit, else 0"""
+        now = time.time()
+        index, offset = divmod(now, window)
+        base = f"{rule}:{key}:"
+        current = await self.backend.incr(base + str(int(index)), ttl=2 * window)
+        previous = await self.backend.get(base + str(int(index) - 1))
+        if previous * (1 - offset / window) + current <= limit:
+            return 0
+        return window - offset
+
+    async def check(self, rules):
+        """Apply ``(rule, key, "limit/window")`` rules; raise 429 if any is exceeded"""
+        if not self.enabled:
+            return
+        retry_after = 0
+        for rule, key, spec in rules:
+            limit, window = parse_rule(spec)
+            try:
+                wait = await self.hit(rule, key, limit, window)
+            except Exception as e:
+                logger.warning(f"Rate limit backend failed, allowing request: {str(e)}")
+                continue
+            if wait:
+                RATE_LIMITED.labels(rule).inc()
+                retry_after = max(retry_after, wait)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please retry later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+
+def client_ip(request: Request) -> str:
+    """The address our outermost trusted proxy saw. Clients can put anything in
+    X-Forwarded-For, so entries are counted from the right: each of the
+    TRUSTED_PROXY_HOPS proxies appends the address it received from."""
+    if settings.TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.split(",")]
+            return hops[-min(max(settings.TRUSTED_PROXY_HOPS, 1), len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+rate_limiter = RateLimiter(InMemoryRateLimitBackend(), enabled=settings.RATE_LIMIT_ENABLED)
+
+registry.callback("rate_limit_keys", "Rate limit counters held in memory",
+                  lambda: len(rate_limiter.backend) if isinstance(rate_limiter.backend, InMemoryRateLimitBackend) else 0)
+
+
+async def check_login_rate(request: Request, email: str):
+    ip = client_ip(request)
+    email = email.lower()
+    await rate_limiter.check([
+        ("login_ip", ip, settings.RATE_LIMIT_LOGIN_IP),
+        ("login_email", email, settings.RATE_LIMIT_LOGIN_EMAIL),
+        ("login_ip_email", f"{ip}|{email}", settings.RATE_LIMIT_LOGIN_IP_EMAIL),
+    ])
+
+
+async def check_register_rate(request: Request):
+    await rate_limiter.check([("register_ip", client_ip(request), settings.RATE_LIMIT_REGISTER_IP)])
+
+
+async def check_room_create_rate(request: Request):
+    """Per account (and IP): creating rooms is how arbitrary emails reach the database"""
+    await rate_limiter.check([
+        ("room_create_user", request.state.token_payload["sub"].lower(), settings.RATE_LIMIT_ROOM_CREATE_USER),
+        ("room_create_ip", client_ip(request), settings.RATE_LIMIT_ROOM_CREATE_IP),
+    ])
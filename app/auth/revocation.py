@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.metrics import registry
+from app.models import RefreshToken, RevokedToken
+from app.shared_state import attach_shared_state
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _timestamp(value: datetime) -> float:
+    # SQLite hands back naive datetimes; everything is stored as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class RevocationStore:
+    """In-memory mirror of the revoked_tokens table.
+
+    Revoked ids (token ``jti``s and refresh ``fam``ilies) map to the time
+    they stop mattering, so ``is_revoked`` is a dict lookup with no DB hit.
+    A background task pulls rows other workers added since the last sync and
+    compacts entries whose tokens have expired anyway.
+
+    With a ``shared`` snapshot (workers started by ``app.serve``), the
+    worker that syncs publishes the whole set there and the others adopt it
+    instead of querying the database themselves, so a freshly started
+    worker gets the full set without a table scan and the table is read
+    about once per interval rather than once per worker.
+    """
+
+    # Re-read rows slightly older than the last sync to tolerate clock skew
+    SYNC_OVERLAP = timedelta(seconds=30)
+
+    def __init__(self, sync_interval: float = 5.0, purge_interval: float = 3600.0, shared=None):
+        self.sync_interval = sync_interval
+        self.purge_interval = purge_interval
+        self.shared = shared
+        self.shared_adoptions = 0
+        self._revoked = {}
+        self._synced_until = None
+        self._last_purge = time.monotonic()
+        self._task = None
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def is_revoked(self, payload: dict) -> bool:
+        revoked = self._revoked
+        return payload.get("jti") in revoked or payload.get("fam") in revoked
+
+    def add(self, token_id: str, expires_at: float):
+        self._revoked[token_id] = max(expires_at, self._revoked.get(token_id, 0))
+
+    async def revoke(self, db, token_id: str, expires_at: datetime):
+        """Persist a revocation and apply it to this worker immediately"""
+        # Concurrent logouts or reuse detections may revoke the same id; the
+        # first row wins instead of the others failing on the primary key
+        insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+        await db.execute(
+            insert(RevokedToken)
+            .values(jti=token_id, expires_at=expires_at, created_at=datetime.now(timezone.utc))
+            .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+        )
+        await db.commit()
+        self.add(token_id, _timestamp(expires_at))
+
+    def compact(self):
+        now = time.time()
+        expired = [token_id for token_id, expires_at in self._revoked.items() if expires_at <= now]
+        for token_id in expired:
+            del self._revoked[token_id]
+        return len(expired)
+
+    async def sync(self, session_factory):
+        """Load revocations recorded since the previous sync (all of them on first run)"""
+        started = datetime.now(timezone.utc)
+        query = select(RevokedToken.jti, RevokedToken.expires_at).where(
+            RevokedToken.expires_at > started
+        )
+        if self._synced_until is not None:
+            query = query.where(RevokedToken.created_at > self._synced_until - self.SYNC_OVERLAP)
+        async with session_factory() as db:
+            for token_id, expires_at in (await db.execute(query)).all():
+                self.add(token_id, _timestamp(expires_at))
+        self._synced_until = started
+
+    def adopt_shared(self) -> bool:
+        """Merge the shared snapshot if it is newer than our last sync; True
+        when it is recent enough to skip this interval's database sync"""
+        snapshot = self.shared.read() if self.shared is not None else None
+        if not snapshot:
+            return False
+        synced_until = datetime.fromisoformat(snapshot["synced_until"])
+        if self._synced_until is None or synced_until > self._synced_until:
+            for token_id, expires_at in snapshot["revoked"].items():
+                self.add(token_id, expires_at)
+            self._synced_until = synced_until
+            self.shared_adoptions += 1
+        return datetime.now(timezone.utc) - self._synced_until < timedelta(seconds=self.sync_interval)
+
+    def publish_shared(self):
+        if self.shared is None or self._synced_until is None:
+            return
+        if not self.shared.write({"synced_until": self._synced_until.isoformat(), "revoked": self._revoked}):
+            logger.warning("Revoked token set exceeds SHARED_STATE_SIZE; workers sync from the database")
+
+    async def purge(self, session_factory):
+        """Delete rows for tokens that have expired from the database tables"""
+        now = datetime.now(timezone.utc)
+        async with session_factory() as db:
+            await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+            await db.execute(delete(RefreshToken).where(RefreshToken.expires_at <= now))
+            await db.commit()
+
+    async def _run(self, session_factory):
+        while True:
+            try:
+                if self.adopt_shared():
+                    self.compact()
+                else:
+                    await self.sync(session_factory)
+                    self.compact()
+                    self.publish_shared()
+                if time.monotonic() - self._last_purge >= self.purge_interval:
+                    self._last_purge = time.monotonic()
+                    await self.purge(session_factory)
+            except Exception as e:
+                logger.warning(f"Revocation sync failed: {str(e)}")
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self, session_factory):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(session_factory))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+revocation_store = RevocationStore(
+    sync_interval=settings.REVOCATION_SYNC_INTERVAL,
+    shared=attach_shared_state(settings.SHARED_STATE_PATH),
+)
+
+registry.callback("revoked_tokens", "Revoked token/family ids held in memory", lambda: len(revocation_store))
@@ -1,42 +1,142 @@
 from fastapi import Request, HTTPException
 from fastapi.security import HTTPBearer
-from jose import jwt, JWTError
-from datetime import datetime
+from app.auth.jwt import verify_token, TokenExpiredError
+from app.metrics import registry
+from app.presence import presence
 from config import settings
+import base64
+import hashlib
+import hmac
 import os
+import time
 
 class JWTBearer(HTTPBearer):
+    """Verifies the bearer token and stashes its payload on request.state.token_payload"""
+
     async def __call__(self, request: Request):
         credentials = await super().__call__(request)
         if credentials:
             try:
-                payload = jwt.decode(
-                    credentials.credentials,
-                    settings.JWT_SECRET,
-                    algorithms=[settings.JWT_ALGORITHM]
-                )
-                if payload.get("exp") < datetime.now().timestamp():
-                    raise HTTPException(status_code=403, detail="Token expired")
-                return payload
-            except JWTError:
+                payload = verify_token(credentials.credentials)
+            except TokenExpiredError:
+                raise HTTPException(status_code=403, detail="Token expired")
+            except ValueError:
                 raise HTTPException(status_code=403, detail="Invalid token")
+            request.state.token_payload = payload
+            presence.touch(payload["sub"])
+            return payload
         raise HTTPException(status_code=403, detail="Invalid authorization")
 
+def _require_key(request: Request, header: str, expected: str, detail: str):
+    key = request.headers.get(header, "")
+    if not expected or not hmac.compare_digest(key.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail=detail)
+
+def require_admin_key(request: Request):
+    """Guards admin endpoints; they stay disabled until ADMIN_API_KEY is set"""
+    _require_key(request, "x-admin-key", settings.ADMIN_API_KEY, "Admin key required")
+
+def require_introspection_key(request: Request):
+    """Guards /auth/introspect; disabled until INTROSPECT_API_KEY is set"""
+    _require_key(request, "x-introspect-key", settings.INTROSPECT_API_KEY, "Introspection key required")
+
 def verify_csrf_token(request: Request):
+    """Double-submit check: the X-CSRF-Token header must echo the csrf_token
+    cookie, which must itself be a valid, unexpired state token"""
     token = request.cookies.get("csrf_token")
-    if not token or not verify_state_token(token):
+    header = request.headers.get("x-csrf-token", "")
+    if not token or not hmac.compare_digest(token.encode(), header.encode()) \
+            or not verify_state_token(token, max_age=settings.CSRF_TOKEN_MAX_AGE):
         raise HTTPException(status_code=403, detail="Invalid CSRF token")
 
-def generate_state_token() -> str:
-    return jwt.encode(
-        {"state": os.urandom(16).hex(), "iat": datetime.now().timestamp()},
-        settings.JWT_SECRET,
-        algorithm=settings.JWT_ALGORITHM
-    )
-
-def verify_state_token(token: str) -> bool:
-    try:
-        jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+# --- State tokens ---
+# <nonce>.<issued at>.<mac>: 16 random bytes and a 16-byte truncated
+# HMAC-SHA256, base64url, with the issue time in base 36 seconds. State
+# tokens never leave this service, so they stay HMAC-signed with a key
+# derived from STATE_SECRET, separate from JWT_SECRET, which is unused (and
+# may be empty) when access tokens use an asymmetric keyring.
+STATE_TOKEN_MAX_SKEW = 30  # Seconds a token may appear to come from the future
+
+STATE_TOKENS_REJECTED = registry.counter("state_tokens_rejected_total", "OAuth state/CSRF tokens rejected", ("reason",))
+
+_state_key = (None, b"")
+
+def check_state_secret():
+    """Refuse to sign or accept state tokens with an empty key, which would
+    make them forgeable"""
+    if not settings.STATE_SECRET:
+        raise RuntimeError("STATE_SECRET must be set: it signs OAuth state and CSRF tokens")
+
+def _state_mac(message: bytes) -> str:
+    global _state_key
+    secret, key = _state_key
+    if secret != settings.STATE_SECRET:
+        check_state_secret()
+        key = hmac.new(settings.STATE_SECRET.encode(), b"state-token", hashlib.sha256).digest()
+        _state_key = (settings.STATE_SECRET, key)
+    mac = hmac.digest(key, message, "sha256")[:16]  # One-shot C implementation
+    return base64.urlsafe_b64encode(mac).rstrip(b"=").decode()
+
+
+class SeenNonces:
+    """Nonces already consumed, kept until their tokens would have expired anyway.
+
+    Entries are appended in roughly expiry order, so expired ones are
+    dropped from the front; ``max_size`` bounds memory under a flood.
+    Per worker: a replay on another worker still needs the victim's
+    matching state cookie.
+    """
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self._expiry = {}
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def add(self, nonce: str, expires_at: float, now: float) -> bool:
+        """Record ``nonce``; False if it was already used"""
+        expiry = self._expiry
+        while expiry:
+            oldest = next(iter(expiry))
+            if expiry[oldest] > now and len(expiry) < self.max_size:
+                break
+            del expiry[oldest]
+        if nonce in expiry:
+            return False
+        expiry[nonce] = expires_at
         return True
-    except:
+
+
+seen_state_nonces = SeenNonces()
+
+def _base36(value: int) -> str:
+    digits = ""
+    while True:
+        value, digit = divmod(value, 36)
+        digits = "0123456789abcdefghijklmnopqrstuvwxyz"[digit] + digits
+        if not value:
+            return digits
+
+def generate_state_token() -> str:
+    nonce = base64.urlsafe_b64encode(os.urandom(16)).rstrip(b"=").decode()
+    message = f"{nonce}.{_base36(int(time.time()))}"
+    return f"{message}.{_state_mac(message.encode())}"
+
+def verify_state_token(token: str, max_age: int = None, consume: bool = False) -> bool:
+    """Signature and age check; ``consume`` also rejects a second use of the token"""
+    max_age = settings.OAUTH_STATE_MAX_AGE if max_age is None else max_age
+    message, _, mac = (token or "").rpartition(".")
+    if not message or not hmac.compare_digest(mac.encode(), _state_mac(message.encode()).encode()):
+        STATE_TOKENS_REJECTED.labels("signature").inc()
+        return False
+    nonce, _, issued = message.partition(".")
+    now = time.time()
+    issued_at = int(issued, 36)
+    if not now - max_age <= issued_at <= now + STATE_TOKEN_MAX_SKEW:
+        STATE_TOKENS_REJECTED.labels("expired").inc()
+        return False
+    if consume and not seen_state_nonces.add(nonce, issued_at + max_age, now):
+        STATE_TOKENS_REJECTED.labels("replayed").inc()
         return False
+    return True
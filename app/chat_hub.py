@@ -0,0 +1,292 @@
+"""Real-time chat delivery: per-room fan-out, batched persistence and a
+broker seam for running several workers.
+
+A message sent over a WebSocket or posted over REST is queued on the
+``MessageWriter``, which inserts pending messages in one statement every
+few milliseconds. Once stored, it is published through the ``Broker``; every worker's ``ChatHub``
+receives it and pushes the encoded event onto the bounded send queue of
+each local connection in the room. A connection whose queue is full is
+dropped rather than allowed to buffer without limit or stall the room.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import insert, update
+from sqlalchemy.exc import DataError, IntegrityError
+from app.database import AsyncSessionLocal
+from app.db_health import is_connection_error
+from app.metrics import registry, timed
+from app.models import ChatRoom, Message
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Broker:
+    """Carries room events between workers. ``subscribe`` registers a
+    ``handler(room_id, event)`` called for every event published by any worker."""
+
+    async def publish(self, room_id: int, event: dict):
+        raise NotImplementedError
+
+    async def subscribe(self, handler):
+        raise NotImplementedError
+
+    async def unsubscribe(self, handler):
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    """Single-process broker; several hubs sharing one instance behave like
+    workers sharing a redis/NATS channel"""
+
+    def __init__(self):
+        self._handlers = []
+
+    async def publish(self, room_id: int, event: dict):
+        for handler in list(self._handlers):
+            handler(room_id, event)
+
+    async def subscribe(self, handler):
+        self._handlers.append(handler)
+
+    async def unsubscribe(self, handler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+
+class Connection:
+    """One WebSocket in one room, with a bounded queue of encoded events"""
+
+    def __init__(self, websocket, user, room_id: int, queue_size: int):
+        self.websocket = websocket
+        self.user = user
+        self.room_id = room_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = asyncio.Event()
+
+    async def send_forever(self):
+        while True:
+            await self.websocket.send_text(await self.queue.get())
+
+
+class MessageWriter:
+    """Coalesces message inserts: callers await ``submit`` and a background
+    task writes everything pending in one INSERT ... RETURNING per flush"""
+
+    def __init__(self, session_factory, batch_size: int = 100, flush_interval: float = 0.05):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._wakeup = None
+        self._task = None
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+
+    async def submit(self, room_id: int, sender_id: int, content: str) -> dict:
+        """Store a message; resolves to its row (id, created_at, ...) once flushed.
+        Before ``start`` every message is written immediately."""
+        now = datetime.now(timezone.utc)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(({
+            "chat_room_id": room_id,
+            "sender_id": sender_id,
+            "content": content,
+            "created_at": now,
+            "updated_at": now,
+        }, future))
+        if self._task is None:
+            await self.flush()
+        elif len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return await future
+
+    async def _insert(self, rows: list) -> list:
+        """INSERT ``rows`` in one transaction, bumping their rooms' activity; returns their ids"""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                insert(Message.__table__).returning(Message.__table__.c.id, sort_by_parameter_order=True),
+                rows,
+            )
+            ids = result.scalars().all()
+            latest = {}
+            for row in rows:
+                latest[row["chat_room_id"]] = row["created_at"]
+            for room_id, created_at in latest.items():
+                await db.execute(update(ChatRoom).where(ChatRoom.id == room_id).values(updated_at=created_at))
+            await db.commit()
+        return ids
+
+    async def flush(self):
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            with timed("chat_message_flush"):
+                ids = await self._insert([row for row, _ in pending])
+        except Exception as e:
+            if is_connection_error(e) or not isinstance(e, (IntegrityError, DataError)):
+                # Database down (or a fault no single row caused): retrying
+                # each row would wait out a connect timeout per message
+                # while every room's writes queue behind this task
+                logger.error(f"Chat message batch of {len(pending)} failed: {str(e)}")
+                self.failed += len(pending)
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            # One bad row (e.g. a room deleted meanwhile) must not fail every
+            # sender in the batch: retry row by row and fail only the culprits
+            logger.warning(f"Chat message batch failed, retrying rows individually: {str(e)}")
+            ids = []
+            for row, future in pending:
+                try:
+                    ids.append((await self._insert([row]))[0])
+                except Exception as row_error:
+                    ids.append(None)
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(row_error)
+        self.batches += 1
+        for (row, future), message_id in zip(pending, ids):
+            if message_id is None:
+                continue
+            self.written += 1
+            if not future.done():
+                future.set_result({"id": message_id, **row})
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+class ChatHub:
+    def __init__(self, broker: Broker, writer: MessageWriter, queue_size: int = 100):
+        self.broker = broker
+        self.writer = writer
+        self.queue_size = queue_size
+        self._rooms = {}  # room_id -> set of Connections on this worker
+        self._subscribed = False
+        self.delivered = 0
+        self.dropped = 0
+
+    async def _subscribe(self):
+        if not self._subscribed:
+            await self.broker.subscribe(self.deliver)
+            self._subscribed = True
+
+    async def connect(self, websocket, user, room_id: int) -> Connection:
+        await self._subscribe()
+        connection = Connection(websocket, user, room_id, self.queue_size)
+        self._rooms.setdefault(room_id, set()).add(connection)
+        return connection
+
+    def disconnect(self, connection: Connection):
+        members = self._rooms.get(connection.room_id)
+        if members is not None:
+            members.discard(connection)
+            if not members:
+                del self._rooms[connection.room_id]
+
+    @property
+    def connections(self) -> int:
+        return sum(len(members) for members in self._rooms.values())
+
+    def deliver(self, room_id: int, event: dict):
+        """Broker handler: encode once, enqueue for every local connection in the room"""
+        members = self._rooms.get(room_id)
+        if not members:
+            return
+        text = json.dumps(event, default=str)
+        for connection in list(members):
+            try:
+                connection.queue.put_nowait(text)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                # Slow consumer: stop delivering; its socket handler closes it
+                connection.dropped.set()
+                self.dropped += 1
+                self.disconnect(connection)
+
+    async def post(self, room_id: int, user, content: str) -> dict:
+        """Store a message and publish it to the room on every worker; used for
+        both WebSocket and REST posts so every client sees the same stream"""
+        row = await self.writer.submit(room_id, user.id, content)
+        event = {
+            "type": "message",
+            "message": {
+                "id": row["id"],
+                "chat_room_id": row["chat_room_id"],
+                "content": row["content"],
+                "read": False,
+                "created_at": row["created_at"].isoformat(),
+                "sender": {
+                    "id": user.id,
+                    "username": user.username,
+                    "full_name": user.full_name,
+                    "profile_picture": user.profile_picture,
+                },
+            },
+        }
+        await self.broker.publish(room_id, event)
+        return event
+
+    async def send_message(self, connection: Connection, content: str) -> dict:
+        return await self.post(connection.room_id, connection.user, content)
+
+    async def start(self):
+        self.writer.start()
+        await self._subscribe()
+
+    async def stop(self):
+        if self._subscribed:
+            await self.broker.unsubscribe(self.deliver)
+            self._subscribed = False
+        await self.writer.stop()
+
+    def stats(self) -> dict:
+        return {
+            "rooms": len(self._rooms),
+            "connections": self.connections,
+            "delivered": self.delivered,
+            "dropped_slow_consumers": self.dropped,
+            "write_batches": self.writer.batches,
+            "messages_written": self.writer.written,
+            "messages_failed": self.writer.failed,
+        }
+
+
+chat_hub = ChatHub(
+    InMemoryBroker(),
+    MessageWriter(AsyncSessionLocal, batch_size=settings.CHAT_WRITE_BATCH_SIZE, flush_interval=settings.CHAT_WRITE_FLUSH_INTERVAL),
+    queue_size=settings.CHAT_SEND_QUEUE_SIZE,
+)
+
+registry.callback("chat_connections", "Open chat WebSockets on this worker", lambda: chat_hub.connections)
+registry.callback("chat_slow_consumers_dropped_total", "Chat WebSockets dropped for a full send queue",
+                  lambda: chat_hub.dropped, type="counter")
+registry.callback("chat_messages_written_total", "Chat messages persisted by the batched writer",
+                  lambda: chat_hub.writer.written, type="counter")
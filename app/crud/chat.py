@@ -0,0 +1,177 @@
+import base64
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import and_, exists, func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from app.metrics import timed_stage
+from app.models import ChatRoom, Message, User, chat_room_users
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque keyset position: (timestamp, id) of the last row on a page"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError as e:
+        raise InvalidCursor(str(e))
+
+
+def _now() -> datetime:
+    # Set in Python rather than by the database so SQLite stores sortable
+    # timestamps with sub-second precision for keyset comparisons
+    return datetime.now(timezone.utc)
+
+
+def _page(rows: list, limit: int, key):
+    """Split ``limit + 1`` fetched rows into a page and the cursor for the next one"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    timestamp, row_id = key(rows[-1])
+    return rows, encode_cursor(timestamp, row_id)
+
+
+@timed_stage("crud.create_room")
+async def create_room_async(db: AsyncSession, creator_id: int, member_emails: list, name: Optional[str] = None,
+                            is_group: bool = False) -> ChatRoom:
+    now = _now()
+    room = ChatRoom(name=name, is_group=is_group, created_at=now, updated_at=now)
+    db.add(room)
+    await db.flush()
+    # The creator has joined; added members are invited until they open the room
+    member_positions = {creator_id: 0}
+    if member_emails:
+        for user_id in (await db.scalars(select(User.id).where(User.email.in_(member_emails)))).all():
+            member_positions.setdefault(user_id, None)
+    await db.execute(
+        insert(chat_room_users),
+        [{"user_id": user_id, "chat_room_id": room.id, "last_read_message_id": position}
+         for user_id, position in member_positions.items()],
+    )
+    await db.commit()
+    return await get_room_async(db, room.id)
+
+
+async def get_room_async(db: AsyncSession, room_id: int) -> Optional[ChatRoom]:
+    result = await db.scalars(
+        select(ChatRoom)
+        .where(ChatRoom.id == room_id)
+        .options(selectinload(ChatRoom.users), raiseload("*"))
+        .execution_options(populate_existing=True)
+    )
+    return result.first()
+
+
+async def is_member_async(db: AsyncSession, room_id: int, user_id: int) -> bool:
+    return await db.scalar(select(exists().where(
+        chat_room_users.c.chat_room_id == room_id, chat_room_users.c.user_id == user_id
+    )))
+
+
+@timed_stage("crud.list_rooms")
+async def list_rooms_async(db: AsyncSession, user_id: int, limit: int = 50, cursor: Optional[str] = None):
+    """A user's rooms by latest activity, with members and per-room unread counts.
+
+    Three queries per page regardless of its size: rooms, their members
+    (one IN query via selectinload) and grouped unread counts.
+    """
+    query = (
+        select(ChatRoom)
+        .join(chat_room_users, chat_room_users.c.chat_room_id == ChatRoom.id)
+        .where(chat_room_users.c.user_id == user_id)
+        .options(selectinload(ChatRoom.users), raiseload("*"))
+        .order_by(ChatRoom.updated_at.desc(), ChatRoom.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        query = query.where(tuple_(ChatRoom.updated_at, ChatRoom.id) < tuple_(*decode_cursor(cursor)))
+    rooms, next_cursor = _page(list((await db.scalars(query)).all()), limit, lambda r: (r.updated_at, r.id))
+    unread = await unread_counts_async(db, [room.id for room in rooms], user_id)
+    return [(room, unread.get(room.id, 0)) for room in rooms], next_cursor
+
+
+async def unread_counts_async(db: AsyncSession, room_ids: list, user_id: int) -> dict:
+    """Messages from other members after the user's read position, per room
+    (a range scan on ix_messages_room_id)"""
+    if not room_ids:
+        return {}
+    membership = chat_room_users.c
+    result = await db.execute(
+        select(Message.chat_room_id, func.count())
+        .join(chat_room_users, and_(membership.chat_room_id == Message.chat_room_id, membership.user_id == user_id))
+        .where(
+            Message.chat_room_id.in_(room_ids),
+            Message.id > func.coalesce(membership.last_read_message_id, 0),
+            Message.sender_id != user_id,
+        )
+        .group_by(Message.chat_room_id)
+    )
+    return dict(result.all())
+
+
+async def read_positions_async(db: AsyncSession, room_id: int) -> dict:
+    """user_id -> last read message id (0 when nothing is read) for a room's members"""
+    result = await db.execute(
+        select(chat_room_users.c.user_id, func.coalesce(chat_room_users.c.last_read_message_id, 0))
+        .where(chat_room_users.c.chat_room_id == room_id)
+    )
+    return dict(result.all())
+
+
+@timed_stage("crud.list_messages")
+async def list_messages_async(db: AsyncSession, room_id: int, limit: int = 50, cursor: Optional[str] = None):
+    """Newest-first page of a room's messages via ix_messages_room_created_id,
+    with senders joined in the same query"""
+    query = (
+        select(Message)
+        .where(Message.chat_room_id == room_id)
+        .options(joinedload(Message.sender), raiseload("*"))
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        query = query.where(tuple_(Message.created_at, Message.id) < tuple_(*decode_cursor(cursor)))
+    messages = list((await db.scalars(query)).all())
+    return _page(messages, limit, lambda m: (m.created_at, m.id))
+
+
+@timed_stage("crud.mark_read")
+async def mark_read_async(db: AsyncSession, room_id: int, user_id: int, up_to_id: Optional[int] = None) -> int:
+    """Move the user's read position to ``up_to_id`` (default: the newest
+    message); returns how many of other members' messages became read.
+    Positions only move forward and never past the newest message."""
+    membership = chat_room_users.c
+    is_member = and_(membership.chat_room_id == room_id, membership.user_id == user_id)
+    newest = await db.scalar(select(func.max(Message.id)).where(Message.chat_room_id == room_id)) or 0
+    target = newest if up_to_id is None else max(min(up_to_id, newest), 0)
+    # -1 for an invited member who never opened the room: marking it read
+    # joins it, even when there is nothing to read yet
+    previous = await db.scalar(select(func.coalesce(membership.last_read_message_id, -1)).where(is_member))
+    if previous is None or target <= previous:
+        return 0
+    marked = await db.scalar(
+        select(func.count()).select_from(Message).where(
+            Message.chat_room_id == room_id,
+            Message.id > previous,
+            Message.id <= target,
+            Message.sender_id != user_id,
+        )
+    )
+    await db.execute(
+        update(chat_room_users)
+        .where(is_member, func.coalesce(membership.last_read_message_id, -1) < target)
+        .values(last_read_message_id=target)
+    )
+    await db.commit()
+    return marked
@@ -0,0 +1,55 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth.jwt import create_refresh_token
+from app.auth.revocation import revocation_store
+from app.metrics import timed_stage
+from app.models import RefreshToken
+from config import settings
+
+@timed_stage("crud.issue_refresh_token")
+async def issue_refresh_token(db: AsyncSession, email: str, family_id: str = None) -> str:
+    """Record and return a refresh token; a new login starts a new family"""
+    family_id = family_id or uuid.uuid4().hex
+    token, jti, expires_at = create_refresh_token(email, family_id)
+    db.add(RefreshToken(
+        jti=jti,
+        family_id=family_id,
+        user_email=email,
+        expires_at=expires_at.replace(tzinfo=timezone.utc),
+    ))
+    await db.commit()
+    return token
+
+@timed_stage("crud.consume_refresh_token")
+async def consume_refresh_token(db: AsyncSession, jti: str) -> bool:
+    """Mark a refresh token used; False if it was already used or revoked"""
+    result = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.jti == jti,
+            RefreshToken.used_at.is_(None),
+            RefreshToken.revoked.is_(False),
+        )
+        .values(used_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+@timed_stage("crud.revoke_refresh_family")
+async def revoke_refresh_family(db: AsyncSession, family_id: str):
+    """Revoke every refresh token of a family and the access tokens issued from it"""
+    await db.execute(
+        update(RefreshToken).where(RefreshToken.family_id == family_id).values(revoked=True)
+    )
+    await db.commit()
+    # Tokens of this family can be valid for at most one refresh lifetime from now
+    expires_at = datetime.now(timezone.utc) + timedelta(days=settings.JWT_REFRESH_EXPIRE_DAYS)
+    await revocation_store.revoke(db, family_id, expires_at)
+
+async def revoke_access_token(db: AsyncSession, payload: dict):
+    if "jti" not in payload:
+        return  # Issued before tokens carried a jti; expires on its own
+    expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+    await revocation_store.revoke(db, payload["jti"], expires_at)
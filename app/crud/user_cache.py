@@ -0,0 +1,192 @@
+import json
+import logging
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from functools import cached_property
+from typing import Optional
+import orjson
+from app.cache import TTLCache
+from app.metrics import registry
+from app.schemas import UserOut
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Returned by UserCache.get when the email is not cached at all; a cached
+# ``None`` means "known not to exist" (negative entry).
+NOT_CACHED = object()
+
+_DATETIME_FIELDS = ("last_seen", "created_at", "updated_at")
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Immutable copy of a User row that is safe to share between requests.
+
+    Deliberately excludes ``hashed_password``; login still reads the row.
+    """
+    id: int
+    email: str
+    username: str
+    full_name: Optional[str] = None
+    profile_picture: Optional[str] = None
+    is_active: bool = True
+    is_online: bool = False
+    last_seen: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            full_name=user.full_name,
+            profile_picture=user.profile_picture,
+            is_active=bool(user.is_active),
+            is_online=bool(user.is_online),
+            last_seen=user.last_seen,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+    @cached_property
+    def profile_json(self) -> bytes:
+        """Serialized ``UserOut``, built once per snapshot. Snapshots are
+        replaced whenever the row changes, so the bytes never go stale
+        relative to the snapshot they were built from."""
+        return orjson.dumps(UserOut.from_orm(self).dict())
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        for field in _DATETIME_FIELDS:
+            if data[field] is not None:
+                data[field] = data[field].isoformat()
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw) -> "UserSnapshot":
+        data = json.loads(raw)
+        for field in _DATETIME_FIELDS:
+            if data.get(field) is not None:
+                data[field] = datetime.fromisoformat(data[field])
+        return cls(**data)
+
+
+class UserCacheBackend:
+    """Storage interface for UserCache. ``get`` returns NOT_CACHED on a miss."""
+
+    async def get(self, email: str):
+        raise NotImplementedError
+
+    async def set(self, email: str, snapshot: Optional[UserSnapshot], ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, email: str):
+        raise NotImplementedError
+
+
+class InMemoryUserCacheBackend(UserCacheBackend):
+    """Per-process LRU with TTL (the default)"""
+
+    def __init__(self, maxsize: int = 10000):
+        self._cache = TTLCache(maxsize=maxsize)
+
+    async def get(self, email: str):
+        return self._cache.get(email, NOT_CACHED)
+
+    async def set(self, email: str, snapshot: Optional[UserSnapshot], ttl: float):
+        self._cache.set(email, snapshot, ttl=ttl)
+
+    async def delete(self, email: str):
+        self._cache.delete(email)
+
+
+class KeyValueUserCacheBackend(UserCacheBackend):
+    """Shared backend over any async key-value client with a redis-style
+    ``get(key)``, ``set(key, value, ex=seconds)`` and ``delete(key)``."""
+
+    NEGATIVE = "-"
+
+    def __init__(self, client, prefix: str = "user:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, email: str):
+        raw = await self.client.get(self.prefix + email)
+        if raw is None:
+            return NOT_CACHED
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        return None if raw == self.NEGATIVE else UserSnapshot.from_json(raw)
+
+    async def set(self, email: str, snapshot: Optional[UserSnapshot], ttl: float):
+        value = self.NEGATIVE if snapshot is None else snapshot.to_json()
+        await self.client.set(self.prefix + email, value, ex=max(int(ttl), 1))
+
+    async def delete(self, email: str):
+        await self.client.delete(self.prefix + email)
+
+
+class UserCache:
+    """Read-through cache of UserSnapshots keyed by email, with negative
+    entries for unknown emails. Backend errors degrade to cache misses."""
+
+    def __init__(self, backend: UserCacheBackend, ttl: float = 60.0, negative_ttl: float = 10.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    async def get(self, email: str):
+        try:
+            cached = await self.backend.get(email)
+        except Exception as e:
+            logger.warning(f"User cache read failed: {str(e)}")
+            cached = NOT_CACHED
+        if cached is NOT_CACHED:
+            self.misses += 1
+        elif cached is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return cached
+
+    async def put(self, email: str, snapshot: Optional[UserSnapshot]):
+        ttl = self.ttl if snapshot is not None else self.negative_ttl
+        try:
+            await self.backend.set(email, snapshot, ttl)
+        except Exception as e:
+            logger.warning(f"User cache write failed: {str(e)}")
+
+    async def invalidate(self, email: str):
+        try:
+            await self.backend.delete(email)
+        except Exception as e:
+            logger.warning(f"User cache invalidation failed: {str(e)}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+user_cache = UserCache(
+    InMemoryUserCacheBackend(maxsize=settings.USER_CACHE_SIZE),
+    ttl=settings.USER_CACHE_TTL,
+    negative_ttl=settings.USER_CACHE_NEGATIVE_TTL,
+)
+
+registry.callback(
+    "user_cache_lookups_total", "User cache lookups by result",
+    lambda: {("hit",): user_cache.hits, ("negative_hit",): user_cache.negative_hits, ("miss",): user_cache.misses},
+    type="counter", labelnames=("result",),
+)
@@ -1,6 +1,16 @@
+import hashlib
+import sqlite3
+from typing import Optional
+from sqlalchemy import case, exists, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models import User
-from app.schemas import UserCreate
+from app.schemas import UserCreate, UserUpdate
+from app.crud.user_cache import UserSnapshot, NOT_CACHED, user_cache
+from app.metrics import timed_stage
 
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
@@ -26,3 +36,230 @@ def create_or_update_user(db: Session, email: str):
         db.commit()
         db.refresh(user)
     return user
+
+# --- Async variants (AsyncSession) used by the request handlers ---
+@timed_stage("crud.get_user_by_email")
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def get_cached_user_by_email(db: AsyncSession, email: str):
+    """Read-through lookup returning a UserSnapshot, or None for unknown emails"""
+    cached = await user_cache.get(email)
+    if cached is not NOT_CACHED:
+        return cached
+    user = await get_user_by_email_async(db, email)
+    snapshot = UserSnapshot.from_user(user) if user else None
+    await user_cache.put(email, snapshot)
+    return snapshot
+
+@timed_stage("crud.get_users_by_emails")
+async def get_cached_users_by_emails(db: AsyncSession, emails) -> dict:
+    """email -> UserSnapshot (or None) for each of ``emails``; cache misses are
+    resolved together in one ``WHERE email IN (...)`` query"""
+    found = {}
+    missing = []
+    for email in set(emails):
+        cached = await user_cache.get(email)
+        if cached is NOT_CACHED:
+            missing.append(email)
+        else:
+            found[email] = cached
+    if missing:
+        result = await db.execute(select(User).where(User.email.in_(missing)))
+        rows = {user.email: UserSnapshot.from_user(user) for user in result.scalars()}
+        for email in missing:
+            found[email] = rows.get(email)
+            await user_cache.put(email, found[email])
+    return found
+
+def _usernames(email: str) -> tuple:
+    """Preferred username and its deterministic fallback for a taken one"""
+    base = email.split("@")[0]
+    return base, f"{base}-{hashlib.sha256(email.encode()).hexdigest()[:8]}"
+
+def _available_username(email: str):
+    """SQL expression choosing the email's local part, or its hashed fallback if taken"""
+    base, suffixed = _usernames(email)
+    return case((exists().where(User.username == base), suffixed), else_=base)
+
+async def assign_usernames_async(db: AsyncSession, emails: list) -> dict:
+    """email -> username for a batch of new users: the local part unless an
+    existing user or an earlier email in ``emails`` already has it, else the
+    hashed fallback. One query for the whole batch."""
+    candidates = {email: _usernames(email) for email in emails}
+    taken = set((await db.scalars(
+        select(User.username).where(User.username.in_({base for base, _ in candidates.values()}))
+    )).all())
+    assigned = {}
+    for email, (base, suffixed) in candidates.items():
+        assigned[email] = suffixed if base in taken else base
+        taken.add(assigned[email])
+    return assigned
+
+@timed_stage("crud.create_user")
+async def create_user_async(db: AsyncSession, user_in: UserCreate, hashed_password: str):
+    """Insert a password user; alice@a.com and alice@b.com get distinct usernames,
+    so an IntegrityError here means the email itself is taken"""
+    user = User(
+        email=user_in.email,
+        # Resolved by the database in the INSERT, like OAuth users
+        username=_available_username(user_in.email),
+        hashed_password=hashed_password,
+        full_name=user_in.full_name,
+    )
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    await user_cache.invalidate(user.email)
+    return user
+
+def _supports_upsert_returning(dialect) -> bool:
+    if dialect.name == "postgresql":
+        return True
+    # ON CONFLICT ... RETURNING needs SQLite 3.35 (the library both drivers link)
+    return dialect.name == "sqlite" and sqlite3.sqlite_version_info >= (3, 35)
+
+async def _upsert_oauth_user(db: AsyncSession, email: str, full_name: Optional[str], profile_picture: Optional[str]):
+    insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    now = func.now()
+    stmt = insert(User).values(
+        email=email,
+        # Resolved by the database in the same statement, so no extra round trip
+        username=_available_username(email),
+        hashed_password="oauth_user",
+        full_name=full_name,
+        profile_picture=profile_picture,
+        is_active=True,
+        is_online=False,
+        last_seen=now,
+        created_at=now,
+        updated_at=now,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.email],
+        set_={
+            "last_seen": now,
+            "full_name": func.coalesce(User.full_name, stmt.excluded.full_name),
+            "profile_picture": func.coalesce(User.profile_picture, stmt.excluded.profile_picture),
+        },
+    ).returning(User)
+    user = (await db.scalars(stmt, execution_options={"populate_existing": True})).one()
+    await db.commit()
+    return user
+
+async def _select_then_insert_oauth_user(db: AsyncSession, email: str, full_name: Optional[str], profile_picture: Optional[str]):
+    user = await get_user_by_email_async(db, email)
+    if user:
+        return user
+    base, suffixed = _usernames(email)
+    taken = await db.scalar(select(exists().where(User.username == base)))
+    user = User(
+        email=email,
+        username=suffixed if taken else base,
+        hashed_password="oauth_user",
+        full_name=full_name,
+        profile_picture=profile_picture,
+    )
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+@timed_stage("crud.create_or_update_user")
+async def create_or_update_user_async(
+    db: AsyncSession, email: str, full_name: Optional[str] = None, profile_picture: Optional[str] = None
+):
+    """Provision an OAuth user in one INSERT ... ON CONFLICT (email) DO UPDATE ... RETURNING.
+
+    Concurrent first logins for the same email both get the one row. A taken
+    username falls back to ``<name>-<email hash>``; if another insert claims
+    it between the check and the write, the statement is retried once.
+    """
+    upsert = _upsert_oauth_user if _supports_upsert_returning(db.bind.dialect) else _select_then_insert_oauth_user
+    try:
+        user = await upsert(db, email, full_name, profile_picture)
+    except IntegrityError:
+        await db.rollback()
+        user = await upsert(db, email, full_name, profile_picture)
+    await user_cache.invalidate(email)
+    return user
+
+@timed_stage("crud.update_user_profile")
+async def update_user_profile_async(db: AsyncSession, email: str, user_in: UserUpdate):
+    user = await get_user_by_email_async(db, email)
+    if not user:
+        return None
+    for field, value in user_in.dict(exclude_unset=True).items():
+        setattr(user, field, value)
+    await db.commit()
+    await db.refresh(user)
+    await user_cache.invalidate(email)
+    return user
+
+@timed_stage("crud.update_password_hash")
+async def update_password_hash_async(db: AsyncSession, user_id: int, old_hash: str, new_hash: str) -> bool:
+    """Swap in an upgraded hash unless the password changed in the meantime"""
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id, User.hashed_password == old_hash)
+        .values(hashed_password=new_hash)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+# --- Bulk provisioning ---
+_BULK_COLUMNS = ("email", "username", "hashed_password", "full_name")
+
+_COPY_STAGING = text(
+    "CREATE TEMP TABLE IF NOT EXISTS users_import "
+    "(email text, username text, hashed_password text, full_name text) ON COMMIT DELETE ROWS"
+)
+
+async def _copy_upsert_users(db: AsyncSession, rows: list, update_existing: bool):
+    """asyncpg only: COPY into a temp staging table, then one INSERT ... SELECT"""
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await db.execute(_COPY_STAGING)
+    await raw.driver_connection.copy_records_to_table(
+        "users_import", records=[tuple(row[c] for c in _BULK_COLUMNS) for row in rows], columns=_BULK_COLUMNS
+    )
+    conflict = (
+        "DO UPDATE SET hashed_password = EXCLUDED.hashed_password, "
+        "full_name = COALESCE(EXCLUDED.full_name, users.full_name), updated_at = now()"
+        if update_existing else "DO NOTHING"
+    )
+    result = await db.execute(text(
+        "INSERT INTO users (email, username, hashed_password, full_name, is_active, is_online, "
+        "last_seen, created_at, updated_at) "
+        "SELECT email, username, hashed_password, full_name, true, false, now(), now(), now() "
+        f"FROM users_import ON CONFLICT (email) {conflict} RETURNING email"
+    ))
+    return result.scalars().all()
+
+@timed_stage("crud.bulk_upsert_users")
+async def bulk_upsert_users_async(db: AsyncSession, rows: list, update_existing: bool = False) -> list:
+    """Insert ``rows`` (dicts of email, username, hashed_password, full_name) in one
+    round trip; returns the emails written. Existing emails are left alone unless
+    ``update_existing``, which replaces their password hash and full name.
+    The caller commits and invalidates the user cache.
+    """
+    dialect = db.bind.dialect
+    if dialect.name == "postgresql" and dialect.driver == "asyncpg":
+        written = await _copy_upsert_users(db, rows, update_existing)
+    else:
+        insert = pg_insert if dialect.name == "postgresql" else sqlite_insert
+        stmt = insert(User).values(rows)
+        if update_existing:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.email],
+                set_={
+                    "hashed_password": stmt.excluded.hashed_password,
+                    "full_name": func.coalesce(stmt.excluded.full_name, User.full_name),
+                    "updated_at": func.now(),
+                },
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[User.email])
+        written = (await db.execute(stmt.returning(User.email))).scalars().all()
+    return written
@@ -1,76 +1,184 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
-from typing import Generator
-import time
+from fastapi import HTTPException, status
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Generator
 import logging
+from app.db_health import (
+    CircuitBreaker,
+    PoolHealthMonitor,
+    PoolWaitStats,
+    TimedAsyncQueuePool,
+    TimedQueuePool,
+    is_connection_error,
+    pool_stats,
+)
+from app.metrics import registry
 from config import settings
 
 GLOBAL_PATH = settings.GLOBAL_PATH
 
 logger = logging.getLogger(__name__)
 
-# Configure database with connection pooling and advanced options
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,  # Enables connection pre-ping
-    pool_recycle=3600,   # Recycle connections after 1 hour
-    pool_timeout=30,     # Wait up to 30 seconds for a connection
-    pool_size=5,         # Maintain up to 5 connections
-    max_overflow=10,     # Allow up to 10 more connections in high load
-    echo=False,          # Set to True to log all SQL queries (very verbose)
-    connect_args={
-        "connect_timeout": 10,  # Timeout of 10 seconds when connecting
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def _engine_options(url) -> dict:
+    """Pooling and driver-specific connect timeout (10 seconds) for an engine URL"""
+    driver = make_url(url).drivername
+    if driver.startswith("sqlite"):
+        # SQLite has no server to pool connections to or time out against
+        return {"echo": False}
+    return {
+        "poolclass": TimedAsyncQueuePool if driver.endswith("+asyncpg") else TimedQueuePool,
+        "pool_pre_ping": True,  # Enables connection pre-ping
+        "pool_recycle": 3600,   # Recycle connections after 1 hour
+        "pool_timeout": 30,     # Wait up to 30 seconds for a connection
+        "pool_size": settings.DB_POOL_SIZE,          # Connections kept open
+        "max_overflow": settings.DB_MAX_OVERFLOW,    # Extra connections under high load
+        "echo": False,          # Set to True to log all SQL queries (very verbose)
+        "connect_args": {"timeout": 10} if driver.endswith("+asyncpg") else {"connect_timeout": 10},
     }
+
+def _async_database_url(url: str):
+    """Map DATABASE_URL onto its asyncio driver (asyncpg / aiosqlite)"""
+    url = make_url(url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    if url.drivername.endswith("+asyncpg") and "sslmode" in url.query:
+        # asyncpg spells libpq's sslmode as ssl
+        url = url.update_query_dict({"ssl": url.query["sslmode"]}).difference_update_query(["sslmode"])
+    return url
+
+# Engines are created on first use rather than at import, so importing the
+# app (tests, CLIs, worker boot) does not load database drivers or need a
+# DATABASE_URL until something actually talks to the database.
+# Connection wait times for both pools feed one PoolWaitStats.
+pool_wait_stats = PoolWaitStats()
+_engine = None
+_async_engine = None
+
+def get_engine():
+    """Sync engine (migrations), same pooling policy as the async one"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
+        _engine.pool.wait_stats = pool_wait_stats
+    return _engine
+
+def get_async_engine():
+    """Async engine used by the request handlers"""
+    global _async_engine
+    if _async_engine is None:
+        url = _async_database_url(settings.DATABASE_URL)
+        _async_engine = create_async_engine(url, **_engine_options(url))
+        _async_engine.pool.wait_stats = pool_wait_stats
+    return _async_engine
+
+class _LazySessionFactory:
+    """Callable like a sessionmaker, bound to its engine on first call"""
+
+    def __init__(self, make):
+        self._make = make
+        self._factory = None
+
+    def __call__(self, **kwargs):
+        if self._factory is None:
+            self._factory = self._make()
+        return self._factory(**kwargs)
+
+SessionLocal = _LazySessionFactory(lambda: sessionmaker(autocommit=False, autoflush=False, bind=get_engine()))
+
+# expire_on_commit=False so returned objects stay readable without lazy IO
+AsyncSessionLocal = _LazySessionFactory(
+    lambda: async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def __getattr__(name):
+    # ``from app.database import engine`` keeps working, creating it on demand
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "ASYNC_DATABASE_URL":
+        return _async_database_url(settings.DATABASE_URL)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# A breaker shared by both session providers, and the background probe
+# that opens/closes it
+db_breaker = CircuitBreaker(
+    failure_threshold=settings.DB_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.DB_BREAKER_RESET_TIMEOUT,
+)
+db_monitor = PoolHealthMonitor(get_async_engine, db_breaker, interval=settings.DB_HEALTH_CHECK_INTERVAL)
 
 Base = declarative_base()
 
-# Set up connection retry logic
-MAX_RETRIES = 3
-RETRY_BACKOFF = 0.5  # Start with 0.5 second delay
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+registry.callback("db_breaker_state", "Database circuit breaker (0 closed, 1 half-open, 2 open)",
+                  lambda: _BREAKER_STATES[db_breaker.state])
+registry.callback(
+    "db_pool_connections", "Request-path pool connections by state",
+    lambda: {(k,): v for k, v in _pool_stats().items() if k in ("checked_out", "checked_in", "overflow")},
+    labelnames=("state",),
+)
 
-# Dependency to get DB session with retry logic
+def _pool_stats() -> dict:
+    if _async_engine is None:
+        return {"pool": None}
+    return pool_stats(_async_engine.pool, pool_wait_stats)
+
+def _check_breaker():
+    if not db_breaker.allow():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database unavailable",
+            headers={"Retry-After": str(int(db_breaker.reset_timeout))},
+        )
+
+def _record_error(e: Exception):
+    if is_connection_error(e):
+        db_breaker.record_failure()
+    logger.error(f"Database error: {str(e)}")
+
+# Dependency to get a DB session. Sessions check out a pooled connection
+# lazily on their first query, and pool_pre_ping validates it, so there is
+# no probe or retry here; while the breaker is open we fail fast instead.
 def get_db() -> Generator:
-    db = None
-    retries = 0
-    
-    while retries < MAX_RETRIES:
-        try:
-            db = SessionLocal()
-            # Test connection is working
-            from sqlalchemy import text
-            db.execute(text("SELECT 1"))
-            break
-        except Exception as e:
-            if db:
-                db.close()
-            
-            retries += 1
-            if retries >= MAX_RETRIES:
-                logger.error(f"Failed to connect to database after {MAX_RETRIES} attempts")
-                raise
-                
-            # Exponential backoff
-            sleep_time = RETRY_BACKOFF * (2 ** (retries - 1))
-            logger.warning(f"Database connection failed, retrying in {sleep_time}s... ({retries}/{MAX_RETRIES})")
-            time.sleep(sleep_time)
-    
+    _check_breaker()
+    db = SessionLocal()
     try:
         yield db
     except Exception as e:
-        logger.error(f"Database error: {str(e)}")
+        _record_error(e)
         raise
     finally:
-        if db:
-            db.close()
+        db.close()
 
-# Create all tables
-def create_tables():
-    try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
-    except Exception as e:
-        logger.error(f"Error creating database tables: {str(e)}")
-        raise
+# AsyncSession under the same policy as get_db, for routes that only
+# sometimes touch the database and so cannot take it as a dependency
+@asynccontextmanager
+async def guarded_async_session() -> AsyncGenerator[AsyncSession, None]:
+    _check_breaker()
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            _record_error(e)
+            raise
+    if db_breaker.state == "half_open":
+        db_breaker.record_success()
+
+# Dependency to get an AsyncSession
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with guarded_async_session() as db:
+        yield db
+
+def db_stats() -> dict:
+    """Circuit breaker state and pool stats for the request-path engine"""
+    return {"breaker": db_breaker.stats(), "pool": _pool_stats()}
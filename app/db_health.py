@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.metrics import STAGE_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Raised while connecting, before the driver has a connection to report on
+CONNECTION_ERRORS = (ConnectionError, OSError)
+# SQLSTATE class 08 (connection exception) and the 57P0x shutdown codes
+CONNECTION_SQLSTATES = ("08", "57P01", "57P02", "57P03")
+# sqlite3 error names that mean the database file is unusable
+CONNECTION_SQLITE_ERRORS = ("SQLITE_CANTOPEN", "SQLITE_IOERR", "SQLITE_NOTADB")
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """True when the database is unreachable, as opposed to a failing statement.
+
+    Deadlocks, lock timeouts and serialization failures are OperationalErrors
+    too, but they say nothing about reachability, so they are classified by
+    SQLSTATE (or the sqlite3 error name) rather than by exception class.
+    """
+    if isinstance(exc, CONNECTION_ERRORS):
+        return True
+    if not isinstance(exc, DBAPIError):
+        return False
+    if exc.connection_invalidated:
+        return True
+    orig = exc.orig
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    if sqlstate:
+        return sqlstate.startswith(CONNECTION_SQLSTATES)
+    sqlite_error = getattr(orig, "sqlite_errorname", None)
+    if sqlite_error:
+        return sqlite_error.startswith(CONNECTION_SQLITE_ERRORS)
+    # No code to go by (e.g. psycopg2 failing to connect): the driver's
+    # connection-level classes
+    return isinstance(exc, (OperationalError, InterfaceError))
+
+
+class CircuitBreaker:
+    """Fails fast while the database is known to be down.
+
+    closed -> open after ``failure_threshold`` consecutive failures; after
+    ``reset_timeout`` seconds requests are let through again (half-open) and
+    the first success closes the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+        return True
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info("Database reachable again, closing circuit breaker")
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.error(f"Database unreachable after {self.failures} failures, opening circuit breaker")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+
+class PoolWaitStats:
+    """Time spent waiting for a pooled connection"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class _TimedPoolMixin:
+    wait_stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - started
+            STAGE_DURATION.labels("db_checkout").observe(elapsed)
+            if self.wait_stats is not None:
+                self.wait_stats.record(elapsed)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_stats(pool, wait_stats: PoolWaitStats) -> dict:
+    """Checked-out, overflow and wait-time figures for a connection pool"""
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    stats.update({
+        "checkouts": wait_stats.checkouts,
+        "avg_wait_ms": round(wait_stats.wait_seconds_total / wait_stats.checkouts * 1000, 3) if wait_stats.checkouts else 0.0,
+        "max_wait_ms": round(wait_stats.wait_seconds_max * 1000, 3),
+    })
+    return stats
+
+
+class PoolHealthMonitor:
+    """Background task that probes the database and drives the circuit breaker.
+
+    ``engine`` may be a zero-argument function returning the engine, so the
+    engine is only created once probing starts.
+    """
+
+    def __init__(self, engine, breaker: CircuitBreaker, interval: float = 5.0, timeout: float = 5.0):
+        self.engine = engine
+        self.breaker = breaker
+        self.interval = interval
+        self.timeout = timeout
+        self._task = None
+
+    async def _ping(self):
+        engine = self.engine() if callable(self.engine) else self.engine
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def probe(self) -> bool:
+        try:
+            await asyncio.wait_for(self._ping(), self.timeout)
+        except Exception as e:
+            logger.warning(f"Database health probe failed: {str(e)}")
+            self.breaker.record_failure()
+            return False
+        self.breaker.record_success()
+        return True
+
+    async def _run(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
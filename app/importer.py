@@ -0,0 +1,239 @@
+"""Bulk user import from streamed JSONL or CSV.
+
+Used by ``POST /admin/users/import`` and from the command line:
+
+    python -m app.importer users.jsonl [--format csv] [--on-conflict update] [--chunk-size 500]
+
+Each record carries ``email``, ``full_name`` and either ``password`` (hashed
+on the hashing pool) or ``hashed_password`` (any scheme in PASSWORD_SCHEMES,
+upgraded on the user's next login). Rows are written in chunks with one
+upsert per chunk; invalid or conflicting rows are reported by line number
+and never abort the rest of the import.
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import sys
+from dataclasses import asdict, dataclass, field
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from app.auth.hashing import hashing_pool
+from app.auth.password import get_password_hash_async, pwd_context
+from app.crud.user_cache import user_cache
+from app.crud.users import assign_usernames_async, bulk_upsert_users_async
+from app.metrics import registry
+from app.schemas import UserImport
+
+FORMATS = ("jsonl", "csv")
+MAX_REPORTED_ERRORS = 1000
+
+# Backoff while the hashing pool sheds load
+HASH_RETRY_DELAY = 0.05
+HASH_RETRY_MAX_DELAY = 1.0
+
+IMPORTED = registry.counter("users_imported_total", "Bulk import rows by outcome", ("result",))
+HASH_RETRIES = registry.counter("users_import_hash_retries_total", "Import hashes retried after the hashing pool shed load")
+
+
+@dataclass
+class ImportReport:
+    processed: int = 0
+    written: int = 0
+    skipped: int = 0  # existing emails left untouched (on_conflict=skip)
+    failed: int = 0
+    errors: list = field(default_factory=list)  # first MAX_REPORTED_ERRORS of them
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        IMPORTED.labels("failed").inc()
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+async def iter_lines(chunks):
+    """Split an async stream of bytes/str chunks into lines as they arrive"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def parse_records(lines, format: str = "jsonl"):
+    """Yield ``(line_number, record_or_error_message)``; CSV needs a header line
+    and one record per line"""
+    header = None
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        if format == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_number, f"expected {len(header)} columns, got {len(values)}"
+                continue
+            yield line_number, {name: value or None for name, value in zip(header, values)}
+        else:
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, f"invalid JSON: {str(e)}"
+                continue
+            yield line_number, record if isinstance(record, dict) else "expected a JSON object"
+
+
+def _validate(record: dict):
+    """UserImport for a record, or an error message"""
+    try:
+        user = UserImport.parse_obj(record)
+    except ValidationError as e:
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+    if user.hashed_password and pwd_context.identify(user.hashed_password) is None:
+        return "hashed_password is not in a configured scheme"
+    return user
+
+
+async def _hash_with_backoff(password: str) -> str:
+    """Hash on the pool, waiting out load shedding (a login burst filling the
+    queue) instead of failing the import"""
+    delay = HASH_RETRY_DELAY
+    while True:
+        try:
+            return await get_password_hash_async(password)
+        except HTTPException as e:
+            if e.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+                raise
+            HASH_RETRIES.inc()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, HASH_RETRY_MAX_DELAY)
+
+
+async def _hash_passwords(users: list):
+    """Hash plain passwords at most ``hashing_pool.workers`` at a time, leaving
+    the pool's queue free for interactive logins"""
+    limit = asyncio.Semaphore(hashing_pool.workers)
+
+    async def hashed(user):
+        if user.hashed_password:
+            return user.hashed_password
+        async with limit:
+            return await _hash_with_backoff(user.password)
+    return await asyncio.gather(*(hashed(user) for user in users))
+
+
+async def _write_chunk(session_factory, chunk: list, update_existing: bool, report: ImportReport):
+    hashes = await _hash_passwords([user for _, user in chunk])
+    failed_before = report.failed
+    async with session_factory() as db:
+        # Same rule as registration, and distinct within the chunk, so
+        # john@a.com and john@b.com do not collide in the bulk insert
+        usernames = await assign_usernames_async(db, [user.email for _, user in chunk])
+        rows = [
+            (line, {
+                "email": user.email,
+                "username": usernames[user.email],
+                "hashed_password": hashed,
+                "full_name": user.full_name,
+            })
+            for (line, user), hashed in zip(chunk, hashes)
+        ]
+        try:
+            written = await bulk_upsert_users_async(db, [row for _, row in rows], update_existing)
+            await db.commit()
+        except IntegrityError:
+            # Some row violates another constraint (e.g. a taken username):
+            # retry one by one so only the offending rows fail
+            await db.rollback()
+            written = []
+            for line, row in rows:
+                try:
+                    written += await bulk_upsert_users_async(db, [row], update_existing)
+                    await db.commit()
+                except IntegrityError as e:
+                    await db.rollback()
+                    report.error(line, f"conflicts with an existing user: {str(e.orig)}")
+    for email in written:
+        await user_cache.invalidate(email)
+    report.written += len(written)
+    report.skipped += len(rows) - len(written) - (report.failed - failed_before)
+    IMPORTED.labels("written").inc(len(written))
+
+
+async def import_users(session_factory, records, update_existing: bool = False, chunk_size: int = 500) -> ImportReport:
+    """Validate, hash and upsert ``records`` (from ``parse_records``) chunk by chunk"""
+    report = ImportReport()
+    chunk = []
+    seen = set()
+    async for line, record in records:
+        report.processed += 1
+        user = record if isinstance(record, str) else _validate(record)
+        if isinstance(user, str):
+            report.error(line, user)
+            continue
+        if user.email in seen:
+            report.error(line, "duplicate email in this import")
+            continue
+        seen.add(user.email)
+        chunk.append((line, user))
+        if len(chunk) >= chunk_size:
+            await _write_chunk(session_factory, chunk, update_existing, report)
+            chunk = []
+    if chunk:
+        await _write_chunk(session_factory, chunk, update_existing, report)
+    return report
+
+
+async def _file_chunks(path: str, size: int = 65536):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(size)
+            if not block:
+                return
+            yield block
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import users from JSONL or CSV")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--on-conflict", choices=("skip", "update"), default="skip")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args(argv)
+    format = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+
+    from app.database import AsyncSessionLocal, get_engine
+    from app.migrations import HEAD, current_version
+
+    async def run():
+        records = parse_records(iter_lines(_file_chunks(args.path)), format)
+        try:
+            return await import_users(AsyncSessionLocal, records, args.on_conflict == "update", args.chunk_size)
+        finally:
+            hashing_pool.shutdown()
+
+    with get_engine().connect() as conn:
+        if current_version(conn) != HEAD:
+            print("Database schema is not up to date; run `python -m app.migrations upgrade` first", file=sys.stderr)
+            return 1
+    report = asyncio.run(run())
+    print(json.dumps(report.to_dict(), indent=2))
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,129 +1,459 @@
+import asyncio
+import hmac
+import logging
+import uuid
 from datetime import datetime
-from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
+from typing import Optional
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, WebSocket, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.database import get_db, create_tables
-from app.schemas import UserCreate, Token
-from app.auth.oauth2 import get_oauth_client
-from app.auth.jwt import create_access_token, verify_token
-from app.auth.password import get_password_hash, authenticate_user
-from app.auth.security import JWTBearer, generate_state_token, verify_state_token
-from app.crud.users import create_or_update_user, get_user_by_email, create_user
-from app.auth.cookie_utils import set_cookie
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import (
+    AsyncSessionLocal, get_async_db, get_async_engine, get_engine, db_monitor, db_stats, guarded_async_session,
+)
+from app.db_health import is_connection_error
+from app.schemas import (
+    IntrospectRequest,
+    MarkRead,
+    MessageCreate,
+    MessageOut,
+    MessagePage,
+    RefreshRequest,
+    RoomCreate,
+    RoomOut,
+    RoomPage,
+    Token,
+    UserCreate,
+    UserOut,
+    UserUpdate,
+)
+from app.auth.oauth2 import get_oauth_client, oauth_registry
+from app.auth.jwt import create_access_token, token_cache, verify_token
+from app.auth.revocation import revocation_store
+from app.auth.password import authenticate_user, drain_rehashes, get_password_hash_async
+from app.auth.hashing import hashing_pool
+from app.auth.keys import keyring
+from app.auth.rate_limit import check_login_rate, check_register_rate, check_room_create_rate
+from app.auth.security import (
+    JWTBearer,
+    check_state_secret,
+    generate_state_token,
+    require_admin_key,
+    require_introspection_key,
+    verify_state_token,
+)
+from app.crud.users import (
+    create_or_update_user_async,
+    create_user_async,
+    get_cached_user_by_email,
+    get_cached_users_by_emails,
+    update_user_profile_async,
+)
+from app.crud.chat import (
+    InvalidCursor,
+    create_room_async,
+    is_member_async,
+    list_messages_async,
+    list_rooms_async,
+    mark_read_async,
+    read_positions_async,
+)
+from app.crud.user_cache import user_cache
+from app.crud.tokens import (
+    consume_refresh_token,
+    issue_refresh_token,
+    revoke_access_token,
+    revoke_refresh_family,
+)
+from app.auth.cookie_utils import cookie_policy
+from app.audit import audit_log
+from app.chat_hub import chat_hub
+from app.importer import FORMATS, import_users, iter_lines, parse_records
+from app.metrics import MetricsMiddleware, registry
+from app.presence import presence
+from app.startup import startup_report
+from app import migrations
 from config import settings
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# orjson for every JSON response; hot endpoints below go further and return
+# prebuilt Responses, which skip response_model validation entirely
+app = FastAPI(default_response_class=ORJSONResponse)
+
+async def _check_schema():
+    """Schema handling per DB_STARTUP_MODE. Migrations normally run once per
+    deploy (``python -m app.migrations upgrade``), so workers only compare
+    the recorded version with the one this build expects."""
+    mode = settings.DB_STARTUP_MODE
+    if mode == "migrate":
+        migrations.upgrade(get_engine())
+    elif mode == "verify":
+        try:
+            await migrations.verify_async(get_async_engine())
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            # Serve anyway; the breaker reports the outage until it recovers
+            logger.warning(f"Could not verify the schema version, database unreachable: {str(e)}")
+
+INTROSPECTED = registry.counter("introspected_tokens_total", "Tokens checked by /auth/introspect", ("result",))
+
+registry.callback("startup_seconds", "Seconds from importing the app to serving requests",
+                  lambda: startup_report.seconds_to_ready or 0.0)
 
 @app.on_event("startup")
-def on_startup():
-    create_tables()
+async def on_startup():
+    with startup_report.stage("config"):
+        check_state_secret()
+    with startup_report.stage("schema"):
+        await _check_schema()
+    with startup_report.stage("background_tasks"):
+        db_monitor.start()
+        oauth_registry.startup()
+        revocation_store.start(AsyncSessionLocal)
+        presence.start(AsyncSessionLocal)
+        audit_log.start()
+        await chat_hub.start()
+        if keyring is not None:
+            keyring.start()
+    startup_report.mark_ready(settings.STARTUP_BUDGET_SECONDS)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await db_monitor.stop()
+    await oauth_registry.aclose()
+    await revocation_store.stop()
+    await chat_hub.stop()
+    await presence.stop()
+    await audit_log.stop()
+    if keyring is not None:
+        await keyring.stop()
+    await drain_rehashes()
+    hashing_pool.shutdown()
+
+def _allowed_origins() -> set:
+    return {origin.strip() for origin in settings.ALLOWED_ORIGINS.split(",") if origin.strip()}
+
+def _origin_allowed(origin: str) -> bool:
+    """Same rule as the CORS middleware: listed, or any origin under ``*``"""
+    allowed = _allowed_origins()
+    return "*" in allowed or origin in allowed
 
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.ALLOWED_ORIGINS.split(","),
+    allow_origins=sorted(_allowed_origins()),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Outermost, so it times everything including CORS handling
+app.add_middleware(MetricsMiddleware)
+
+async def _get_provider(provider: str):
+    try:
+        return await get_oauth_client(provider)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+
+async def _issue_tokens(db: AsyncSession, email: str, family_id: str = None) -> Response:
+    """Access token plus a rotating refresh token, set as cookies and returned.
+
+    Builds the ``Token`` body directly: it is three strings we just created,
+    so validating them against the response model would only cost time.
+    """
+    family_id = family_id or uuid.uuid4().hex
+    access_token = create_access_token({"sub": email, "fam": family_id})
+    refresh_token = await issue_refresh_token(db, email, family_id)
+    response = ORJSONResponse({"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token})
+    cookies = cookie_policy()
+    cookies.set_access(response, access_token)
+    cookies.set_refresh(response, refresh_token)
+    return response
+
 # --- Authentication Routes ---
 @app.post("/auth/register", response_model=Token)
 async def register_user(
     user_data: UserCreate,
-    response: Response,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Register new user with email/password"""
-    if get_user_by_email(db, user_data.email):
+    await check_register_rate(request)
+    if await get_cached_user_by_email(db, user_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    hashed_password = get_password_hash(user_data.password)
-    user = create_user(db, user_data, hashed_password)
-    access_token = create_access_token({"sub": user.email})
-    set_cookie(response, "access_token", access_token)
-    return {"access_token": access_token, "token_type": "bearer"}
+    hashed_password = await get_password_hash_async(user_data.password)
+    try:
+        user = await create_user_async(db, user_data, hashed_password)
+    except IntegrityError:
+        # Registered concurrently (or by another worker) since the check above
+        await db.rollback()
+        await user_cache.invalidate(user_data.email)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    audit_log.record("registered", request, email=user.email)
+    return await _issue_tokens(db, user.email)
 
 @app.post("/auth/login", response_model=Token)
 async def login_user(
-    response: Response,
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Email/password login"""
-    user = authenticate_user(db, form_data.username, form_data.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password"
-        )
-    
-    access_token = create_access_token({"sub": user.email})
-    set_cookie(response, "access_token", access_token)
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Throttle before any database or bcrypt work so floods stay cheap
+    await check_login_rate(request, form_data.username)
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except HTTPException as e:
+        # Only bad credentials are failed logins; a 503 from the hashing pool is not
+        if e.status_code == status.HTTP_401_UNAUTHORIZED:
+            audit_log.record("login_failed", request, email=form_data.username)
+        raise
+    audit_log.record("login_succeeded", request, email=user.email)
+    return await _issue_tokens(db, user.email)
 
 @app.get("/auth/oauth/{provider}")
-async def start_oauth(provider: str):
+async def start_oauth(provider: str, response: Response):
     """Initiate OAuth2 flow"""
-    oauth = await get_oauth_client(provider)
+    oauth = await _get_provider(provider)
     state = generate_state_token()
     auth_url = await oauth.get_authorize_url(state=state)
     
-    response = Response(status_code=status.HTTP_200_OK)
-    set_cookie(response, "oauth_state", state, expires_minutes=5)
+    cookie_policy().set_state(response, state)
     return {"auth_url": auth_url}
 
-@app.get("/auth/oauth/{provider}/callback")
+@app.get("/auth/oauth/{provider}/callback", response_model=Token)
 async def oauth_callback(
     provider: str,
     request: Request,
     code: str,
     state: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """OAuth2 callback endpoint"""
-    # CSRF protection
-    if not verify_state_token(state) or state != request.cookies.get("oauth_state"):
+    # CSRF protection: the state must be ours, fresh, unused and bound to this browser
+    cookie_state = request.cookies.get("oauth_state") or ""
+    if not hmac.compare_digest(state.encode(), cookie_state.encode()) or not verify_state_token(state, consume=True):
+        audit_log.record("oauth_state_rejected", request, provider=provider)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid state token"
         )
     
     # Exchange code for token
-    oauth = await get_oauth_client(provider)
+    oauth = await _get_provider(provider)
     token = await oauth.get_access_token(code)
     user_data = await oauth.get_user_info(token)
     
     # Create/update user
-    user = create_or_update_user(db, user_data["email"])
+    user = await create_or_update_user_async(
+        db, user_data["email"], full_name=user_data.get("name"), profile_picture=user_data.get("picture")
+    )
     
-    # Set JWT cookie
-    access_token = create_access_token({"sub": user.email})
-    response = Response(status_code=status.HTTP_200_OK)
-    set_cookie(response, "access_token", access_token)
-    response.delete_cookie("oauth_state")
-    return {"access_token": access_token, "token_type": "bearer"}
+    audit_log.record("oauth_login_succeeded", request, email=user.email, provider=provider)
+
+    # Set JWT cookies; the state cookie is single use
+    response = await _issue_tokens(db, user.email)
+    cookie_policy().delete(response, "oauth_state")
+    return response
+
+@app.post("/auth/refresh", response_model=Token)
+async def refresh_tokens(
+    request: Request,
+    body: Optional[RefreshRequest] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Exchange a refresh token for a new access/refresh pair (single use)"""
+    token = (body.refresh_token if body else None) or request.cookies.get("refresh_token")
+    try:
+        payload = verify_token(token, token_type="refresh")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
+    if not await consume_refresh_token(db, payload["jti"]):
+        # Already rotated: either the client or a thief replayed it, so
+        # end the whole session family
+        logger.warning(f"Refresh token reuse detected for family {payload['fam']}")
+        await revoke_refresh_family(db, payload["fam"])
+        audit_log.record("refresh_reuse_detected", request, email=payload["sub"], family=payload["fam"])
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token reuse detected"
+        )
+    audit_log.record("refreshed", request, email=payload["sub"])
+    return await _issue_tokens(db, payload["sub"], family_id=payload["fam"])
 
 @app.post("/auth/logout")
-async def logout_user(response: Response):
-    """Clear authentication cookies"""
-    response = Response(status_code=status.HTTP_200_OK)
-    response.delete_cookie("access_token")
+async def logout_user(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Revoke the current tokens and clear authentication cookies"""
+    authorization = request.headers.get("authorization", "")
+    access_token = authorization[7:] if authorization.lower().startswith("bearer ") else request.cookies.get("access_token")
+    email = None
+    families = set()
+    if access_token:
+        try:
+            payload = verify_token(access_token)
+            email = payload["sub"]
+            await revoke_access_token(db, payload)
+            if "fam" in payload:
+                # Bearer clients may hold the refresh token outside the cookie
+                families.add(payload["fam"])
+        except ValueError:
+            pass
+    refresh_token = request.cookies.get("refresh_token")
+    if refresh_token:
+        try:
+            families.add(verify_token(refresh_token, token_type="refresh")["fam"])
+        except ValueError:
+            pass
+    for family_id in families:
+        await revoke_refresh_family(db, family_id)
+    cookie_policy().delete(response, "access_token", "refresh_token")
+    audit_log.record("logged_out", request, email=email)
     return {"message": "Successfully logged out"}
 
+# RFC 7662 token type -> the "typ" claim verify_token checks
+INTROSPECT_TOKEN_TYPES = {"access_token": "access", "refresh_token": "refresh"}
+
+@app.post("/auth/introspect", dependencies=[Depends(require_introspection_key)])
+async def introspect_tokens(body: IntrospectRequest):
+    """Verify a batch of tokens in one call; results follow the order of
+    ``tokens``, each ``{"active": false}`` or ``{"active": true, <claims>}``.
+    ``token_type_hint`` only sets which type is tried first, and the database
+    is touched only for ``include_user``."""
+    if len(body.tokens) > settings.INTROSPECT_MAX_TOKENS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.INTROSPECT_MAX_TOKENS} tokens per request"
+        )
+    token_types = sorted(INTROSPECT_TOKEN_TYPES, key=lambda t: t != body.token_type_hint)
+    verified = {}  # token -> (token_type, payload); repeated tokens are verified once
+    for token in body.tokens:
+        if token in verified:
+            continue
+        verified[token] = (None, None)
+        for token_type in token_types:
+            try:
+                verified[token] = (token_type, verify_token(token, token_type=INTROSPECT_TOKEN_TYPES[token_type]))
+                break
+            except ValueError:
+                pass
+    users = {}
+    if body.include_user:
+        emails = {payload["sub"] for _, payload in verified.values() if payload is not None}
+        if emails:
+            async with guarded_async_session() as db:
+                users = await get_cached_users_by_emails(db, emails)
+    results = []
+    for token in body.tokens:
+        token_type, payload = verified[token]
+        if payload is not None and body.include_user:
+            user = users.get(payload["sub"])
+            if user is None or not user.is_active:
+                payload = None
+            else:
+                payload = {**payload, "username": user.username, "user_id": user.id}
+        if payload is None:
+            INTROSPECTED.labels("inactive").inc()
+            results.append({"active": False})
+        else:
+            INTROSPECTED.labels("active").inc()
+            results.append({"active": True, "token_type": token_type, **payload})
+    return {"results": results}
+
+@app.get("/.well-known/jwks.json")
+async def jwks(request: Request):
+    """Public signing keys for verifying access tokens offline"""
+    body, etag = keyring.jwks() if keyring is not None else (b'{"keys":[]}', '"empty"')
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE}",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# --- Admin Routes ---
+@app.post("/admin/users/import", dependencies=[Depends(require_admin_key)])
+async def import_users_endpoint(request: Request, format: Optional[str] = None, on_conflict: str = "skip"):
+    """Bulk import users from a streamed JSONL or CSV body"""
+    format = format or ("csv" if "csv" in request.headers.get("content-type", "") else "jsonl")
+    if format not in FORMATS or on_conflict not in ("skip", "update"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be jsonl or csv and on_conflict skip or update"
+        )
+    records = parse_records(iter_lines(request.stream()), format)
+    report = await import_users(AsyncSessionLocal, records, update_existing=on_conflict == "update")
+    return report.to_dict()
+
 # --- Protected Routes ---
-@app.get("/users/me", dependencies=[Depends(JWTBearer())])
+def _profile_response(user) -> Response:
+    # The snapshot caches its serialized UserOut until the row changes
+    return Response(content=user.profile_json, media_type="application/json")
+
+@app.get("/users/me", response_model=UserOut, dependencies=[Depends(JWTBearer())])
 async def get_current_user(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current user details"""
-    token = request.cookies.get("access_token")
-    payload = verify_token(token)
-    user = get_user_by_email(db, payload["sub"])
+    payload = request.state.token_payload  # verified by JWTBearer
+    user = await get_cached_user_by_email(db, payload["sub"])
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return _profile_response(user)
+
+@app.patch("/users/me", response_model=UserOut, dependencies=[Depends(JWTBearer())])
+async def update_current_user(
+    user_in: UserUpdate,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update current user profile"""
+    payload = request.state.token_payload
+    user = await update_user_profile_async(db, payload["sub"], user_in)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return _profile_response(await get_cached_user_by_email(db, payload["sub"]))
+
+@app.get("/users/online", dependencies=[Depends(JWTBearer())])
+async def online_users(limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    """Usernames active within PRESENCE_ONLINE_TTL (never emails: any account
+    holder may call this), most recent first"""
+    online = presence.online()[:max(limit, 0)]
+    users = await get_cached_users_by_emails(db, online) if online else {}
+    return {
+        "count": len(presence),
+        "users": [users[email].username for email in online if users.get(email) is not None],
+    }
+
+# --- Chat Routes ---
+async def _current_user(request: Request, db: AsyncSession):
+    user = await get_cached_user_by_email(db, request.state.token_payload["sub"])
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -131,7 +461,205 @@ async def get_current_user(
         )
     return user
 
+async def _member_room_user(request: Request, db: AsyncSession, room_id: int):
+    """Current user, after checking they belong to ``room_id`` (404 otherwise, so
+    room ids are not enumerable)"""
+    user = await _current_user(request, db)
+    if not await is_member_async(db, room_id, user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Room not found"
+        )
+    return user
+
+def _bad_cursor():
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid cursor"
+    )
+
+@app.post("/chat/rooms", response_model=RoomOut,
+          dependencies=[Depends(JWTBearer()), Depends(check_room_create_rate)])
+async def create_room(room_in: RoomCreate, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Create a room with the current user and invite the given members. The
+    response lists only the creator whether or not the emails are registered;
+    invited users are listed once they open the room."""
+    user = await _current_user(request, db)
+    room = await create_room_async(db, user.id, room_in.member_emails, room_in.name, room_in.is_group)
+    return RoomOut.from_orm(room)
+
+@app.get("/chat/rooms", response_model=RoomPage, dependencies=[Depends(JWTBearer())])
+async def list_rooms(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The current user's rooms, most recently active first"""
+    user = await _current_user(request, db)
+    try:
+        rooms, next_cursor = await list_rooms_async(db, user.id, limit, cursor)
+    except InvalidCursor:
+        raise _bad_cursor()
+    items = [RoomOut.from_orm(room).copy(update={"unread": unread}) for room, unread in rooms]
+    return RoomPage(items=items, next_cursor=next_cursor)
+
+@app.get("/chat/rooms/{room_id}/messages", response_model=MessagePage, dependencies=[Depends(JWTBearer())])
+async def list_messages(
+    room_id: int,
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Messages newest first; pass ``next_cursor`` back to page further into history"""
+    user = await _member_room_user(request, db, room_id)
+    try:
+        messages, next_cursor = await list_messages_async(db, room_id, limit, cursor)
+    except InvalidCursor:
+        raise _bad_cursor()
+    # Others' messages are read up to the viewer's position; the viewer's
+    # own once every other member has read past them
+    positions = await read_positions_async(db, room_id)
+    own = positions.pop(user.id, 0)
+    read_by_all = min(positions.values(), default=0)
+    items = [
+        MessageOut.from_orm(m).copy(update={"read": m.id <= (read_by_all if m.sender_id == user.id else own)})
+        for m in messages
+    ]
+    return MessagePage(items=items, next_cursor=next_cursor)
+
+@app.post("/chat/rooms/{room_id}/messages", response_model=MessageOut, dependencies=[Depends(JWTBearer())])
+async def post_message(
+    room_id: int,
+    message_in: MessageCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Post a message; WebSocket clients in the room receive it like their own posts"""
+    user = await _member_room_user(request, db, room_id)
+    try:
+        event = await chat_hub.post(room_id, user, message_in.content)
+    except Exception as e:
+        logger.error(f"Storing chat message failed: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Message could not be stored"
+        )
+    return event["message"]
+
+@app.post("/chat/rooms/{room_id}/read", dependencies=[Depends(JWTBearer())])
+async def mark_room_read(
+    room_id: int,
+    request: Request,
+    body: Optional[MarkRead] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Move the current user's read position in the room (default: to the newest message)"""
+    user = await _member_room_user(request, db, room_id)
+    marked = await mark_read_async(db, room_id, user.id, body.up_to_id if body else None)
+    return {"marked": marked}
+
+@app.websocket("/ws/chat/rooms/{room_id}")
+async def room_socket(websocket: WebSocket, room_id: int):
+    """Live room events; send ``{"content": "..."}`` to post a message.
+
+    Authenticated with the ``access_token`` cookie. Closes with 1008 for an
+    Origin outside ALLOWED_ORIGINS, a bad token or a room the user is not
+    in, and 1013 when the client reads too slowly to keep up with the room.
+    """
+    # Browsers attach cookies to cross-site WebSocket handshakes and CORS
+    # does not apply, so the Origin is checked here
+    origin = websocket.headers.get("origin")
+    if origin is not None and not _origin_allowed(origin):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    try:
+        payload = verify_token(websocket.cookies.get("access_token") or "")
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    async with AsyncSessionLocal() as db:
+        user = await get_cached_user_by_email(db, payload["sub"])
+        allowed = user is not None and await is_member_async(db, room_id, user.id)
+    if not allowed:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    connection = await chat_hub.connect(websocket, user, room_id)
+    presence.touch(user.email)
+
+    async def receive():
+        while True:
+            try:
+                message_in = MessageCreate.parse_obj(await websocket.receive_json())
+            except (ValidationError, ValueError):
+                await websocket.send_json({"type": "error", "detail": "Expected {\"content\": \"...\"}"})
+                continue
+            presence.touch(user.email)
+            try:
+                await chat_hub.send_message(connection, message_in.content)
+            except Exception as e:
+                # Only this sender's message failed; keep the socket open
+                logger.warning(f"Storing chat message failed: {str(e)}")
+                await websocket.send_json({"type": "error", "detail": "Message could not be stored"})
+
+    tasks = [
+        asyncio.ensure_future(receive()),
+        asyncio.ensure_future(connection.send_forever()),
+        asyncio.ensure_future(connection.dropped.wait()),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Collect disconnects/cancellations so none is reported as unhandled
+        await asyncio.gather(*tasks, return_exceptions=True)
+        chat_hub.disconnect(connection)
+    if connection.dropped.is_set():
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
 # --- Health Check ---
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
+
+@app.get("/health/hashing")
+async def hashing_stats():
+    """Password hashing pool queue depth and latency"""
+    return hashing_pool.stats()
+
+@app.get("/health/cache")
+async def cache_stats():
+    """Hit rates of the in-process caches"""
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of request, stage, pool and cache metrics"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/health/audit")
+async def audit_health():
+    return audit_log.stats()
+
+@app.get("/health/presence")
+async def presence_stats():
+    """Online users and pending last_seen writes on this worker"""
+    return presence.stats()
+
+@app.get("/health/chat")
+async def chat_stats():
+    """Open WebSockets, fan-out and batched write counters on this worker"""
+    return chat_hub.stats()
+
+@app.get("/health/startup")
+async def startup_health():
+    return startup_report.to_dict()
+
+@app.get("/health/db")
+async def database_stats():
+    """Circuit breaker state and connection pool stats"""
+    return db_stats()
@@ -0,0 +1,78 @@
+"""Versioned schema migrations, applied out of band.
+
+Each migration is a module with a ``description`` and an ``upgrade(conn)``
+run inside its own transaction; the ``schema_version`` table records which
+versions have been applied. Deploys run ``python -m app.migrations upgrade``
+once, before starting workers, and workers only check the recorded version
+at startup (see ``DB_STARTUP_MODE``) instead of each issuing DDL.
+"""
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, inspect, select, text
+from app.migrations import m0001_baseline, m0002_chat_indexes, m0003_auth_events, m0004_chat_members_joined
+
+logger = logging.getLogger(__name__)
+
+# (version, module), in order; append new migrations, never renumber
+MIGRATIONS = [
+    (1, m0001_baseline),
+    (2, m0002_chat_indexes),
+    (3, m0003_auth_events),
+    (4, m0004_chat_members_joined),
+]
+HEAD = MIGRATIONS[-1][0]
+
+# Serialises concurrent ``upgrade`` runs on PostgreSQL (arbitrary constant)
+_ADVISORY_LOCK_KEY = 0x61757468
+
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+class SchemaVersionMismatch(RuntimeError):
+    pass
+
+
+def current_version(conn) -> int:
+    """Highest applied version; 0 for a database that has never been migrated"""
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade(engine, target: int = HEAD) -> list:
+    """Apply pending migrations up to ``target``; returns the versions applied"""
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version > target:
+            break
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            schema_version.create(conn, checkfirst=True)
+            # Re-read under the lock: another deploy may have just applied it
+            if current_version(conn) >= version:
+                continue
+            logger.info(f"Applying migration {version}: {migration.description}")
+            migration.upgrade(conn)
+            conn.execute(insert(schema_version).values(
+                version=version, description=migration.description, applied_at=datetime.now(timezone.utc),
+            ))
+        applied.append(version)
+    return applied
+
+
+async def verify_async(async_engine) -> int:
+    """Raise ``SchemaVersionMismatch`` unless the database is at ``HEAD``"""
+    async with async_engine.connect() as conn:
+        version = await conn.run_sync(current_version)
+    if version != HEAD:
+        raise SchemaVersionMismatch(
+            f"Database schema is at version {version}, this build expects {HEAD}; "
+            f"run `python -m app.migrations upgrade`"
+        )
+    return version
@@ -0,0 +1,30 @@
+"""python -m app.migrations upgrade|current|verify"""
+import argparse
+import logging
+import sys
+
+from app.database import get_engine
+from app.migrations import HEAD, current_version, upgrade
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply or inspect versioned schema migrations")
+    parser.add_argument("command", choices=("upgrade", "current", "verify"))
+    parser.add_argument("--target", type=int, default=HEAD, help="upgrade only up to this version")
+    args = parser.parse_args(argv)
+
+    engine = get_engine()
+    if args.command == "upgrade":
+        applied = upgrade(engine, args.target)
+        print(f"Applied {applied}" if applied else "Already up to date")
+    with engine.connect() as conn:
+        version = current_version(conn)
+    print(f"Schema version {version} (head {HEAD})")
+    if args.command == "verify" and version != HEAD:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    sys.exit(main())
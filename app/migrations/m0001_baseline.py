@@ -0,0 +1,74 @@
+"""Baseline schema: users, chat rooms/messages and refresh/revoked tokens.
+
+A frozen copy of the tables as they were before versioned migrations, so
+databases created by ``Base.metadata.create_all`` are adopted unchanged (every table
+is created with ``checkfirst``). Do not edit; add a new migration instead.
+"""
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text
+
+description = "baseline schema"
+
+metadata = MetaData()
+
+users = Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String, unique=True, index=True, nullable=False),
+    Column("username", String, unique=True, index=True, nullable=False),
+    Column("hashed_password", String, nullable=False),
+    Column("full_name", String, nullable=True),
+    Column("profile_picture", String, nullable=True),
+    Column("is_active", Boolean),
+    Column("is_online", Boolean),
+    Column("last_seen", DateTime(timezone=True)),
+    Column("created_at", DateTime(timezone=True)),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+chat_rooms = Table(
+    "chat_rooms", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, nullable=True),
+    Column("is_group", Boolean),
+    Column("created_at", DateTime(timezone=True)),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+chat_room_users = Table(
+    "chat_room_users", metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("chat_room_id", Integer, ForeignKey("chat_rooms.id"), primary_key=True),
+)
+
+messages = Table(
+    "messages", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("sender_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("chat_room_id", Integer, ForeignKey("chat_rooms.id"), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("read", Boolean),
+    Column("created_at", DateTime(timezone=True)),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+refresh_tokens = Table(
+    "refresh_tokens", metadata,
+    Column("jti", String, primary_key=True),
+    Column("family_id", String, index=True, nullable=False),
+    Column("user_email", String, index=True, nullable=False),
+    Column("expires_at", DateTime(timezone=True), nullable=False, index=True),
+    Column("used_at", DateTime(timezone=True), nullable=True),
+    Column("revoked", Boolean),
+    Column("created_at", DateTime(timezone=True)),
+)
+
+revoked_tokens = Table(
+    "revoked_tokens", metadata,
+    Column("jti", String, primary_key=True),
+    Column("expires_at", DateTime(timezone=True), nullable=False, index=True),
+    Column("created_at", DateTime(timezone=True), nullable=False, index=True),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
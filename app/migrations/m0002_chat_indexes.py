@@ -0,0 +1,40 @@
+"""Indexes for chat room listings and message pagination, and per-member
+read positions in place of the per-message read flag"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, Table, inspect, text
+
+description = "chat pagination indexes and per-member read positions"
+
+# Just the columns the indexes need, on a private MetaData so the indexes
+# never attach to the baseline tables
+metadata = MetaData()
+chat_room_users = Table("chat_room_users", metadata, Column("chat_room_id", Integer))
+chat_rooms = Table("chat_rooms", metadata, Column("id", Integer), Column("updated_at", DateTime(timezone=True)))
+messages = Table(
+    "messages", metadata,
+    Column("id", Integer), Column("chat_room_id", Integer), Column("created_at", DateTime(timezone=True)),
+)
+
+indexes = [
+    Index("ix_chat_room_users_room", chat_room_users.c.chat_room_id),
+    Index("ix_chat_rooms_updated_id", chat_rooms.c.updated_at, chat_rooms.c.id),
+    Index("ix_messages_room_created_id", messages.c.chat_room_id, messages.c.created_at, messages.c.id),
+    Index("ix_messages_room_id", messages.c.chat_room_id, messages.c.id),
+]
+
+
+def upgrade(conn):
+    # Databases bootstrapped with create_all already have the new layout
+    inspector = inspect(conn)
+    if "last_read_message_id" not in {c["name"] for c in inspector.get_columns("chat_room_users")}:
+        conn.execute(text("ALTER TABLE chat_room_users ADD COLUMN last_read_message_id INTEGER"))
+    if "read" in {c["name"] for c in inspector.get_columns("messages")}:
+        # The old flag was shared by all members; the most it says is that
+        # everything up to the newest message marked read has been seen
+        conn.execute(text(
+            "UPDATE chat_room_users SET last_read_message_id = ("
+            "SELECT max(m.id) FROM messages m "
+            "WHERE m.chat_room_id = chat_room_users.chat_room_id AND m.read = :read)"
+        ), {"read": True})
+        conn.execute(text("ALTER TABLE messages DROP COLUMN read"))
+    for index in indexes:
+        index.create(conn, checkfirst=True)
@@ -0,0 +1,86 @@
+"""auth_events audit table, partitioned by day on PostgreSQL"""
+from datetime import timedelta
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, Text, text
+
+description = "auth_events audit table"
+
+metadata = MetaData()
+auth_events = Table(
+    "auth_events", metadata,
+    Column("id", String, primary_key=True),
+    Column("created_at", DateTime(timezone=True), primary_key=True),
+    Column("event", String, nullable=False),
+    Column("email", String, nullable=True),
+    Column("ip", String, nullable=True),
+    Column("user_agent", String, nullable=True),
+    Column("detail", Text, nullable=True),
+    Index("ix_auth_events_email_created", "email", "created_at"),
+)
+
+# Daily partitions (auth_events_YYYYMMDD) are created ahead of time and
+# dropped after AUDIT_RETENTION_DAYS by the audit sink
+POSTGRES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS auth_events (
+        id VARCHAR NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        event VARCHAR NOT NULL,
+        email VARCHAR,
+        ip VARCHAR,
+        user_agent VARCHAR,
+        detail TEXT,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_auth_events_email_created ON auth_events (email, created_at)",
+]
+
+
+# Database bootstrapped by create_all before this migration: a plain table
+# that cannot take PARTITION OF children. Index and constraint names are
+# schema-wide, so the old ones are renamed out of the way first.
+POSTGRES_RENAME_PLAIN = [
+    "ALTER TABLE auth_events RENAME TO auth_events_unpartitioned",
+    "ALTER TABLE auth_events_unpartitioned RENAME CONSTRAINT auth_events_pkey TO auth_events_unpartitioned_pkey",
+    "ALTER INDEX IF EXISTS ix_auth_events_email_created RENAME TO ix_auth_events_unpartitioned_email_created",
+]
+
+
+def _postgres_relkind(conn):
+    """'p' for a partitioned auth_events, 'r' for a plain one, None if absent"""
+    return conn.execute(text(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'auth_events' AND n.nspname = current_schema()"
+    )).scalar()
+
+
+def _convert_plain_table(conn):
+    """Rebuild a plain auth_events as the partitioned table, keeping its rows"""
+    for statement in POSTGRES_RENAME_PLAIN:
+        conn.execute(text(statement))
+    for statement in POSTGRES_DDL:
+        conn.execute(text(statement))
+    days = conn.execute(text(
+        "SELECT DISTINCT date_trunc('day', created_at AT TIME ZONE 'UTC')::date "
+        "FROM auth_events_unpartitioned"
+    )).scalars().all()
+    for day in days:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS auth_events_{day:%Y%m%d} PARTITION OF auth_events "
+            f"FOR VALUES FROM ('{day.isoformat()} 00:00+00') TO ('{day + timedelta(days=1)} 00:00+00')"
+        ))
+    conn.execute(text("INSERT INTO auth_events SELECT * FROM auth_events_unpartitioned"))
+    conn.execute(text("DROP TABLE auth_events_unpartitioned"))
+
+
+def upgrade(conn):
+    if conn.dialect.name == "postgresql":
+        relkind = _postgres_relkind(conn)
+        if relkind == "r":
+            _convert_plain_table(conn)
+        elif relkind not in (None, "p"):
+            raise RuntimeError(f"auth_events exists but is not a table (relkind {relkind!r})")
+        for statement in POSTGRES_DDL:
+            conn.execute(text(statement))
+    else:
+        auth_events.create(conn, checkfirst=True)
@@ -0,0 +1,10 @@
+"""Members added before invitations existed count as joined"""
+from sqlalchemy import text
+
+description = "existing chat members joined"
+
+
+def upgrade(conn):
+    # A NULL read position now means "invited, never opened the room"; every
+    # membership that predates this release was already visible to the room
+    conn.execute(text("UPDATE chat_room_users SET last_read_message_id = 0 WHERE last_read_message_id IS NULL"))
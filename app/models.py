@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Table, Text
+from sqlalchemy import and_, Column, Integer, String, ForeignKey, DateTime, Boolean, Index, Table, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -10,7 +10,11 @@ chat_room_users = Table(
     'chat_room_users',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('chat_room_id', Integer, ForeignKey('chat_rooms.id'), primary_key=True)
+    Column('chat_room_id', Integer, ForeignKey('chat_rooms.id'), primary_key=True),
+    # Read position of this member: messages up to this id are read (NULL: none)
+    Column('last_read_message_id', Integer, nullable=True),
+    # The primary key serves "rooms of a user"; this serves "members of a room"
+    Index('ix_chat_room_users_room', 'chat_room_id'),
 )
 
 class User(Base):
@@ -30,7 +34,7 @@ class User(Base):
 
     # Relationships
     messages_sent = relationship("Message", back_populates="sender", foreign_keys="Message.sender_id")
-    chat_rooms = relationship("ChatRoom", secondary=chat_room_users, back_populates="users")
+    chat_rooms = relationship("ChatRoom", secondary=chat_room_users, back_populates="members")
 
 class ChatRoom(Base):
     __tablename__ = "chat_rooms"
@@ -42,9 +46,21 @@ class ChatRoom(Base):
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
     
     # Relationships
-    users = relationship("User", secondary=chat_room_users, back_populates="chat_rooms")
+    members = relationship("User", secondary=chat_room_users, back_populates="chat_rooms")
+    # Members shown to the room: those who have joined by opening it. Invited
+    # users (no read position yet) stay hidden, so adding an email to a room
+    # does not reveal whether or whose account it is
+    users = relationship(
+        "User", secondary=chat_room_users, viewonly=True,
+        secondaryjoin=lambda: and_(
+            User.id == chat_room_users.c.user_id, chat_room_users.c.last_read_message_id.isnot(None)
+        ),
+    )
     messages = relationship("Message", back_populates="chat_room")
 
+    # Room lists are ordered by latest activity
+    __table_args__ = (Index("ix_chat_rooms_updated_id", "updated_at", "id"),)
+
 class Message(Base):
     __tablename__ = "messages"
 
@@ -52,10 +68,55 @@ class Message(Base):
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     chat_room_id = Column(Integer, ForeignKey("chat_rooms.id"), nullable=False)
     content = Column(Text, nullable=False)
-    read = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
     
     # Relationships
     sender = relationship("User", back_populates="messages_sent", foreign_keys=[sender_id])
     chat_room = relationship("ChatRoom", back_populates="messages")
+
+    __table_args__ = (
+        # Keyset pagination: newest messages of a room, ties broken by id
+        Index("ix_messages_room_created_id", "chat_room_id", "created_at", "id"),
+        # Unread counts scan only the messages after a member's read position
+        Index("ix_messages_room_id", "chat_room_id", "id"),
+    )
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    jti = Column(String, primary_key=True)
+    family_id = Column(String, index=True, nullable=False)  # Shared by every rotation of one login
+    user_email = Column(String, index=True, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    used_at = Column(DateTime(timezone=True), nullable=True)  # Set when rotated; reuse => theft
+    revoked = Column(Boolean, default=False)
+    created_at = Column(DateTime(timezone=True), default=func.now())
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)  # Token jti or refresh family id
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class AuthEvent(Base):
+    """Audit trail of authentication events, written in batches by app.audit.
+
+    The key includes created_at so PostgreSQL can partition the table by
+    day (see migration 3); old days are dropped as whole partitions.
+    """
+    __tablename__ = "auth_events"
+
+    id = Column(String, primary_key=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True)
+    event = Column(String, nullable=False)  # e.g. login_succeeded, login_failed, registered
+    email = Column(String, nullable=True)
+    ip = Column(String, nullable=True)
+    user_agent = Column(String, nullable=True)
+    detail = Column(Text, nullable=True)  # JSON object with event specific fields
+
+    __table_args__ = (
+        # "What happened to this account", newest first
+        Index("ix_auth_events_email_created", "email", "created_at"),
+    )
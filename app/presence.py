@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, update
+from app.crud.user_cache import user_cache
+from app.metrics import registry, timed
+from app.models import User
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceTracker:
+    """Write-behind ``is_online`` / ``last_seen`` tracking.
+
+    ``touch`` only updates two dicts, so recording activity on every
+    authenticated request costs no database write. A background task
+    flushes the latest ``last_seen`` per user as one batched UPDATE and
+    marks users offline once they have been idle for ``online_ttl``.
+    The online set is served from memory and covers the users this worker
+    has seen; with several workers a user idle on one but active on another
+    is set back online by the next flush of the active worker. Flushed users
+    are dropped from the user cache so profiles pick up the new values.
+    """
+
+    def __init__(self, online_ttl: float = 300.0, flush_interval: float = 30.0):
+        self.online_ttl = online_ttl
+        self.flush_interval = flush_interval
+        self._last_active = {}   # email -> epoch seconds of the latest request
+        self._pending = {}       # email -> epoch seconds not yet written
+        self._marked_online = set()
+        self._session_factory = None
+        self._task = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def touch(self, email: str, now: float = None):
+        now = time.time() if now is None else now
+        self._last_active[email] = now
+        self._pending[email] = now
+
+    def _expire(self, now: float) -> list:
+        cutoff = now - self.online_ttl
+        idle = [email for email, seen in self._last_active.items() if seen < cutoff]
+        for email in idle:
+            del self._last_active[email]
+        return idle
+
+    def online(self, now: float = None) -> list:
+        """Emails active within ``online_ttl``, most recent first"""
+        self._expire(time.time() if now is None else now)
+        return sorted(self._last_active, key=self._last_active.get, reverse=True)
+
+    def is_online(self, email: str, now: float = None) -> bool:
+        seen = self._last_active.get(email)
+        now = time.time() if now is None else now
+        return seen is not None and seen >= now - self.online_ttl
+
+    def __len__(self):
+        return len(self._last_active)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def flush(self, session_factory, now: float = None):
+        """Write pending activity and offline transitions in two statements at most"""
+        now = time.time() if now is None else now
+        self._expire(now)
+        pending, self._pending = self._pending, {}
+        offline = self._marked_online - self._last_active.keys()
+        if not pending and not offline:
+            return
+        # Core (not ORM) UPDATEs so a parameter list runs as one executemany
+        users = User.__table__
+        try:
+            with timed("presence_flush"):
+                async with session_factory() as db:
+                    if pending:
+                        await db.execute(
+                            update(users)
+                            .where(users.c.email == bindparam("b_email"))
+                            .values(last_seen=bindparam("b_seen"), is_online=True),
+                            [
+                                {"b_email": email, "b_seen": datetime.fromtimestamp(seen, timezone.utc)}
+                                for email, seen in pending.items()
+                            ],
+                        )
+                    if offline:
+                        await db.execute(
+                            update(users).where(users.c.email.in_(offline)).values(is_online=False)
+                        )
+                    await db.commit()
+        except Exception:
+            # Keep the activity for the next attempt unless newer activity replaced it
+            for email, seen in pending.items():
+                self._pending.setdefault(email, seen)
+            raise
+        self._marked_online = (self._marked_online - offline) | pending.keys()
+        # Cached snapshots (and their /users/me bytes) still hold the old values
+        for email in pending.keys() | offline:
+            await user_cache.invalidate(email)
+        self.flushes += 1
+        self.rows_written += len(pending) + len(offline)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush(self._session_factory)
+            except Exception as e:
+                logger.warning(f"Presence flush failed: {str(e)}")
+
+    def start(self, session_factory):
+        self._session_factory = session_factory
+        if self._task is None and self.flush_interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session_factory is not None:
+            try:
+                await self.flush(self._session_factory)
+            except Exception as e:
+                logger.warning(f"Final presence flush failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "online": len(self),
+            "pending_updates": self.pending,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }
+
+
+presence = PresenceTracker(
+    online_ttl=settings.PRESENCE_ONLINE_TTL,
+    flush_interval=settings.PRESENCE_FLUSH_INTERVAL,
+)
+
+registry.callback("presence_online_users", "Users active within the online TTL on this worker", lambda: len(presence))
+registry.callback("presence_pending_updates", "last_seen updates waiting for the next flush", lambda: presence.pending)
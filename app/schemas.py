@@ -1,11 +1,22 @@
 from datetime import datetime
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, root_validator
+from typing import List, Optional
 
 class Token(BaseModel):
     """JWT token response"""
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    """Refresh token exchange (falls back to the refresh_token cookie)"""
+    refresh_token: Optional[str] = None
+
+class IntrospectRequest(BaseModel):
+    """Batch of tokens to introspect (RFC 7662 style, JSON instead of a form)"""
+    tokens: List[str]
+    token_type_hint: str = Field("access_token", regex="^(access_token|refresh_token)$")
+    include_user: bool = False  # Also require an existing, active user
 
 class TokenData(BaseModel):
     """Data embedded in JWT"""
@@ -20,6 +31,17 @@ class UserCreate(UserBase):
     password: str = Field(..., min_length=8, max_length=64)
     full_name: Optional[str] = None
 
+class UserImport(UserCreate):
+    """Bulk import row: a plain password (hashed on import) or an existing hash"""
+    password: Optional[str] = Field(None, min_length=8, max_length=64)
+    hashed_password: Optional[str] = None
+
+    @root_validator(skip_on_failure=True)
+    def password_or_hash(cls, values):
+        if bool(values.get("password")) == bool(values.get("hashed_password")):
+            raise ValueError("exactly one of password or hashed_password is required")
+        return values
+
 class UserOAuthCreate(UserBase):
     """OAuth user creation"""
     provider: str  # e.g., "google"
@@ -46,3 +68,75 @@ class UserInDB(UserBase):
                 "last_seen": "2023-01-01T00:00:00"
             }
         }
+
+class UserOut(BaseModel):
+    """Public profile returned by /users/me (never includes the password hash)"""
+    id: int
+    email: str
+    username: str
+    full_name: Optional[str] = None
+    profile_picture: Optional[str] = None
+    is_active: bool = True
+    is_online: bool = False
+    last_seen: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+# --- Chat ---
+class UserSummary(BaseModel):
+    """Public part of a user shown next to rooms and messages"""
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    profile_picture: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class RoomCreate(BaseModel):
+    """New room; the creator is always a member"""
+    name: Optional[str] = None
+    is_group: bool = False
+    member_emails: List[str] = Field(default_factory=list, max_items=500)
+
+class RoomOut(BaseModel):
+    id: int
+    name: Optional[str] = None
+    is_group: bool
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    users: List[UserSummary] = []
+    unread: int = 0
+
+    class Config:
+        orm_mode = True
+
+class MessageCreate(BaseModel):
+    content: str = Field(..., min_length=1, max_length=10000)
+
+class MessageOut(BaseModel):
+    id: int
+    chat_room_id: int
+    content: str
+    # From the viewer's side: their read position for others' messages, and
+    # whether every other member has read it for their own
+    read: bool = False
+    created_at: datetime
+    sender: UserSummary
+
+    class Config:
+        orm_mode = True
+
+class MarkRead(BaseModel):
+    """Move the read position to ``up_to_id`` (default: the newest message)"""
+    up_to_id: Optional[int] = None
+
+class RoomPage(BaseModel):
+    items: List[RoomOut]
+    next_cursor: Optional[str] = None
+
+class MessagePage(BaseModel):
+    items: List[MessageOut]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,101 @@
+"""python -m app.serve [--host 0.0.0.0] [--port 8000] [--workers N]
+
+Production entry point: runs ``app.main:app`` under uvicorn with one worker
+per available core (or WEB_WORKERS) and splits DB_POOL_BUDGET between them,
+so adding workers never multiplies the connections the database sees.
+Workers share read-mostly state through a shared memory block created
+here (see app.shared_state), and on SIGTERM each worker stops accepting
+connections and gives in-flight requests GRACEFUL_SHUTDOWN_SECONDS to
+finish before its shutdown hooks flush presence and chat writes.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def worker_count(requested: int = 0) -> int:
+    """``requested`` if positive, else the cores this process may run on"""
+    if requested > 0:
+        return requested
+    try:
+        return max(len(os.sched_getaffinity(0)), 1)
+    except AttributeError:  # Not available on macOS
+        return os.cpu_count() or 1
+
+
+def pool_share(budget: int, workers: int) -> tuple:
+    """(pool_size, max_overflow) per worker so all workers stay within ``budget``
+    connections, a third of each share kept open and the rest as overflow"""
+    share = max(budget // workers, 1)
+    pool_size = max(share // 3, 1)
+    return pool_size, share - pool_size
+
+
+def worker_settings(workers: int) -> dict:
+    """Settings overridden for the workers"""
+    pool_size, max_overflow = pool_share(settings.DB_POOL_BUDGET, workers)
+    if workers * (pool_size + max_overflow) > settings.DB_POOL_BUDGET:
+        logger.warning(f"{workers} workers need at least one connection each; DB_POOL_BUDGET is {settings.DB_POOL_BUDGET}")
+    env = {"DB_POOL_SIZE": pool_size, "DB_MAX_OVERFLOW": max_overflow}
+    from app.auth.keys import is_asymmetric
+    if workers > 1 and is_asymmetric(settings.JWT_ALGORITHM) and not settings.JWT_KEYS_FILE:
+        # Without a shared keyring file every worker would sign with its own key
+        env["JWT_KEYS_FILE"] = os.path.join(tempfile.gettempdir(), "authservice-jwt-keys.json")
+        logger.warning(f"JWT_KEYS_FILE is not set; workers share {env['JWT_KEYS_FILE']}")
+    return env
+
+
+def export(overrides: dict):
+    """Hand settings to the workers: spawned workers read the environment, and
+    a single worker runs in this process with the already loaded ``settings``"""
+    for name, value in overrides.items():
+        os.environ[name] = str(value)
+        setattr(settings, name, value)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the app with several worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS, help="0: one per available core")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    from app.shared_state import SharedSnapshot
+
+    workers = worker_count(args.workers)
+    export(worker_settings(workers))
+    if settings.DB_STARTUP_MODE == "migrate":
+        # Migrate once here rather than racing in every worker
+        from app.database import get_engine
+        from app.migrations import upgrade
+        upgrade(get_engine())
+        get_engine().dispose()
+        export({"DB_STARTUP_MODE": "verify"})
+
+    shared = SharedSnapshot.create(settings.SHARED_STATE_SIZE)
+    export({"SHARED_STATE_PATH": shared.path})
+    logger.info(f"Starting {workers} workers, DB pool {settings.DB_POOL_SIZE}+{settings.DB_MAX_OVERFLOW} each")
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_SECONDS,
+            proxy_headers=settings.TRUST_FORWARDED_FOR,
+        )
+    finally:
+        shared.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SharedSnapshot:
+    """A JSON document in shared memory, readable by every worker.
+
+    ``python -m app.serve`` creates the block (a memory-mapped file on
+    /dev/shm where available) before starting workers and passes its path
+    in ``SHARED_STATE_PATH``. Writers take an advisory lock on the file and
+    bump a generation counter before and after writing (odd while a write
+    is in progress); readers retry until they see the same even generation
+    on both sides of their copy, so they never block.
+    """
+
+    _HEADER = struct.Struct("<QI")  # generation, payload length
+    _READ_ATTEMPTS = 10
+
+    def __init__(self, path: str, fd: int, owner: bool = False):
+        self.path = path
+        self._fd = fd
+        self._buf = mmap.mmap(fd, os.fstat(fd).st_size)
+        self._owner = owner
+
+    @classmethod
+    def create(cls, size: int) -> "SharedSnapshot":
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        fd, path = tempfile.mkstemp(prefix="authservice-state-", dir=directory)
+        os.ftruncate(fd, cls._HEADER.size + size)
+        return cls(path, fd, owner=True)
+
+    @classmethod
+    def attach(cls, path: str) -> "SharedSnapshot":
+        return cls(path, os.open(path, os.O_RDWR))
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buf) - self._HEADER.size
+
+    def generation(self) -> int:
+        return self._HEADER.unpack_from(self._buf, 0)[0]
+
+    def read(self) -> Optional[dict]:
+        """The latest complete document, or None if nothing was written yet"""
+        buf = self._buf
+        for _ in range(self._READ_ATTEMPTS):
+            generation, length = self._HEADER.unpack_from(buf, 0)
+            if generation % 2:
+                continue  # Write in progress
+            if generation == 0:
+                return None
+            data = bytes(buf[self._HEADER.size:self._HEADER.size + length])
+            if self.generation() != generation:
+                continue
+            try:
+                return json.loads(data)
+            except ValueError:
+                continue
+        return None
+
+    def write(self, value: dict) -> bool:
+        """Replace the document; False if it does not fit"""
+        data = json.dumps(value, separators=(",", ":")).encode()
+        if len(data) > self.capacity:
+            return False
+        buf = self._buf
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            generation = self.generation() | 1  # Odd: readers back off
+            self._HEADER.pack_into(buf, 0, generation, 0)
+            buf[self._HEADER.size:self._HEADER.size + len(data)] = data
+            self._HEADER.pack_into(buf, 0, generation + 1, len(data))
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return True
+
+    def close(self):
+        self._buf.close()
+        os.close(self._fd)
+        if self._owner:
+            os.unlink(self.path)
+
+
+def attach_shared_state(path: str) -> Optional[SharedSnapshot]:
+    """The snapshot block created by app.serve, or None when not running under it"""
+    if not path:
+        return None
+    try:
+        return SharedSnapshot.attach(path)
+    except FileNotFoundError:
+        logger.warning(f"Shared state block {path} not found; workers will not share snapshots")
+        return None
@@ -0,0 +1,124 @@
+"""Worker boot timing: how long importing the app and running startup take.
+
+``app/__init__.py`` records when the package started importing; the
+startup handler marks the worker ready once it can serve, and the report
+(time to ready, slowest startup stages, optionally the slowest imports) is
+logged and served at ``/health/startup``. Set ``STARTUP_PROFILE_IMPORTS=1``
+in the environment to time every module imported after ``app``.
+"""
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class _TimedLoader:
+    """Wraps a module's loader for the duration of one ``exec_module``"""
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def exec_module(self, module):
+        # Put the real loader back so nothing keeps a reference to the wrapper
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        self._profiler.run(module, self._loader)
+
+
+class ImportProfiler:
+    """Meta path finder recording each module's own import time
+    (excluding the modules it imports in turn)"""
+
+    def __init__(self):
+        self.timings = {}  # module name -> seconds of its own top-level code
+        self._stack = []
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def run(self, module, loader):
+        self._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - started
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += total
+            self.timings[module.__name__] = total - children
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def slowest(self, count: int = 10) -> list:
+        ranked = sorted(self.timings.items(), key=lambda item: item[1], reverse=True)[:count]
+        return [{"module": name, "ms": round(seconds * 1000, 1)} for name, seconds in ranked]
+
+
+class StartupReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.ready_at = None
+        self.stages = {}  # stage -> seconds
+        self.profiler = None
+
+    def profile_imports(self):
+        self.profiler = ImportProfiler()
+        self.profiler.install()
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = time.perf_counter() - started
+
+    @property
+    def seconds_to_ready(self):
+        return None if self.ready_at is None else self.ready_at - self.started
+
+    def mark_ready(self, budget: float = 0.0):
+        """Record readiness, stop profiling imports and log the report"""
+        if self.ready_at is not None:
+            return
+        self.ready_at = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.uninstall()
+        report = self.to_dict()
+        logger.info(f"Worker ready in {report['seconds_to_ready']}s: {report}")
+        if budget and self.seconds_to_ready > budget:
+            logger.warning(f"Worker startup took {self.seconds_to_ready:.2f}s, over the {budget}s budget")
+
+    def to_dict(self) -> dict:
+        report = {
+            "seconds_to_ready": None if self.ready_at is None else round(self.seconds_to_ready, 3),
+            "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+        }
+        if self.profiler is not None:
+            report["slowest_imports"] = self.profiler.slowest()
+        return report
+
+
+startup_report = StartupReport()
@@ -0,0 +1,36 @@
+"""Micro-benchmarks and a load generator for the auth hot paths.
+
+Run ``python -m benchmarks`` (see benchmarks/__main__.py). The suite points
+DATABASE_URL at a throwaway SQLite file unless BENCH_DATABASE_URL is set, so
+it must configure the environment before anything imports ``app``.
+"""
+import os
+import tempfile
+
+BENCH_DB_PATH = os.path.join(tempfile.gettempdir(), "authservice-bench.db")
+
+def configure_environment():
+    os.environ["DATABASE_URL"] = os.environ.get("BENCH_DATABASE_URL", f"sqlite:///{BENCH_DB_PATH}")
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+    os.environ.setdefault("DB_HEALTH_CHECK_INTERVAL", "0")
+    # The load generator hammers login/register from one client address
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
+    # Throwaway database: bring its schema up to date on startup
+    os.environ.setdefault("DB_STARTUP_MODE", "migrate")
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Human readable regressions of ``current`` against ``baseline``"""
+    regressions = []
+    for name, us in current.get("micro", {}).items():
+        base = baseline.get("micro", {}).get(name)
+        if base and us > base * (1 + threshold):
+            regressions.append(f"micro {name}: {us}us vs baseline {base}us")
+    for name, figures in current.get("load", {}).items():
+        base = baseline.get("load", {}).get(name)
+        if not base:
+            continue
+        if figures["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"load {name}: p95 {figures['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if figures["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"load {name}: {figures['rps']} rps vs baseline {base['rps']} rps")
+    return regressions
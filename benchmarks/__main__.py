@@ -0,0 +1,53 @@
+"""python -m benchmarks [--micro-only | --load-only] [--update-baseline]
+
+Exits non-zero when any figure regresses past --threshold versus
+benchmarks/baseline.json. Baselines are hardware specific: refresh them
+with --update-baseline on the machine that runs the comparison.
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks import compare, configure_environment
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Auth hot-path benchmarks")
+    parser.add_argument("--micro-only", action="store_true")
+    parser.add_argument("--load-only", action="store_true")
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per micro-benchmark run")
+    parser.add_argument("--requests", type=int, default=100, help="requests per load scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    configure_environment()
+    from benchmarks import load, micro
+
+    results = {}
+    if not args.load_only:
+        results["micro"] = micro.run(iterations=args.iterations)
+    if not args.micro_only:
+        results["load"] = load.run(requests=args.requests, concurrency=args.concurrency)
+    print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline recorded; run with --update-baseline", file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
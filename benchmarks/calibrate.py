@@ -0,0 +1,77 @@
+"""python -m benchmarks.calibrate [--scheme bcrypt|argon2] [--target-ms 250]
+
+Finds the highest cost factor whose password *verify* time stays within
+--target-ms on this machine and prints the settings to put in .env. Run it
+on the hardware that serves logins; the result is hardware specific.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from benchmarks import configure_environment
+
+# (setting, first cost tried, largest cost considered)
+COST_RANGES = {
+    "bcrypt": ("PASSWORD_BCRYPT_ROUNDS", 4, 31),
+    "argon2": ("PASSWORD_ARGON2_TIME_COST", 1, 64),
+}
+
+def measure_verify_ms(context, samples: int) -> float:
+    """Median milliseconds to verify a password against a fresh hash"""
+    hashed = context.hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.verify("calibration-password", hashed)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def calibrate(scheme: str, target_ms: float, samples: int = 3, memory_cost: int = 65536, parallelism: int = 4):
+    """(cost, verify_ms) for the largest cost verifying within ``target_ms``.
+
+    Falls back to the smallest cost when even that is slower than the target.
+    """
+    from app.auth.hashing import build_password_context
+
+    _, cost, max_cost = COST_RANGES[scheme]
+    best = None
+    while cost <= max_cost:
+        if scheme == "bcrypt":
+            context = build_password_context("bcrypt", bcrypt_rounds=cost)
+        else:
+            context = build_password_context(
+                "argon2", argon2_time_cost=cost, argon2_memory_cost=memory_cost, argon2_parallelism=parallelism
+            )
+        elapsed = measure_verify_ms(context, samples)
+        if elapsed > target_ms and best is not None:
+            break
+        best = (cost, elapsed)
+        if elapsed > target_ms:
+            break
+        cost += 1
+    return best
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pick password hashing cost for a target verify latency")
+    parser.add_argument("--scheme", choices=sorted(COST_RANGES), default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="verify latency budget per login")
+    parser.add_argument("--samples", type=int, default=3, help="verifications timed per cost")
+    parser.add_argument("--memory-cost", type=int, default=65536, help="argon2 memory in KiB")
+    parser.add_argument("--parallelism", type=int, default=4, help="argon2 lanes")
+    args = parser.parse_args(argv)
+
+    configure_environment()
+    cost, elapsed = calibrate(args.scheme, args.target_ms, args.samples, args.memory_cost, args.parallelism)
+    setting = COST_RANGES[args.scheme][0]
+    print(f"PASSWORD_SCHEMES={args.scheme}")
+    print(f"{setting}={cost}  # verify {elapsed:.1f} ms, ~{1000 / elapsed:.0f} logins/s per core")
+    if args.scheme == "argon2":
+        print(f"PASSWORD_ARGON2_MEMORY_COST={args.memory_cost}")
+        print(f"PASSWORD_ARGON2_PARALLELISM={args.parallelism}")
+    if elapsed > args.target_ms:
+        print(f"# even the minimum cost exceeds {args.target_ms} ms on this machine")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
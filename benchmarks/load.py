@@ -0,0 +1,76 @@
+import asyncio
+import itertools
+import statistics
+import time
+import uuid
+import httpx
+
+def _summary(latencies, errors: int, elapsed: float) -> dict:
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+async def _drive(client: httpx.AsyncClient, send, requests: int, concurrency: int) -> dict:
+    """Issue ``requests`` calls of ``send(client, i)`` from ``concurrency`` workers"""
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            if i >= requests:
+                return
+            started = time.perf_counter()
+            response = await send(client, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summary(latencies, errors, time.perf_counter() - started)
+
+async def _run(requests: int, concurrency: int) -> dict:
+    from app.main import app
+
+    run_id = uuid.uuid4().hex[:8]
+    password = "benchmark-password"
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+            seed = await client.post("/auth/register", json={"email": f"seed-{run_id}@example.com", "password": password})
+            seed.raise_for_status()
+            bearer = {"Authorization": f"Bearer {seed.json()['access_token']}"}
+
+            async def register(client, i):
+                return await client.post("/auth/register", json={"email": f"load-{run_id}-{i}@example.com", "password": password})
+
+            async def login(client, i):
+                return await client.post("/auth/login", data={"username": f"seed-{run_id}@example.com", "password": password})
+
+            async def users_me(client, i):
+                return await client.get("/users/me", headers=bearer)
+
+            results = {}
+            for name, send in (("register", register), ("login", login), ("users_me", users_me)):
+                client.cookies.clear()
+                results[name] = await _drive(client, send, requests, concurrency)
+            return results
+    finally:
+        await app.router.shutdown()
+
+def run(requests: int = 100, concurrency: int = 20) -> dict:
+    """Latency percentiles and throughput per endpoint, served in-process over ASGI"""
+    from app.database import Base, engine
+    import app.models  # noqa: F401
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return asyncio.run(_run(requests, concurrency))
@@ -0,0 +1,86 @@
+import asyncio
+import statistics
+import time
+from fastapi import Response
+from starlette.requests import Request
+
+def _per_op_us(fn, iterations: int, repeat: int) -> float:
+    """Median microseconds per call over ``repeat`` runs of ``iterations`` calls"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - started) / iterations * 1e6)
+    return statistics.median(samples)
+
+def _bearer_request(token: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/users/me",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    })
+
+def _legacy_set_cookie(response, key, value, expires_minutes=None):
+    """The pre-CookiePolicy helper, kept as the reference for "set_cookie" """
+    from datetime import datetime, timedelta
+    from config import settings
+
+    domain = settings.COOKIE_DOMAIN
+    secure = settings.COOKIE_SECURE.lower() == "true"
+    is_local = domain in (None, "", "localhost", "127.0.0.1")
+    cookie_params = {
+        "httponly": True,
+        "secure": secure if not is_local else False,
+        "domain": domain if not is_local else None,
+        "samesite": "lax",
+    }
+    if expires_minutes:
+        expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
+        cookie_params["expires"] = expire.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
+    response.set_cookie(key, value, **{k: v for k, v in cookie_params.items() if v is not None})
+
+def _legacy_state_roundtrip():
+    """The JWT-based state token this replaced, minted and verified once"""
+    import os
+    from datetime import datetime
+    from jose import jwt
+    from config import settings
+
+    token = jwt.encode({"state": os.urandom(16).hex(), "iat": datetime.now().timestamp()}, settings.JWT_SECRET, algorithm="HS256")
+    jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+
+def run(iterations: int = 2000, repeat: int = 5) -> dict:
+    """Microseconds per operation for each hot-path helper"""
+    from app.auth.cookie_utils import cookie_policy, set_cookie
+    from app.auth.jwt import create_access_token, token_cache, verify_token
+    from app.auth.password import get_password_hash
+    from app.auth.security import JWTBearer, generate_state_token, verify_state_token
+
+    token = create_access_token({"sub": "bench@example.com"})
+    bearer = JWTBearer()
+    loop = asyncio.new_event_loop()
+
+    def verify_cold():
+        token_cache.clear()
+        verify_token(token)
+
+    def bearer_call():
+        loop.run_until_complete(bearer(_bearer_request(token)))
+
+    results = {
+        "create_access_token": _per_op_us(lambda: create_access_token({"sub": "bench@example.com"}), iterations, repeat),
+        "verify_token_cold": _per_op_us(verify_cold, iterations, repeat),
+        "verify_token_cached": _per_op_us(lambda: verify_token(token), iterations, repeat),
+        "jwt_bearer_call": _per_op_us(bearer_call, iterations, repeat),
+        "set_cookie": _per_op_us(lambda: set_cookie(Response(), "access_token", token, expires_minutes=30), iterations, repeat),
+        "set_cookie_legacy": _per_op_us(lambda: _legacy_set_cookie(Response(), "access_token", token, expires_minutes=30), iterations, repeat),
+        "cookie_policy_refresh": _per_op_us(lambda: cookie_policy().set_refresh(Response(), token), iterations, repeat),
+        "state_token_roundtrip": _per_op_us(lambda: verify_state_token(generate_state_token(), consume=True), iterations, repeat),
+        "state_token_roundtrip_legacy": _per_op_us(_legacy_state_roundtrip, iterations, repeat),
+        # bcrypt is deliberately slow; a handful of rounds is plenty
+        "get_password_hash": _per_op_us(lambda: get_password_hash("benchmark-password"), max(iterations // 500, 1), repeat),
+    }
+    loop.close()
+    return {name: round(value, 3) for name, value in results.items()}
@@ -5,14 +5,73 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
     REDIRECT_URI: str = ""
+    OAUTH_HTTP_TIMEOUT: float = 10.0    # Seconds per provider request
+    OAUTH_MAX_CONNECTIONS: int = 20     # Keep-alive pool size per provider
+    OAUTH_METADATA_TTL: float = 3600.0  # Discovery/JWKS TTL when the provider sends no max-age
+    OAUTH_STATE_MAX_AGE: int = 300      # Seconds a user has to finish the provider's login (single use)
+    CSRF_TOKEN_MAX_AGE: int = 7200      # Lifetime of double-submit CSRF tokens
     JWT_SECRET: str = ""
+    STATE_SECRET: str = ""                 # HMAC key for OAuth state and CSRF tokens (required)
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRE_MINUTES: int = 30
+    JWT_REFRESH_EXPIRE_DAYS: int = 14
+    REVOCATION_SYNC_INTERVAL: float = 5.0  # Seconds between revoked_tokens syncs
+    JWT_KEYS_FILE: str = ""                # Shared keyring file for RS*/ES* algorithms
+    JWT_KEY_ROTATION_DAYS: float = 30.0
+    JWT_KEY_GRACE_MINUTES: int = 60        # Retired keys keep verifying this long (at least the refresh token lifetime)
+    JWKS_MAX_AGE: int = 300                # Cache-Control max-age of /.well-known/jwks.json
+    TOKEN_CACHE_SIZE: int = 10000  # Verified tokens kept in memory per worker
+    USER_CACHE_SIZE: int = 10000   # User snapshots kept in memory per worker
+    USER_CACHE_TTL: float = 60.0
+    USER_CACHE_NEGATIVE_TTL: float = 10.0  # How long unknown emails are remembered
+    PRESENCE_ONLINE_TTL: float = 300.0     # Idle seconds before a user counts as offline
+    PRESENCE_FLUSH_INTERVAL: float = 30.0  # Seconds between batched last_seen writes (0 disables)
+    CHAT_SEND_QUEUE_SIZE: int = 100        # Undelivered events per WebSocket before it is dropped
+    CHAT_WRITE_BATCH_SIZE: int = 100       # Messages per batched INSERT
+    CHAT_WRITE_FLUSH_INTERVAL: float = 0.05  # Max seconds a message waits to be written
     ALLOWED_ORIGINS: str = ""
+    ADMIN_API_KEY: str = ""        # X-Admin-Key for /admin endpoints (empty disables them)
+    INTROSPECT_API_KEY: str = ""   # X-Introspect-Key for /auth/introspect (empty disables it)
+    INTROSPECT_MAX_TOKENS: int = 100  # Tokens accepted per introspection request
     DATABASE_URL: str = ""
     DOMAIN: str = ""
     COOKIE_DOMAIN: str = ""
     COOKIE_SECURE: str = "False"
+    PASSWORD_HASH_WORKERS: int = 0      # 0 = one thread per CPU core
+    PASSWORD_HASH_QUEUE_SIZE: int = 64  # Requests waiting for a worker before shedding load
+    PASSWORD_SCHEMES: str = "bcrypt"    # First hashes new passwords; the rest verify and are upgraded on login
+    PASSWORD_BCRYPT_ROUNDS: int = 12    # Tune with `python -m benchmarks.calibrate`
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536  # KiB
+    PASSWORD_ARGON2_PARALLELISM: int = 4
+    PASSWORD_REHASH_ON_LOGIN: bool = True     # Replace outdated hashes after a successful login
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOGIN_IP: str = "100/60"         # "<attempts>/<seconds>" per client IP
+    RATE_LIMIT_LOGIN_EMAIL: str = "20/300"      # Per target account, across all IPs
+    RATE_LIMIT_LOGIN_IP_EMAIL: str = "10/60"
+    RATE_LIMIT_REGISTER_IP: str = "20/600"
+    RATE_LIMIT_ROOM_CREATE_USER: str = "20/60"
+    RATE_LIMIT_ROOM_CREATE_IP: str = "60/60"
+    TRUST_FORWARDED_FOR: bool = False           # Key on X-Forwarded-For (only behind a trusted proxy)
+    TRUSTED_PROXY_HOPS: int = 1                 # Proxies in front of the app that append to X-Forwarded-For
+    DB_HEALTH_CHECK_INTERVAL: float = 5.0     # Seconds between background pool probes (0 disables)
+    DB_BREAKER_FAILURE_THRESHOLD: int = 3     # Consecutive failures before failing fast
+    DB_BREAKER_RESET_TIMEOUT: float = 10.0    # Seconds before letting requests try again
+    AUDIT_SINK: str = "database"              # database (auth_events table), jsonl or off
+    AUDIT_JSONL_PATH: str = "auth_events.jsonl"
+    AUDIT_QUEUE_SIZE: int = 10000             # Buffered events before new ones are dropped
+    AUDIT_BATCH_SIZE: int = 500               # Events per write
+    AUDIT_FLUSH_INTERVAL: float = 1.0         # Max seconds an event waits to be written
+    AUDIT_RETENTION_DAYS: int = 90            # Days of auth_events kept (0 keeps everything)
+    DB_POOL_SIZE: int = 5                     # Connections each worker keeps open
+    DB_MAX_OVERFLOW: int = 10                 # Extra connections per worker under load
+    DB_POOL_BUDGET: int = 15                  # Connections for all workers of `python -m app.serve` together
+    WEB_WORKERS: int = 0                      # Worker processes for app.serve (0: one per available core)
+    GRACEFUL_SHUTDOWN_SECONDS: int = 30       # How long a stopping worker waits for in-flight requests
+    SHARED_STATE_SIZE: int = 4 * 1024 * 1024  # Bytes of shared memory for cross-worker snapshots
+    SHARED_STATE_PATH: str = ""               # Set by app.serve for its workers
+    DB_STARTUP_MODE: str = "verify"           # verify: check schema version, migrate: apply migrations, skip
+    STARTUP_BUDGET_SECONDS: float = 5.0       # Warn when a worker takes longer than this to become ready
     GLOBAL_PATH: str = os.path.abspath(os.path.dirname(__file__))
 
     class Config:
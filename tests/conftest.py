@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+# Run the suite against a throwaway SQLite database unless DATABASE_URL is set
+TEST_DB_PATH = os.path.join(tempfile.gettempdir(), "authservice-test.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DB_PATH}")
+# Every TestClient request comes from the same address; tests/test_rate_limit.py
+# exercises the limiter with its own rules
+os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
+os.environ.setdefault("STATE_SECRET", "test-state-secret")
+# Minimum bcrypt cost keeps registration/login tests fast
+os.environ.setdefault("PASSWORD_BCRYPT_ROUNDS", "4")
+
+import asyncio
+import pytest
+
+def run(coro_fn):
+    """Run ``coro_fn(db)`` with a fresh AsyncSession, from synchronous tests"""
+    from app.database import AsyncSessionLocal
+
+    async def wrapper():
+        async with AsyncSessionLocal() as db:
+            return await coro_fn(db)
+    return asyncio.run(wrapper())
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from app.database import Base, engine
+    import app.models  # noqa: F401  register tables on Base.metadata
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
@@ -1,9 +1,12 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 import sys
 import os
 
+from app.crud.user_cache import user_cache
 from app.main import app
+from app.schemas import UserOut
 
 client = TestClient(app)
 
@@ -12,10 +15,17 @@ def test_health_check():
     assert resp.status_code == 200
     assert resp.json()["status"] == "healthy"
 
-def test_register_not_implemented():
+def test_register_issues_tokens_and_rejects_duplicates():
     data = {"email": "test@example.com", "password": "password123", "full_name": "Test User"}
     resp = client.post("/auth/register", json=data)
-    assert resp.status_code == 501
+    assert resp.status_code == 200
+    assert resp.json()["token_type"] == "bearer"
+    assert resp.json()["access_token"] and resp.json()["refresh_token"]
+    client.cookies.clear()
+
+    duplicate = client.post("/auth/register", json=data)
+    assert duplicate.status_code == 400
+    assert duplicate.json()["detail"] == "Email already registered"
 
 def test_login_invalid_credentials():
     resp = client.post("/auth/login", data={"username": "nouser", "password": "wrong"})
@@ -37,3 +47,27 @@ def test_oauth_callback_invalid_state():
 def test_users_me_unauthorized():
     resp = client.get("/users/me")
     assert resp.status_code == 403 or resp.status_code == 401
+
+def test_users_me_returns_public_profile_and_reflects_updates():
+    resp = client.post("/auth/register", json={"email": "profile@example.com", "password": "password123", "full_name": "Before"})
+    assert set(resp.json()) == {"access_token", "token_type", "refresh_token"}
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    client.cookies.clear()
+
+    me = client.get("/users/me", headers=headers)
+    assert me.headers["content-type"] == "application/json"
+    assert set(me.json()) == set(UserOut.__fields__)
+    assert me.json()["full_name"] == "Before"
+
+    patched = client.patch("/users/me", json={"full_name": "After"}, headers=headers)
+    assert patched.json()["full_name"] == "After"
+    assert client.get("/users/me", headers=headers).json()["full_name"] == "After"
+
+def test_login_ignores_stale_negative_cache_entry():
+    client.post("/auth/register", json={"email": "late@example.com", "password": "password123"})
+    client.cookies.clear()
+    # As on a worker that looked the email up before another worker registered it
+    asyncio.run(user_cache.put("late@example.com", None))
+    resp = client.post("/auth/login", data={"username": "late@example.com", "password": "password123"})
+    assert resp.status_code == 200
+    client.cookies.clear()
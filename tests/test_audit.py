@@ -0,0 +1,134 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.audit import AuditLog, AuditSink, DatabaseAuditSink, JsonlAuditSink, audit_log
+from app.database import AsyncSessionLocal
+from app.main import app
+from app.models import AuthEvent
+
+client = TestClient(app)
+
+class ListSink(AuditSink):
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def write(self, events):
+        if self.fail:
+            raise RuntimeError("sink down")
+        self.batches.append(events)
+
+def test_full_queue_drops_new_events_instead_of_blocking():
+    sink = ListSink()
+    log = AuditLog(sink, queue_size=3, batch_size=2)
+    for n in range(5):
+        log.record("login_failed", email=f"u{n}@example.com")
+    assert (log.pending, log.dropped) == (3, 2)
+    asyncio.run(log.flush())
+    assert [len(batch) for batch in sink.batches] == [2, 1]
+    assert [e["email"] for e in sink.batches[0]] == ["u0@example.com", "u1@example.com"]
+
+def test_failed_writes_are_counted_not_retried():
+    log = AuditLog(ListSink(fail=True), batch_size=10)
+    log.record("registered", email="a@example.com")
+    asyncio.run(log.flush())
+    assert (log.pending, log.written, log.dropped) == (0, 0, 1)
+
+def test_background_task_batches_and_stop_flushes():
+    sink = ListSink()
+
+    async def scenario():
+        log = AuditLog(sink, batch_size=100, flush_interval=60)
+        log.start()
+        for n in range(3):
+            log.record("refreshed", email=f"u{n}@example.com")
+        await log.stop()
+        return log.written
+
+    assert asyncio.run(scenario()) == 3
+    assert len(sink.batches) == 1
+
+def test_jsonl_sink_appends_one_object_per_line(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    log = AuditLog(JsonlAuditSink(str(path)))
+    log.record("logged_out", email="a@example.com", reason="user")
+    log.record("logged_out", email="b@example.com")
+    asyncio.run(log.flush())
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["email"] for line in lines] == ["a@example.com", "b@example.com"]
+    assert json.loads(lines[0]["detail"]) == {"reason": "user"}
+
+def test_login_attempts_land_in_auth_events():
+    assert isinstance(audit_log.sink, DatabaseAuditSink)
+    client.post("/auth/register", json={"email": "audited@example.com", "password": "password123"})
+    client.post("/auth/login", data={"username": "audited@example.com", "password": "wrong-password"})
+    client.cookies.clear()
+
+    async def events():
+        await audit_log.flush()
+        async with AsyncSessionLocal() as db:
+            rows = await db.execute(
+                select(AuthEvent.event, AuthEvent.ip).where(AuthEvent.email == "audited@example.com").order_by(AuthEvent.created_at)
+            )
+            return rows.all()
+
+    assert [event for event, _ in asyncio.run(events())] == ["registered", "login_failed"]
+
+def test_overloaded_login_is_not_a_failed_login(monkeypatch):
+    from fastapi import HTTPException
+    from app.auth.hashing import hashing_pool
+
+    async def overloaded(*args, **kwargs):
+        raise HTTPException(status_code=503, detail="Password hashing is overloaded")
+
+    client.post("/auth/register", json={"email": "busy@example.com", "password": "password123"})
+    client.cookies.clear()
+    monkeypatch.setattr(hashing_pool, "run", overloaded)
+    response = client.post("/auth/login", data={"username": "busy@example.com", "password": "password123"})
+    assert response.status_code == 503
+
+    async def events():
+        await audit_log.flush()
+        async with AsyncSessionLocal() as db:
+            return (await db.scalars(select(AuthEvent.event).where(AuthEvent.email == "busy@example.com"))).all()
+
+    assert asyncio.run(events()) == ["registered"]
+
+def test_sinks_must_implement_write():
+    class Incomplete(AuditSink):
+        pass
+
+    with pytest.raises(NotImplementedError):
+        asyncio.run(Incomplete().write([]))
+
+def test_unknown_sink_setting_is_rejected(monkeypatch):
+    from app import audit
+    monkeypatch.setattr(audit.settings, "AUDIT_SINK", "off")
+    assert audit._sink() is None
+    monkeypatch.setattr(audit.settings, "AUDIT_SINK", "none")
+    with pytest.raises(ValueError):
+        audit._sink()
+
+def test_postgres_partition_maintenance_is_serialised_across_workers():
+    from datetime import date
+
+    class RecordingSession:
+        bind = type("Bind", (), {"dialect": type("Dialect", (), {"name": "postgresql"})})
+
+        def __init__(self):
+            self.statements = []
+
+        async def execute(self, statement, params=None):
+            self.statements.append(" ".join(str(statement).split()))
+
+        async def scalars(self, statement):
+            return type("Scalars", (), {"all": lambda _: ["auth_events_20200101", "auth_events_20261018"]})()
+
+    db = RecordingSession()
+    asyncio.run(DatabaseAuditSink(None, retention_days=90)._maintain(db, date(2026, 10, 18)))
+    assert db.statements[0] == "SELECT pg_advisory_xact_lock(:key)"
+    assert any("auth_events_20261019 PARTITION OF" in s for s in db.statements)
+    assert db.statements[-1] == "DROP TABLE IF EXISTS auth_events_20200101"
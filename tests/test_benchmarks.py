@@ -0,0 +1,23 @@
+from benchmarks import compare
+
+BASELINE = {
+    "micro": {"verify_token_cold": 100.0},
+    "load": {"login": {"p95_ms": 200.0, "rps": 50.0}},
+}
+
+def test_compare_flags_slowdowns_past_threshold():
+    current = {
+        "micro": {"verify_token_cold": 130.0},
+        "load": {"login": {"p95_ms": 210.0, "rps": 30.0}},
+    }
+    regressions = compare(current, BASELINE, threshold=0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("micro verify_token_cold")
+    assert "rps" in regressions[1]
+
+def test_compare_accepts_results_within_threshold_and_new_metrics():
+    current = {
+        "micro": {"verify_token_cold": 120.0, "new_metric": 5.0},
+        "load": {"login": {"p95_ms": 240.0, "rps": 40.0}},
+    }
+    assert compare(current, BASELINE, threshold=0.25) == []
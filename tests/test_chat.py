@@ -0,0 +1,132 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database import async_engine
+from app.main import app
+
+client = TestClient(app)
+
+def _auth(email: str) -> dict:
+    resp = client.post("/auth/register", json={"email": email, "password": "password123", "full_name": email})
+    assert resp.status_code == 200
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+@pytest.fixture(scope="module")
+def auth():
+    return {name: _auth(f"{name}.chat@example.com") for name in ("alice", "bob", "carol")}
+
+def _room(headers, members, name=None):
+    resp = client.post("/chat/rooms", json={"name": name, "is_group": len(members) > 1, "member_emails": members}, headers=headers)
+    assert resp.status_code == 200
+    return resp.json()
+
+def test_message_pages_walk_history_without_gaps_or_duplicates(auth):
+    room = _room(auth["alice"], ["bob.chat@example.com"])
+    assert {u["username"] for u in room["users"]} == {"alice.chat"}
+    for i in range(5):
+        resp = client.post(f"/chat/rooms/{room['id']}/messages", json={"content": f"m{i}"}, headers=auth["alice"])
+        assert resp.status_code == 200
+        assert resp.json()["sender"]["username"] == "alice.chat"
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/chat/rooms/{room['id']}/messages", params=params, headers=auth["bob"]).json()
+        seen += [m["content"] for m in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == ["m4", "m3", "m2", "m1", "m0"]
+
+def test_unread_counts_and_mark_read(auth):
+    room = _room(auth["alice"], ["bob.chat@example.com"], name="unread")
+    ids = [client.post(f"/chat/rooms/{room['id']}/messages", json={"content": str(i)}, headers=auth["alice"]).json()["id"]
+           for i in range(3)]
+
+    def unread(headers):
+        rooms = client.get("/chat/rooms", headers=headers).json()["items"]
+        return next(r["unread"] for r in rooms if r["id"] == room["id"])
+    assert unread(auth["bob"]) == 3
+    assert unread(auth["alice"]) == 0  # own messages never count
+    assert client.post(f"/chat/rooms/{room['id']}/read", json={"up_to_id": ids[1]}, headers=auth["bob"]).json() == {"marked": 2}
+    assert unread(auth["bob"]) == 1
+    assert client.post(f"/chat/rooms/{room['id']}/read", headers=auth["bob"]).json() == {"marked": 1}
+    assert unread(auth["bob"]) == 0
+
+def test_read_state_is_tracked_per_member_in_group_rooms(auth):
+    room = _room(auth["alice"], ["bob.chat@example.com", "carol.chat@example.com"], name="group-read")
+    message = client.post(f"/chat/rooms/{room['id']}/messages", json={"content": "hi all"}, headers=auth["alice"]).json()
+
+    def unread(headers):
+        rooms = client.get("/chat/rooms", headers=headers).json()["items"]
+        return next(r["unread"] for r in rooms if r["id"] == room["id"])
+
+    def read_flag(headers):
+        return client.get(f"/chat/rooms/{room['id']}/messages", headers=headers).json()["items"][0]["read"]
+
+    assert client.post(f"/chat/rooms/{room['id']}/read", headers=auth["bob"]).json() == {"marked": 1}
+    # Bob reading it does not mark it read for Carol, nor as read by everyone for Alice
+    assert (unread(auth["bob"]), unread(auth["carol"])) == (0, 1)
+    assert read_flag(auth["bob"]) and not read_flag(auth["carol"]) and not read_flag(auth["alice"])
+
+    # Read positions never move past the newest message
+    client.post(f"/chat/rooms/{room['id']}/read", json={"up_to_id": message["id"] + 1000}, headers=auth["carol"])
+    client.post(f"/chat/rooms/{room['id']}/messages", json={"content": "later"}, headers=auth["alice"])
+    assert unread(auth["carol"]) == 1
+    assert client.get(f"/chat/rooms/{room['id']}/messages", headers=auth["alice"]).json()["items"][1]["read"]
+
+def test_invited_members_are_hidden_until_they_open_the_room(auth):
+    known = _room(auth["alice"], ["carol.chat@example.com"], name="invite")
+    unknown = _room(auth["alice"], ["nobody.chat@example.com"], name="invite")
+    strip = lambda room: {k: v for k, v in room.items() if k not in ("id", "created_at", "updated_at")}
+    assert strip(known) == strip(unknown)
+
+    def members(headers, room_id):
+        rooms = client.get("/chat/rooms", headers=headers).json()["items"]
+        return {u["username"] for u in next(r for r in rooms if r["id"] == room_id)["users"]}
+    assert members(auth["alice"], known["id"]) == {"alice.chat"}
+    # The invitee sees the room; opening it joins, even when there is nothing to read
+    assert members(auth["carol"], known["id"]) == {"alice.chat"}
+    assert client.post(f"/chat/rooms/{known['id']}/read", headers=auth["carol"]).json() == {"marked": 0}
+    assert members(auth["alice"], known["id"]) == {"alice.chat", "carol.chat"}
+
+def test_room_creation_is_rate_limited(auth, monkeypatch):
+    from app.auth.rate_limit import rate_limiter
+    from config import settings
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ROOM_CREATE_USER", "2/60")
+    statuses = [client.post("/chat/rooms", json={"name": "flood"}, headers=auth["bob"]).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+
+def test_rooms_are_listed_by_latest_activity(auth):
+    older = _room(auth["carol"], [], name="older")
+    newer = _room(auth["carol"], [], name="newer")
+    client.post(f"/chat/rooms/{older['id']}/messages", json={"content": "bump"}, headers=auth["carol"])
+    page = client.get("/chat/rooms", params={"limit": 1}, headers=auth["carol"]).json()
+    assert [r["name"] for r in page["items"]] == ["older"]
+    page = client.get("/chat/rooms", params={"limit": 1, "cursor": page["next_cursor"]}, headers=auth["carol"]).json()
+    assert [r["name"] for r in page["items"]] == ["newer"]
+
+def test_non_members_and_bad_cursors_are_rejected(auth):
+    room = _room(auth["alice"], [], name="private")
+    assert client.get(f"/chat/rooms/{room['id']}/messages", headers=auth["carol"]).status_code == 404
+    assert client.post(f"/chat/rooms/{room['id']}/messages", json={"content": "hi"}, headers=auth["carol"]).status_code == 404
+    assert client.get(f"/chat/rooms/{room['id']}/messages", params={"cursor": "garbage"}, headers=auth["alice"]).status_code == 400
+
+def test_room_listing_query_count_does_not_grow_with_rooms(auth):
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        client.get("/chat/rooms", params={"limit": 1}, headers=auth["alice"])
+        few = len(statements)
+        statements.clear()
+        client.get("/chat/rooms", params={"limit": 50}, headers=auth["alice"])
+        many = len(statements)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert many == few
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from starlette.websockets import WebSocketDisconnect
+
+from app.chat_hub import ChatHub, InMemoryBroker, MessageWriter
+from app.database import AsyncSessionLocal
+from app.main import app
+
+client = TestClient(app)
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.email = f"user{user_id}@example.com"
+        self.username = f"user{user_id}"
+        self.full_name = None
+        self.profile_picture = None
+
+def _register(email: str) -> tuple:
+    resp = client.post("/auth/register", json={"email": email, "password": "password123"})
+    token = resp.json()["access_token"]
+    return token, {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(scope="module")
+def room():
+    alice_token, alice = _register("alice.ws@example.com")
+    bob_token, _ = _register("bob.ws@example.com")
+    mallory_token, _ = _register("mallory.ws@example.com")
+    resp = client.post("/chat/rooms", json={"member_emails": ["bob.ws@example.com"]}, headers=alice)
+    return {"id": resp.json()["id"], "alice": alice_token, "bob": bob_token, "mallory": mallory_token, "headers": alice}
+
+def test_events_fan_out_across_hubs_sharing_a_broker():
+    async def scenario():
+        broker = InMemoryBroker()
+        hubs = [ChatHub(broker, MessageWriter(AsyncSessionLocal), queue_size=10) for _ in range(2)]
+        sockets = [FakeSocket() for _ in range(3)]
+        connections = [
+            await hubs[0].connect(sockets[0], FakeUser(1), room_id=7),
+            await hubs[1].connect(sockets[1], FakeUser(2), room_id=7),
+            await hubs[1].connect(sockets[2], FakeUser(3), room_id=8),
+        ]
+        await broker.publish(7, {"type": "message", "n": 1})
+        return [c.queue.qsize() for c in connections]
+    assert asyncio.run(scenario()) == [1, 1, 0]
+
+def test_slow_consumer_is_dropped_without_blocking_the_room():
+    async def scenario():
+        hub = ChatHub(InMemoryBroker(), MessageWriter(AsyncSessionLocal), queue_size=2)
+        slow = await hub.connect(FakeSocket(), FakeUser(1), room_id=1)
+        fast = await hub.connect(FakeSocket(), FakeUser(2), room_id=1)
+        for n in range(3):
+            hub.deliver(1, {"n": n})
+            fast.queue.get_nowait()
+        return slow.dropped.is_set(), fast.dropped.is_set(), hub.connections, hub.dropped
+    assert asyncio.run(scenario()) == (True, False, 1, 1)
+
+def test_writer_batches_concurrent_messages(room):
+    async def scenario():
+        writer = MessageWriter(AsyncSessionLocal, batch_size=100, flush_interval=0.05)
+        writer.start()
+        try:
+            rows = await asyncio.gather(*(writer.submit(room["id"], 1, f"batch {n}") for n in range(5)))
+        finally:
+            await writer.stop()
+        return writer.batches, [row["id"] for row in rows]
+    batches, ids = asyncio.run(scenario())
+    assert batches == 1
+    assert ids == sorted(ids) and len(set(ids)) == 5
+
+def test_failed_batch_only_fails_the_offending_rows(room):
+    class FlakyWriter(MessageWriter):
+        async def _insert(self, rows):
+            if any(row["content"] == "bad" for row in rows):
+                raise IntegrityError("INSERT INTO messages", {}, Exception("constraint violated"))
+            return await super()._insert(rows)
+
+    async def scenario():
+        writer = FlakyWriter(AsyncSessionLocal, batch_size=100, flush_interval=0.05)
+        writer.start()
+        try:
+            return await asyncio.gather(
+                *(writer.submit(room["id"], 1, content) for content in ("ok 1", "bad", "ok 2")),
+                return_exceptions=True,
+            ), writer.failed
+        finally:
+            await writer.stop()
+    results, failed = asyncio.run(scenario())
+    assert [type(r) for r in results] == [dict, IntegrityError, dict]
+    assert failed == 1
+
+def test_connection_failure_fails_the_batch_without_per_row_retries(room):
+    attempts = []
+
+    class UnreachableWriter(MessageWriter):
+        async def _insert(self, rows):
+            attempts.append(len(rows))
+            raise ConnectionRefusedError("database unreachable")
+
+    async def scenario():
+        writer = UnreachableWriter(AsyncSessionLocal, batch_size=100, flush_interval=0.05)
+        writer.start()
+        try:
+            return await asyncio.gather(
+                *(writer.submit(room["id"], 1, f"m{i}") for i in range(50)), return_exceptions=True
+            ), writer.failed
+        finally:
+            await writer.stop()
+    results, failed = asyncio.run(scenario())
+    assert all(isinstance(r, ConnectionRefusedError) for r in results)
+    assert failed == 50
+    assert attempts == [50]
+
+def test_websocket_rejects_foreign_origins(room, monkeypatch):
+    monkeypatch.setattr("app.main.settings.ALLOWED_ORIGINS", "https://app.example.com")
+    url = f"/ws/chat/rooms/{room['id']}"
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect(url, headers={"cookie": f"access_token={room['alice']}", "origin": "https://evil.example"}) as ws:
+            ws.receive_text()
+    assert exc.value.code == 1008
+    with client.websocket_connect(url, headers={"cookie": f"access_token={room['alice']}", "origin": "https://app.example.com"}) as ws:
+        ws.send_json({"content": "same-site"})
+        assert ws.receive_json()["message"]["content"] == "same-site"
+
+def test_websocket_wildcard_origin_matches_cors(room, monkeypatch):
+    monkeypatch.setattr("app.main.settings.ALLOWED_ORIGINS", "*")
+    url = f"/ws/chat/rooms/{room['id']}"
+    with client.websocket_connect(url, headers={"cookie": f"access_token={room['alice']}", "origin": "https://anywhere.example"}) as ws:
+        ws.send_json({"content": "wildcard"})
+        assert ws.receive_json()["message"]["content"] == "wildcard"
+
+def test_rest_posts_reach_websocket_members(room):
+    url = f"/ws/chat/rooms/{room['id']}"
+    with client.websocket_connect(url, headers={"cookie": f"access_token={room['bob']}"}) as bob:
+        resp = client.post(f"/chat/rooms/{room['id']}/messages", json={"content": "hello over rest"}, headers=room["headers"])
+        assert resp.status_code == 200
+        event = bob.receive_json()
+        assert event["message"]["content"] == "hello over rest"
+        assert event["message"]["id"] == resp.json()["id"]
+
+def test_websocket_rejects_bad_tokens_and_non_members(room):
+    for cookie in ("access_token=garbage", f"access_token={room['mallory']}"):
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect(f"/ws/chat/rooms/{room['id']}", headers={"cookie": cookie}) as ws:
+                ws.receive_text()
+        assert exc.value.code == 1008
+
+def test_websocket_messages_reach_other_members_and_are_stored(room):
+    url = f"/ws/chat/rooms/{room['id']}"
+    with client.websocket_connect(url, headers={"cookie": f"access_token={room['alice']}"}) as alice, \
+            client.websocket_connect(url, headers={"cookie": f"access_token={room['bob']}"}) as bob:
+        alice.send_json({"content": "hello over ws"})
+        event = bob.receive_json()
+        assert event["type"] == "message"
+        assert event["message"]["content"] == "hello over ws"
+        assert event["message"]["sender"]["username"] == "alice.ws"
+        assert alice.receive_json()["message"]["id"] == event["message"]["id"]
+
+        alice.send_json({"wrong": "shape"})
+        assert alice.receive_json()["type"] == "error"
+
+    history = client.get(f"/chat/rooms/{room['id']}/messages", headers=room["headers"]).json()["items"]
+    assert history[0]["id"] == event["message"]["id"]
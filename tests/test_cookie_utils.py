@@ -2,7 +2,7 @@ import os
 import pytest
 from fastapi import Response
 
-from app.auth.cookie_utils import set_cookie
+from app.auth.cookie_utils import CookiePolicy, set_cookie
 from config import settings
 
 @pytest.fixture(autouse=True)
@@ -55,3 +55,25 @@ def test_set_cookie_with_domain_and_insecure(monkeypatch):
     cookie = response.headers.get("set-cookie")
     assert "Domain=example.com" in cookie
     assert "Secure" not in cookie
+
+def test_policy_deletions_match_the_cookie_scope():
+    policy = CookiePolicy("example.com", secure=True, refresh_max_age=86400)
+    response = Response()
+    policy.set_refresh(response, "tok.en-1")
+    policy.delete(response, "access_token")
+    refresh, deletion = response.headers.getlist("set-cookie")
+    assert refresh.startswith("refresh_token=tok.en-1; Max-Age=86400; Expires=")
+    assert deletion.startswith('access_token=""; Max-Age=0;')
+    assert "Domain=example.com" in deletion and "Secure" in deletion
+
+def test_policy_rejects_values_that_need_quoting():
+    with pytest.raises(ValueError):
+        CookiePolicy("", secure=False, refresh_max_age=60).header("foo", "a b;c")
+
+def test_logout_clears_cookies_on_the_returned_response():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    resp = TestClient(app).post("/auth/logout")
+    cleared = [c.split("=", 1)[0] for c in resp.headers.get_list("set-cookie")]
+    assert cleared == ["access_token", "refresh_token"]
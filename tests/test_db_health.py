@@ -0,0 +1,74 @@
+import asyncio
+import sqlite3
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app import database
+from app.db_health import CircuitBreaker, PoolWaitStats, TimedQueuePool, is_connection_error, pool_stats
+
+def test_breaker_opens_after_threshold_and_half_opens_after_timeout(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    now = [100.0]
+    monkeypatch.setattr("app.db_health.time.monotonic", lambda: now[0])
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    now[0] += 10
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_get_async_db_fails_fast_while_breaker_open(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    monkeypatch.setattr(database, "db_breaker", breaker)
+
+    async def checkout():
+        async for _ in database.get_async_db():
+            pass
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(checkout())
+    assert exc.value.status_code == 503
+    assert breaker.rejected == 1
+
+def test_pool_stats_reports_checkouts_and_wait_time(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=2)
+    engine.pool.wait_stats = PoolWaitStats()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        stats = pool_stats(engine.pool, engine.pool.wait_stats)
+        assert stats["checked_out"] == 1
+    stats = pool_stats(engine.pool, engine.pool.wait_stats)
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 1
+    engine.dispose()
+
+def test_only_connection_failures_count_as_connection_errors():
+    class PgError(Exception):
+        def __init__(self, sqlstate):
+            self.sqlstate = sqlstate
+
+    def wrapped(orig):
+        return OperationalError("SELECT 1", {}, orig)
+
+    assert is_connection_error(wrapped(PgError("08006")))  # connection_failure
+    assert is_connection_error(wrapped(PgError("57P01")))  # admin_shutdown
+    assert not is_connection_error(wrapped(PgError("40P01")))  # deadlock_detected
+    assert not is_connection_error(wrapped(PgError("40001")))  # serialization_failure
+    assert not is_connection_error(wrapped(PgError("55P03")))  # lock_not_available
+    assert is_connection_error(ConnectionRefusedError())
+
+    locked = sqlite3.OperationalError("database is locked")
+    locked.sqlite_errorname = "SQLITE_BUSY"
+    assert not is_connection_error(wrapped(locked))
+    cantopen = sqlite3.OperationalError("unable to open database file")
+    cantopen.sqlite_errorname = "SQLITE_CANTOPEN"
+    assert is_connection_error(wrapped(cantopen))
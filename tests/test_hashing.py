@@ -0,0 +1,39 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+
+from app.auth.hashing import HashingPool
+
+def test_run_returns_result_and_records_latency():
+    pool = HashingPool(workers=2, queue_size=2)
+    try:
+        result = asyncio.run(pool.run(lambda a, b: a + b, 1, 2))
+    finally:
+        pool.shutdown()
+    assert result == 3
+    stats = pool.stats()
+    assert stats["completed"] == 1
+    assert stats["queue_depth"] == 0
+
+def test_saturated_pool_sheds_load():
+    pool = HashingPool(workers=1, queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert pool.queue_depth == 1
+        with pytest.raises(HTTPException) as exc:
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(*running)
+        return exc.value
+
+    try:
+        error = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert pool.stats()["rejected"] == 1
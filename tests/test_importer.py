@@ -0,0 +1,115 @@
+import asyncio
+import json
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.auth.hashing import build_password_context
+from app.auth.security import settings as security_settings
+from app.crud.users import create_user_async, get_user_by_email_async
+from app.database import AsyncSessionLocal
+from app import importer
+from app.importer import import_users, iter_lines, parse_records
+from app.main import app
+from app.schemas import UserCreate
+from tests.conftest import run
+
+client = TestClient(app)
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+def import_text(*parts, format="jsonl", **kwargs):
+    records = parse_records(iter_lines(_chunks(*parts)), format)
+    return asyncio.run(import_users(AsyncSessionLocal, records, **kwargs)).to_dict()
+
+def test_lines_are_split_across_chunk_boundaries():
+    async def collect():
+        return [line async for line in iter_lines(_chunks(b'{"a": 1}\r\n{"b"', b': 2}\n', "tail"))]
+    assert asyncio.run(collect()) == ['{"a": 1}', '{"b": 2}', "tail"]
+
+def test_jsonl_import_reports_bad_rows_without_aborting():
+    existing_hash = build_password_context("bcrypt", bcrypt_rounds=4).hash("imported-secret")
+    body = "\n".join([
+        json.dumps({"email": "bulk1@example.com", "password": "password123", "full_name": "Bulk One"}),
+        "not json",
+        json.dumps({"email": "bulk2@example.com", "hashed_password": existing_hash}),
+        json.dumps({"email": "bulk3@example.com", "password": "short"}),
+        json.dumps({"email": "bulk4@example.com", "hashed_password": "plaintext"}),
+        json.dumps({"email": "bulk1@example.com", "password": "password123"}),
+        "",
+    ])
+    report = import_text(body, chunk_size=2)
+    assert report["processed"] == 6
+    assert report["written"] == 2
+    assert report["failed"] == 4
+    assert [error["line"] for error in report["errors"]] == [2, 4, 5, 6]
+
+    user = run(lambda db: get_user_by_email_async(db, "bulk2@example.com"))
+    assert user.hashed_password == existing_hash
+    assert user.username == "bulk2"
+
+def test_existing_users_are_skipped_or_updated():
+    row = {"email": "bulkexisting@example.com", "password": "password123", "full_name": "First"}
+    assert import_text(json.dumps(row))["written"] == 1
+
+    row["full_name"] = "Second"
+    assert import_text(json.dumps(row))["skipped"] == 1
+    assert run(lambda db: get_user_by_email_async(db, "bulkexisting@example.com")).full_name == "First"
+
+    assert import_text(json.dumps(row), update_existing=True)["written"] == 1
+    assert run(lambda db: get_user_by_email_async(db, "bulkexisting@example.com")).full_name == "Second"
+
+def test_rows_sharing_a_local_part_get_distinct_usernames():
+    run(lambda db: create_user_async(db, UserCreate(email="taken@existing.example.com", password="password123"), "hashed"))
+    body = (
+        "email,password,full_name\n"
+        "clash@one.example.com,password123,One\n"
+        "clash@two.example.com,password123,Two\n"
+        "taken@import.example.com,password123,\n"
+    )
+    report = import_text(body, format="csv")
+    assert (report["written"], report["failed"]) == (3, 0)
+    users = [run(lambda db: get_user_by_email_async(db, email))
+             for email in ("clash@one.example.com", "clash@two.example.com", "taken@import.example.com")]
+    assert users[0].username == "clash"
+    assert users[1].username.startswith("clash-")
+    assert users[2].username.startswith("taken-")
+
+def test_username_conflicts_fail_only_the_offending_row(monkeypatch):
+    run(lambda db: create_user_async(db, UserCreate(email="raced@existing.example.com", password="password123"), "hashed"))
+
+    async def stale(db, emails):
+        # As if another worker registered the username after it was checked
+        return {email: "raced" if email.startswith("raced@") else email.split("@")[0] for email in emails}
+    monkeypatch.setattr(importer, "assign_usernames_async", stale)
+    body = "email,password,full_name\nfine@race.example.com,password123,\nraced@import.example.com,password123,\n"
+    report = import_text(body, format="csv")
+    assert (report["written"], report["failed"]) == (1, 1)
+    assert report["errors"][0]["line"] == 3
+
+def test_admin_endpoint_requires_key(monkeypatch):
+    body = json.dumps({"email": "bulkapi@example.com", "password": "password123"})
+    assert client.post("/admin/users/import", content=body).status_code == 403
+
+    monkeypatch.setattr(security_settings, "ADMIN_API_KEY", "admin-secret")
+    assert client.post("/admin/users/import", content=body, headers={"X-Admin-Key": "wrong"}).status_code == 403
+    resp = client.post("/admin/users/import", content=body, headers={"X-Admin-Key": "admin-secret"})
+    assert resp.status_code == 200
+    assert resp.json()["written"] == 1
+
+def test_hashing_load_shedding_is_waited_out_not_fatal(monkeypatch):
+    real_hash = importer.get_password_hash_async
+    shed = [2]
+
+    async def busy_then_free(password):
+        if shed[0]:
+            shed[0] -= 1
+            raise HTTPException(status_code=503, detail="Server busy, please retry")
+        return await real_hash(password)
+
+    monkeypatch.setattr(importer, "get_password_hash_async", busy_then_free)
+    monkeypatch.setattr(importer, "HASH_RETRY_DELAY", 0.001)
+    report = import_text(json.dumps({"email": "bulkbusy@example.com", "password": "password123"}))
+    assert report["written"] == 1
+    assert shed[0] == 0
@@ -0,0 +1,96 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import event, update
+
+from app.crud.user_cache import user_cache
+from app.database import AsyncSessionLocal, get_async_engine
+from app.main import app
+from app.models import User
+from config import settings
+
+client = TestClient(app)
+HEADERS = {"X-Introspect-Key": "gateway-secret"}
+
+def register(email):
+    client.cookies.clear()
+    resp = client.post("/auth/register", json={"email": email, "password": "password123"})
+    assert resp.status_code == 200
+    client.cookies.clear()
+    return resp.json()
+
+def introspect(tokens, **body):
+    return client.post("/auth/introspect", json={"tokens": tokens, **body}, headers=HEADERS)
+
+def test_requires_introspection_key(monkeypatch):
+    assert introspect(["x"]).status_code == 403
+    monkeypatch.setattr(settings, "INTROSPECT_API_KEY", "gateway-secret")
+    assert client.post("/auth/introspect", json={"tokens": []}, headers={"X-Introspect-Key": "wrong"}).status_code == 403
+    assert introspect([]).json() == {"results": []}
+
+def test_batch_results_follow_token_order(monkeypatch):
+    monkeypatch.setattr(settings, "INTROSPECT_API_KEY", "gateway-secret")
+    tokens = register("introspect@example.com")
+    resp = introspect([tokens["access_token"], "garbage", tokens["refresh_token"], tokens["access_token"]])
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [r["active"] for r in results] == [True, False, True, True]
+    assert results[0]["sub"] == "introspect@example.com"
+    assert results[0]["token_type"] == "access_token"
+    assert results[1] == {"active": False}
+    # The hint only orders the attempts; the reported type is the one that matched
+    assert results[2]["token_type"] == "refresh_token" and results[2]["typ"] == "refresh"
+
+    hinted = introspect([tokens["refresh_token"], tokens["access_token"]], token_type_hint="refresh_token").json()["results"]
+    assert [r["token_type"] for r in hinted] == ["refresh_token", "access_token"]
+
+def test_revoked_tokens_are_inactive(monkeypatch):
+    monkeypatch.setattr(settings, "INTROSPECT_API_KEY", "gateway-secret")
+    tokens = register("introspect-revoked@example.com")
+    client.post("/auth/logout", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert introspect([tokens["access_token"]]).json()["results"] == [{"active": False}]
+
+def test_include_user_resolves_users_in_one_query(monkeypatch):
+    monkeypatch.setattr(settings, "INTROSPECT_API_KEY", "gateway-secret")
+    emails = [f"introspect-user{n}@example.com" for n in range(3)]
+    tokens = [register(email)["access_token"] for email in emails]
+
+    async def prepare():
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(User).where(User.email == emails[2]).values(is_active=False))
+            await db.commit()
+        for email in emails:
+            await user_cache.invalidate(email)
+    asyncio.run(prepare())
+
+    statements = []
+    def count(conn, cursor, statement, *args):
+        if "FROM users" in statement:
+            statements.append(statement)
+    sync_engine = get_async_engine().sync_engine
+    event.listen(sync_engine, "before_cursor_execute", count)
+    try:
+        results = introspect(tokens, include_user=True).json()["results"]
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", count)
+
+    assert len(statements) == 1
+    assert [r["active"] for r in results] == [True, True, False]
+    assert results[0]["username"] == "introspect-user0"
+
+def test_open_breaker_only_affects_include_user(monkeypatch):
+    from app import database
+    from app.db_health import CircuitBreaker
+
+    monkeypatch.setattr(settings, "INTROSPECT_API_KEY", "gateway-secret")
+    token = register("introspect-breaker@example.com")["access_token"]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    monkeypatch.setattr(database, "db_breaker", breaker)
+
+    assert introspect([token]).json()["results"][0]["active"] is True
+    assert introspect([token], include_user=True).status_code == 503
+
+def test_batch_size_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, "INTROSPECT_API_KEY", "gateway-secret")
+    monkeypatch.setattr(settings, "INTROSPECT_MAX_TOKENS", 2)
+    assert introspect(["a", "b", "c"]).status_code == 413
@@ -0,0 +1,81 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt as jose_jwt
+
+import app.auth.jwt as auth_jwt
+import app.main as main
+from app.auth.keys import KeyRing, retired_key_grace
+
+client = TestClient(main.app)
+
+@pytest.fixture
+def ring(tmp_path, monkeypatch):
+    ring = KeyRing("ES256", path=str(tmp_path / "keys.json"), publish_lead=0, grace=60)
+    ring.load()
+    monkeypatch.setattr(auth_jwt, "keyring", ring)
+    monkeypatch.setattr(main, "keyring", ring)
+    auth_jwt.token_cache.clear()
+    return ring
+
+def test_tokens_carry_kid_and_verify_across_rotation(ring):
+    old_token = auth_jwt.create_access_token({"sub": "keys@example.com"})
+    old_kid = jose_jwt.get_unverified_header(old_token)["kid"]
+
+    new_key = ring.rotate()
+    new_token = auth_jwt.create_access_token({"sub": "keys@example.com"})
+    auth_jwt.token_cache.clear()
+
+    assert jose_jwt.get_unverified_header(new_token)["kid"] == new_key.kid
+    assert auth_jwt.verify_token(old_token)["sub"] == "keys@example.com"
+    assert auth_jwt.verify_token(new_token)["sub"] == "keys@example.com"
+    assert ring.keys[old_kid].expires_at <= time.time() + 60
+
+def test_retired_key_stops_verifying_after_grace(ring):
+    token = auth_jwt.create_access_token({"sub": "keys@example.com"})
+    kid = jose_jwt.get_unverified_header(token)["kid"]
+    ring.rotate()
+    ring.keys[kid].expires_at = time.time() - 1
+    with pytest.raises(ValueError):
+        auth_jwt.verify_token(token)
+
+def test_workers_share_rotations_through_the_key_file(ring):
+    other_worker = KeyRing("ES256", path=ring.path, publish_lead=0)
+    other_worker.load()
+    new_key = other_worker.rotate()
+    assert ring.verification_key(new_key.kid) is not None
+
+def test_jwks_endpoint_serves_public_keys_with_etag(ring):
+    resp = client.get("/.well-known/jwks.json")
+    assert resp.status_code == 200
+    keys = resp.json()["keys"]
+    assert [k["kid"] for k in keys] == list(ring.keys)
+    assert all("d" not in k for k in keys)
+    assert "max-age" in resp.headers["cache-control"]
+
+    cached = client.get("/.well-known/jwks.json", headers={"If-None-Match": resp.headers["etag"]})
+    assert cached.status_code == 304
+
+    ring.rotate()
+    assert client.get("/.well-known/jwks.json", headers={"If-None-Match": resp.headers["etag"]}).status_code == 200
+
+def test_refresh_token_issued_before_rotation_survives_past_access_grace(tmp_path, monkeypatch):
+    ring = KeyRing("ES256", path=str(tmp_path / "keys.json"), publish_lead=0, grace=retired_key_grace())
+    ring.load()
+    monkeypatch.setattr(auth_jwt, "keyring", ring)
+    monkeypatch.setattr(main, "keyring", ring)
+    resp = client.post("/auth/register", json={"email": "rotation@example.com", "password": "password123"})
+    refresh_token = resp.json()["refresh_token"]
+    client.cookies.clear()
+
+    old_kid = jose_jwt.get_unverified_header(refresh_token)["kid"]
+    ring.rotate()
+    auth_jwt.token_cache.clear()
+    # A day later: well past the access token lifetime and JWT_KEY_GRACE_MINUTES
+    later = time.time() + 86400
+    monkeypatch.setattr("app.auth.keys.time.time", lambda: later)
+
+    refreshed = client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    client.cookies.clear()
+    assert refreshed.status_code == 200
+    assert jose_jwt.get_unverified_header(refreshed.json()["refresh_token"])["kid"] != old_kid
@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import Registry, timed
+
+client = TestClient(app)
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.labels("db").observe(value)
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{stage="db",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="db",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{stage="db",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="db"} 3' in text
+
+def test_callback_metric_and_label_escaping():
+    registry = Registry()
+    registry.callback("queue_depth", "Depth", lambda: {('a"b',): 3}, labelnames=("name",))
+    assert 'queue_depth{name="a\\"b"} 3' in registry.render()
+
+def test_metrics_endpoint_reports_routes_by_template_and_stages():
+    client.get("/health")
+    client.get("/auth/oauth/unknown")
+    with timed("unit_test_stage"):
+        pass
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = resp.text
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in body
+    assert 'route="/auth/oauth/{provider}",status="501"' in body
+    assert 'auth_stage_duration_seconds_count{stage="unit_test_stage"} 1' in body
+    assert "http_requests_in_flight" in body
+    assert "password_hash_queue_depth" in body
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import migrations
+from app.database import Base
+import app.models  # noqa: F401  register tables on Base.metadata
+
+def _schema(engine) -> dict:
+    inspector = inspect(engine)
+    return {
+        table: ({c["name"] for c in inspector.get_columns(table)}, {i["name"] for i in inspector.get_indexes(table)})
+        for table in inspector.get_table_names() if table != "schema_version"
+    }
+
+@pytest.fixture
+def engines(tmp_path):
+    path = tmp_path / "migrations.db"
+    sync, created = create_engine(f"sqlite:///{path}"), create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield sync, created
+    sync.dispose()
+    asyncio.run(created.dispose())
+
+def test_upgrade_builds_the_model_schema_once(engines, tmp_path):
+    engine, _ = engines
+    assert migrations.upgrade(engine) == [1, 2, 3, 4]
+    assert migrations.upgrade(engine) == []
+
+    reference = create_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+    Base.metadata.create_all(reference)
+    assert _schema(engine) == _schema(reference)
+
+def test_upgrade_adopts_a_database_created_by_create_all(engines):
+    engine, _ = engines
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        assert migrations.current_version(conn) == 0
+    assert migrations.upgrade(engine) == [1, 2, 3, 4]
+    with engine.connect() as conn:
+        assert migrations.current_version(conn) == migrations.HEAD
+
+def test_verify_requires_head(engines):
+    engine, async_engine = engines
+    migrations.upgrade(engine, target=1)
+    with pytest.raises(migrations.SchemaVersionMismatch):
+        asyncio.run(migrations.verify_async(async_engine))
+    migrations.upgrade(engine)
+    assert asyncio.run(migrations.verify_async(async_engine)) == migrations.HEAD
+
+def test_read_flags_become_member_read_positions(engines):
+    engine, _ = engines
+    migrations.upgrade(engine, target=1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO chat_rooms (id, is_group) VALUES (1, 1)"))
+        conn.execute(text("INSERT INTO chat_room_users (user_id, chat_room_id) VALUES (1, 1), (2, 1)"))
+        conn.execute(text(
+            "INSERT INTO messages (id, sender_id, chat_room_id, content, read) "
+            "VALUES (1, 1, 1, 'a', 1), (2, 1, 1, 'b', 1), (3, 1, 1, 'c', 0)"
+        ))
+    assert migrations.upgrade(engine) == [2, 3, 4]
+    with engine.connect() as conn:
+        positions = conn.execute(text("SELECT user_id, last_read_message_id FROM chat_room_users")).all()
+        assert sorted(positions) == [(1, 2), (2, 2)]
+        assert "read" not in {c["name"] for c in inspect(conn).get_columns("messages")}
+
+class _RecordingPostgres:
+    """Stands in for a PostgreSQL connection: records SQL, answers the catalog queries"""
+    dialect = type("Dialect", (), {"name": "postgresql"})
+
+    def __init__(self, relkind, days=()):
+        self.relkind, self.days, self.statements = relkind, list(days), []
+
+    def execute(self, statement):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        result = type("Result", (), {})()
+        result.scalar = lambda: self.relkind if "pg_class" in sql else None
+        result.scalars = lambda: type("Scalars", (), {"all": lambda _: self.days if "DISTINCT" in sql else []})()
+        return result
+
+def test_postgres_plain_auth_events_is_converted_to_partitions():
+    from datetime import date
+    from app.migrations import m0003_auth_events
+
+    conn = _RecordingPostgres("r", days=[date(2026, 10, 17)])
+    m0003_auth_events.upgrade(conn)
+    sql = "\n".join(conn.statements)
+    assert "ALTER TABLE auth_events RENAME TO auth_events_unpartitioned" in sql
+    assert "PARTITION BY RANGE (created_at)" in sql
+    assert "CREATE TABLE IF NOT EXISTS auth_events_20261017 PARTITION OF auth_events" in sql
+    assert sql.index("INSERT INTO auth_events SELECT") < sql.index("DROP TABLE auth_events_unpartitioned")
+
+    partitioned = _RecordingPostgres("p")
+    m0003_auth_events.upgrade(partitioned)
+    assert not any("RENAME" in s or "DROP" in s for s in partitioned.statements)
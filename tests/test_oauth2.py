@@ -0,0 +1,120 @@
+import asyncio
+import time
+import httpx
+import pytest
+from authlib.jose import JsonWebKey, jwt
+from authlib.jose.errors import InvalidClaimError
+
+from app.auth.oauth2 import OAuthProvider, OAuthRegistry
+
+ISSUER = "https://idp.test"
+
+class FakeOAuthServer:
+    """Minimal OpenID provider served through httpx.MockTransport"""
+
+    def __init__(self):
+        self.key = JsonWebKey.generate_key("RSA", 2048, is_private=True, options={"kid": "k1"})
+        self.hits = {}
+
+    def id_token(self, email):
+        now = int(time.time())
+        claims = {"iss": ISSUER, "aud": "client-id", "sub": "123", "email": email, "iat": now, "exp": now + 300}
+        return jwt.encode({"alg": "RS256", "kid": "k1"}, claims, self.key).decode()
+
+    def handler(self, request: httpx.Request):
+        path = request.url.path
+        self.hits[path] = self.hits.get(path, 0) + 1
+        if path == "/.well-known/openid-configuration":
+            return httpx.Response(200, json={
+                "issuer": ISSUER,
+                "authorization_endpoint": f"{ISSUER}/authorize",
+                "token_endpoint": f"{ISSUER}/token",
+                "userinfo_endpoint": f"{ISSUER}/userinfo",
+                "jwks_uri": f"{ISSUER}/jwks",
+            }, headers={"Cache-Control": "public, max-age=600"})
+        if path == "/jwks":
+            return httpx.Response(200, json={"keys": [self.key.as_dict(is_private=False)]})
+        if path == "/token":
+            return httpx.Response(200, json={
+                "access_token": "at", "token_type": "Bearer", "expires_in": 3600,
+                "id_token": self.id_token("oauth-user@example.com"),
+            })
+        return httpx.Response(404)
+
+@pytest.fixture
+def server():
+    return FakeOAuthServer()
+
+def make_provider(server):
+    return OAuthProvider(
+        "fake", client_id="client-id", client_secret="secret", redirect_uri="https://app.test/cb",
+        discovery_url=f"{ISSUER}/.well-known/openid-configuration",
+        transport=httpx.MockTransport(server.handler),
+    )
+
+def test_login_flow_validates_id_token_locally(server):
+    async def flow():
+        provider = make_provider(server)
+        try:
+            url = await provider.get_authorize_url(state="abc")
+            token = await provider.get_access_token("code")
+            info = await provider.get_user_info(token)
+            await provider.get_authorize_url(state="def")
+            return url, info, provider.client.token
+        finally:
+            await provider.aclose()
+
+    url, info, stored_token = asyncio.run(flow())
+    assert url.startswith(f"{ISSUER}/authorize") and "state=abc" in url
+    assert info["email"] == "oauth-user@example.com"
+    assert stored_token is None
+    assert server.hits["/.well-known/openid-configuration"] == 1
+    assert "/userinfo" not in server.hits
+
+def test_id_token_for_other_audience_is_rejected(server):
+    now = int(time.time())
+    forged = jwt.encode(
+        {"alg": "RS256", "kid": "k1"},
+        {"iss": ISSUER, "aud": "someone-else", "sub": "1", "iat": now, "exp": now + 300},
+        server.key,
+    ).decode()
+
+    async def flow():
+        provider = make_provider(server)
+        try:
+            await provider.validate_id_token(forged)
+        finally:
+            await provider.aclose()
+
+    with pytest.raises(InvalidClaimError) as excinfo:
+        asyncio.run(flow())
+    assert excinfo.value.description == 'Invalid claim "aud"'
+
+def test_registry_reuses_one_client_per_provider():
+    registry = OAuthRegistry()
+    assert registry.get("google") is registry.get("google")
+    with pytest.raises(NotImplementedError):
+        registry.get("unknown")
+    asyncio.run(registry.aclose())
+
+def test_oauth_endpoints_set_state_and_session_cookies(server):
+    from fastapi.testclient import TestClient
+    from app.auth.oauth2 import oauth_registry
+    from app.main import app
+
+    client = TestClient(app)
+    oauth_registry.register(make_provider(server))
+    try:
+        start = client.get("/auth/oauth/fake")
+        assert start.status_code == 200
+        state = start.cookies["oauth_state"]
+        assert f"state={state}" in start.json()["auth_url"]
+
+        callback = client.get("/auth/oauth/fake/callback", params={"code": "code", "state": state})
+        assert callback.status_code == 200
+        set_cookies = callback.headers.get_list("set-cookie")
+        assert any(c.startswith("access_token=") for c in set_cookies)
+        assert any(c.startswith("refresh_token=") and "Max-Age=" in c for c in set_cookies)
+        assert any(c.startswith('oauth_state=""; Max-Age=0') for c in set_cookies)
+    finally:
+        oauth_registry._providers.pop("fake", None)
@@ -0,0 +1,49 @@
+import pytest
+from fastapi import HTTPException
+
+from app.auth import password
+from app.auth.hashing import build_password_context
+from app.crud.users import create_user_async, get_user_by_email_async, update_password_hash_async
+from app.schemas import UserCreate
+from benchmarks.calibrate import calibrate
+from tests.conftest import run
+
+def test_outdated_cost_or_scheme_needs_update():
+    old = build_password_context("bcrypt", bcrypt_rounds=4).hash("secret")
+    assert not build_password_context("bcrypt", bcrypt_rounds=4).needs_update(old)
+    assert build_password_context("bcrypt", bcrypt_rounds=5).needs_update(old)
+    legacy = build_password_context("sha256_crypt").hash("secret")
+    assert build_password_context("bcrypt,sha256_crypt", bcrypt_rounds=4).needs_update(legacy)
+
+def test_placeholder_hash_never_verifies():
+    assert password.verify_and_update_password("oauth_user", "oauth_user") == (False, None)
+
+def test_login_upgrades_outdated_hash_in_background(monkeypatch):
+    old_hash = build_password_context("bcrypt", bcrypt_rounds=4).hash("password123")
+    user_in = UserCreate(email="rehash@example.com", password="password123", full_name="Rehash")
+    run(lambda db: create_user_async(db, user_in, old_hash))
+    monkeypatch.setattr(password, "pwd_context", build_password_context("bcrypt", bcrypt_rounds=5))
+
+    async def login(db):
+        user = await password.authenticate_user(db, "rehash@example.com", "password123")
+        await password.drain_rehashes()
+        return user
+    assert run(login).email == "rehash@example.com"
+
+    stored = run(lambda db: get_user_by_email_async(db, "rehash@example.com")).hashed_password
+    assert stored.startswith("$2b$05$")
+    # The upgraded hash still logs in, and wrong passwords are still rejected
+    run(lambda db: password.authenticate_user(db, "rehash@example.com", "password123"))
+    with pytest.raises(HTTPException):
+        run(lambda db: password.authenticate_user(db, "rehash@example.com", "wrong"))
+
+def test_rehash_does_not_overwrite_a_changed_password():
+    user_in = UserCreate(email="changed@example.com", password="password123", full_name="Changed")
+    user = run(lambda db: create_user_async(db, user_in, "current-hash"))
+    assert not run(lambda db: update_password_hash_async(db, user.id, "stale-hash", "upgraded"))
+    assert run(lambda db: get_user_by_email_async(db, "changed@example.com")).hashed_password == "current-hash"
+
+def test_calibrate_picks_minimum_cost_for_tiny_budget():
+    cost, elapsed = calibrate("bcrypt", target_ms=0.001, samples=1)
+    assert cost == 4
+    assert elapsed > 0
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+
+from app.auth.jwt import create_access_token
+from app.crud.users import create_or_update_user_async, get_cached_user_by_email, get_user_by_email_async
+from app.database import AsyncSessionLocal
+from app.main import app
+from app.presence import PresenceTracker, presence
+
+client = TestClient(app)
+
+def run(coro_fn):
+    async def wrapper():
+        async with AsyncSessionLocal() as db:
+            return await coro_fn(db)
+    return asyncio.run(wrapper())
+
+def test_online_users_expire_after_ttl():
+    tracker = PresenceTracker(online_ttl=60)
+    tracker.touch("a@example.com", now=1000)
+    tracker.touch("b@example.com", now=1030)
+    assert tracker.online(now=1050) == ["b@example.com", "a@example.com"]
+    assert tracker.online(now=1070) == ["b@example.com"]
+    assert not tracker.is_online("a@example.com", now=1070)
+
+def test_flush_coalesces_activity_and_marks_idle_users_offline():
+    for email in ("presence1@example.com", "presence2@example.com"):
+        run(lambda db: create_or_update_user_async(db, email))
+    tracker = PresenceTracker(online_ttl=60)
+    for now in (1000, 1005, 1010):
+        tracker.touch("presence1@example.com", now=now)
+    tracker.touch("presence2@example.com", now=1040)
+    assert tracker.pending == 2
+
+    asyncio.run(tracker.flush(AsyncSessionLocal, now=1050))
+    assert tracker.pending == 0
+    user = run(lambda db: get_user_by_email_async(db, "presence1@example.com"))
+    assert user.is_online
+    # SQLite hands back naive UTC datetimes
+    assert user.last_seen.replace(tzinfo=timezone.utc) == datetime.fromtimestamp(1010, timezone.utc)
+
+    asyncio.run(tracker.flush(AsyncSessionLocal, now=1080))
+    assert not run(lambda db: get_user_by_email_async(db, "presence1@example.com")).is_online
+    assert run(lambda db: get_user_by_email_async(db, "presence2@example.com")).is_online
+    assert tracker.rows_written == 3
+
+def test_authenticated_requests_record_presence():
+    run(lambda db: create_or_update_user_async(db, "presenceapi@example.com"))
+    token = create_access_token({"sub": "presenceapi@example.com"})
+    client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert presence.is_online("presenceapi@example.com")
+    resp = client.get("/users/online", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200
+    # Usernames only: the list is visible to every account holder
+    assert "presenceapi" in resp.json()["users"]
+    assert not any("@" in user for user in resp.json()["users"])
+
+def test_flush_invalidates_cached_profiles():
+    email = "presencecache@example.com"
+    run(lambda db: create_or_update_user_async(db, email))
+    assert not run(lambda db: get_cached_user_by_email(db, email)).is_online
+    tracker = PresenceTracker(online_ttl=60)
+    tracker.touch(email)
+    asyncio.run(tracker.flush(AsyncSessionLocal))
+    assert run(lambda db: get_cached_user_by_email(db, email)).is_online
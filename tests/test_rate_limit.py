@@ -0,0 +1,148 @@
+import asyncio
+import pytest
+from fastapi import HTTPException, Request
+from fastapi.testclient import TestClient
+
+from app.auth import rate_limit
+from app.auth.rate_limit import (
+    InMemoryRateLimitBackend,
+    KeyValueRateLimitBackend,
+    RateLimiter,
+)
+from app.main import app
+
+client = TestClient(app)
+
+class FakeCounterClient:
+    """Stands in for a shared redis-style client"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    async def incr(self, key):
+        self.data[key] = self.data.get(key, 0) + 1
+        return self.data[key]
+
+    async def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+    async def get(self, key):
+        value = self.data.get(key)
+        return None if value is None else str(value).encode()
+
+class BrokenClient:
+    async def incr(self, key):
+        raise ConnectionError("down")
+
+@pytest.fixture(params=["memory", "shared"])
+def limiter(request, monkeypatch):
+    if request.param == "memory":
+        backend = InMemoryRateLimitBackend(shards=4)
+    else:
+        backend = KeyValueRateLimitBackend(FakeCounterClient())
+    limiter = RateLimiter(backend)
+    monkeypatch.setattr(rate_limit, "rate_limiter", limiter)
+    return limiter
+
+@pytest.fixture
+def frozen_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    return now
+
+def test_rejects_once_limit_is_spent(limiter, frozen_time):
+    rules = [("login_ip", "1.2.3.4", "3/60")]
+    for _ in range(3):
+        asyncio.run(limiter.check(rules))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(limiter.check(rules))
+    assert exc.value.status_code == 429
+    # 1000 % 60 == 40, so the window rolls over in 20 seconds
+    assert exc.value.headers["Retry-After"] == "20"
+    # Other keys keep their own budget
+    asyncio.run(limiter.check([("login_ip", "5.6.7.8", "3/60")]))
+
+def test_previous_window_is_weighted(limiter, frozen_time):
+    rules = [("login_email", "a@example.com", "4/60")]
+    for _ in range(4):
+        asyncio.run(limiter.check(rules))
+    # Half way into the next window half of the old hits still count
+    frozen_time[0] = 1050.0
+    asyncio.run(limiter.check(rules))
+    asyncio.run(limiter.check(rules))
+    with pytest.raises(HTTPException):
+        asyncio.run(limiter.check(rules))
+
+def test_backend_failure_fails_open():
+    limiter = RateLimiter(KeyValueRateLimitBackend(BrokenClient()))
+    for _ in range(5):
+        asyncio.run(limiter.check([("login_ip", "1.2.3.4", "1/60")]))
+
+def test_memory_backend_evicts_expired_and_overflowing_keys(monkeypatch):
+    backend = InMemoryRateLimitBackend(shards=1, max_keys_per_shard=3)
+    clock = [0.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    for key in ("a", "b", "c", "d"):
+        asyncio.run(backend.incr(key, ttl=10))
+    assert len(backend) == 3
+    assert asyncio.run(backend.get("a")) == 0
+    clock[0] = 11.0
+    asyncio.run(backend.incr("e", ttl=10))
+    assert len(backend) == 1
+
+def test_memory_backend_sweeps_by_expiry_across_windows(monkeypatch):
+    backend = InMemoryRateLimitBackend(shards=1, max_keys_per_shard=3, sweep_interval=0)
+    clock = [0.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    asyncio.run(backend.incr("long", ttl=600))
+    asyncio.run(backend.incr("short", ttl=60))
+    clock[0] = 61.0
+    asyncio.run(backend.incr("new", ttl=60))
+    # The expired counter went even though it was inserted after a live one
+    assert len(backend) == 2
+    assert asyncio.run(backend.get("long")) == 1
+
+    asyncio.run(backend.incr("mid", ttl=300))
+    asyncio.run(backend.incr("newest", ttl=600))
+    # Full: the live counter closest to expiring is dropped, not the oldest key
+    assert asyncio.run(backend.get("new")) == 0
+    assert asyncio.run(backend.get("long")) == 1
+
+def test_client_ip_ignores_client_supplied_forwarded_entries(monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "TRUST_FORWARDED_FOR", True)
+
+    def ip(forwarded):
+        headers = [(b"x-forwarded-for", forwarded.encode())]
+        return rate_limit.client_ip(Request({"type": "http", "headers": headers, "client": ("10.0.0.1", 1)}))
+
+    assert ip("6.6.6.6, 203.0.113.7") == "203.0.113.7"
+    monkeypatch.setattr(rate_limit.settings, "TRUSTED_PROXY_HOPS", 2)
+    assert ip("6.6.6.6, 203.0.113.7, 10.0.0.2") == "203.0.113.7"
+    assert ip("203.0.113.7") == "203.0.113.7"
+
+def test_login_is_throttled_before_touching_the_database(monkeypatch):
+    limiter = RateLimiter(InMemoryRateLimitBackend())
+    monkeypatch.setattr(rate_limit, "rate_limiter", limiter)
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_LOGIN_IP_EMAIL", "2/60")
+    calls = []
+
+    async def fake_authenticate(db, email, password):
+        calls.append(email)
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    monkeypatch.setattr("app.main.authenticate_user", fake_authenticate)
+    form = {"username": "victim@example.com", "password": "guess"}
+    assert client.post("/auth/login", data=form).status_code == 401
+    assert client.post("/auth/login", data=form).status_code == 401
+    resp = client.post("/auth/login", data=form)
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert len(calls) == 2
+
+def test_register_is_throttled_per_ip(monkeypatch):
+    monkeypatch.setattr(rate_limit, "rate_limiter", RateLimiter(InMemoryRateLimitBackend()))
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_REGISTER_IP", "1/600")
+    data = {"email": "ratelimit@example.com", "password": "password123", "full_name": "Rate Limit"}
+    assert client.post("/auth/register", json=data).status_code == 200
+    assert client.post("/auth/register", json=data).status_code == 429
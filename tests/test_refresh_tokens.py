@@ -0,0 +1,77 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+
+from app.auth.revocation import RevocationStore
+from app.database import AsyncSessionLocal
+from app.main import app
+
+client = TestClient(app)
+
+def register(email):
+    client.cookies.clear()
+    resp = client.post("/auth/register", json={"email": email, "password": "password123"})
+    assert resp.status_code == 200
+    client.cookies.clear()
+    return resp.json()
+
+def test_refresh_rotates_and_reuse_revokes_the_family():
+    tokens = register("refresh@example.com")
+    assert tokens["refresh_token"]
+
+    rotated = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert rotated.status_code == 200
+    new_tokens = rotated.json()
+    assert new_tokens["refresh_token"] != tokens["refresh_token"]
+
+    replay = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert replay.status_code == 401
+    assert replay.json()["detail"] == "Refresh token reuse detected"
+
+    # The whole family is dead: the rotated refresh token and its access token
+    assert client.post("/auth/refresh", json={"refresh_token": new_tokens["refresh_token"]}).status_code == 401
+    me = client.get("/users/me", headers={"Authorization": f"Bearer {new_tokens['access_token']}"})
+    assert me.status_code == 403
+
+def test_access_token_is_not_accepted_as_refresh_token():
+    tokens = register("refresh-type@example.com")
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["access_token"]}).status_code == 401
+
+def test_logout_revokes_access_token():
+    tokens = register("logout@example.com")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/users/me", headers=headers).status_code == 200
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    assert client.get("/users/me", headers=headers).status_code == 403
+
+def test_bearer_logout_also_ends_the_refresh_family():
+    tokens = register("logout-family@example.com")
+    client.post("/auth/logout", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+def test_concurrent_revocations_of_one_id_do_not_conflict():
+    store = RevocationStore()
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+    async def revoke():
+        async with AsyncSessionLocal() as db:
+            await store.revoke(db, "revoked-twice", expires_at)
+
+    async def both():
+        await asyncio.gather(revoke(), revoke())
+        await revoke()
+    asyncio.run(both())
+    assert store.is_revoked({"jti": "revoked-twice"})
+
+def test_store_syncs_from_database_and_compacts():
+    tokens = register("sync@example.com")
+    client.post("/auth/logout", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+
+    store = RevocationStore()
+    asyncio.run(store.sync(AsyncSessionLocal))
+    assert len(store) >= 1
+
+    store.add("stale", time.time() - 1)
+    assert store.compact() == 1
+    assert not store.is_revoked({"jti": "stale"})
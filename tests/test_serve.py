@@ -0,0 +1,46 @@
+import asyncio
+import time
+import pytest
+
+from app.auth.revocation import RevocationStore
+from app.database import AsyncSessionLocal
+from app.serve import pool_share, worker_count
+from app.shared_state import SharedSnapshot
+
+@pytest.fixture
+def shared():
+    snapshot = SharedSnapshot.create(4096)
+    yield snapshot
+    snapshot.close()
+
+def test_pool_budget_is_split_across_workers():
+    assert pool_share(15, 1) == (5, 10)
+    assert pool_share(40, 4) == (3, 7)
+    assert pool_share(2, 8) == (1, 0)
+    assert worker_count(3) == 3
+    assert worker_count(0) >= 1
+
+def test_snapshot_is_visible_to_other_handles(shared):
+    other = SharedSnapshot.attach(shared.path)
+    try:
+        assert other.read() is None
+        assert shared.write({"a": 1})
+        assert other.read() == {"a": 1}
+        assert other.write({"a": 2}) and shared.read() == {"a": 2}
+        assert not shared.write({"big": "x" * 5000})
+        assert other.read() == {"a": 2}
+    finally:
+        other.close()
+
+def test_workers_adopt_a_fresh_shared_revocation_set(shared):
+    async def scenario():
+        syncing = RevocationStore(sync_interval=60, shared=shared)
+        await syncing.sync(AsyncSessionLocal)
+        syncing.add("revoked-jti", time.time() + 600)
+        syncing.publish_shared()
+
+        # Adopting a snapshot synced within the interval needs no query
+        adopting = RevocationStore(sync_interval=60, shared=shared)
+        return adopting.adopt_shared(), adopting.is_revoked({"jti": "revoked-jti"})
+
+    assert asyncio.run(scenario()) == (True, True)
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+from app.startup import ImportProfiler, StartupReport
+
+def test_import_profiler_times_each_module_without_its_imports(tmp_path, monkeypatch):
+    (tmp_path / "slow_child.py").write_text("import time\ntime.sleep(0.05)\n")
+    (tmp_path / "slow_parent.py").write_text("import slow_child\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    profiler = ImportProfiler()
+    profiler.install()
+    try:
+        import slow_parent
+    finally:
+        profiler.uninstall()
+        sys.modules.pop("slow_parent", None)
+        sys.modules.pop("slow_child", None)
+    assert profiler.timings["slow_child"] >= 0.05
+    assert profiler.timings["slow_parent"] < 0.05
+    assert profiler.slowest(1)[0]["module"] == "slow_child"
+    assert type(slow_parent.__loader__).__name__ == "SourceFileLoader"
+
+def test_report_marks_ready_once_with_stage_timings():
+    report = StartupReport()
+    with report.stage("schema"):
+        pass
+    assert report.to_dict()["seconds_to_ready"] is None
+    report.mark_ready(budget=60)
+    first = report.seconds_to_ready
+    report.mark_ready()
+    assert report.seconds_to_ready == first
+    assert set(report.to_dict()["stages_ms"]) == {"schema"}
+
+def test_importing_the_app_defers_oauth_clients_and_engines():
+    code = (
+        "import sys, app.main, app.database as db;"
+        "print(any(m.split('.')[0] in ('authlib', 'httpx') for m in sys.modules), db._async_engine is None)"
+    )
+    env = {**os.environ, "STARTUP_PROFILE_IMPORTS": "1"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    assert result.stdout.split() == ["False", "True"]
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.auth import security
+from app.auth.security import SeenNonces, generate_state_token, verify_csrf_token, verify_state_token
+
+def _request(cookie: str = None, header: str = None) -> Request:
+    headers = []
+    if cookie is not None:
+        headers.append((b"cookie", f"csrf_token={cookie}".encode()))
+    if header is not None:
+        headers.append((b"x-csrf-token", header.encode()))
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers})
+
+def test_state_tokens_are_compact_and_signed():
+    token = generate_state_token()
+    assert len(token) < 60
+    assert verify_state_token(token)
+    nonce, issued, mac = token.split(".")
+    assert not verify_state_token(f"{nonce}.{issued}.{'A' * len(mac)}")
+    assert not verify_state_token(f"{nonce}x.{issued}.{mac}")
+    assert not verify_state_token("garbage")
+    assert not verify_state_token("ünïcode.1.x")
+
+def test_state_tokens_expire(monkeypatch):
+    token = generate_state_token()
+    now = security.time.time()
+    monkeypatch.setattr(security.time, "time", lambda: now + 301)
+    assert not verify_state_token(token, max_age=300)
+    assert verify_state_token(token, max_age=600)
+
+def test_consumed_state_tokens_cannot_be_replayed():
+    token = generate_state_token()
+    assert verify_state_token(token, consume=True)
+    assert not verify_state_token(token, consume=True)
+    assert verify_state_token(generate_state_token(), consume=True)
+
+def test_seen_nonces_forget_expired_entries_and_stay_bounded():
+    seen = SeenNonces(max_size=2)
+    assert seen.add("a", expires_at=10, now=0)
+    assert not seen.add("a", expires_at=10, now=5)
+    assert seen.add("b", expires_at=20, now=5)
+    assert seen.add("c", expires_at=30, now=11)  # "a" expired
+    assert len(seen) == 2
+
+def test_csrf_requires_the_header_to_echo_the_cookie():
+    token = generate_state_token()
+    verify_csrf_token(_request(token, token))
+    for cookie, header in ((token, None), (None, token), (token, generate_state_token()), ("forged", "forged")):
+        with pytest.raises(HTTPException):
+            verify_csrf_token(_request(cookie, header))
+
+def test_empty_state_secret_is_refused(monkeypatch):
+    from app.main import on_startup
+    monkeypatch.setattr(security.settings, "STATE_SECRET", "")
+    for sign in (generate_state_token, lambda: verify_state_token("nonce.1.mac")):
+        with pytest.raises(RuntimeError):
+            sign()
+    with pytest.raises(RuntimeError, match="STATE_SECRET"):
+        asyncio.run(on_startup())
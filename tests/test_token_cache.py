@@ -0,0 +1,46 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth.jwt import create_access_token, token_cache, verify_token
+from app.cache import TTLCache
+from app.main import app
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    token_cache.clear()
+    token_cache.hits = token_cache.misses = 0
+
+def test_ttl_cache_expires_and_evicts_lru():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1, expires_at=time.time() - 1)
+    assert cache.get("a") is None
+    cache.set("b", 2)
+    cache.set("c", 3)
+    cache.get("b")
+    cache.set("d", 4)
+    assert cache.get("c") is None
+    assert cache.get("b") == 2
+    assert cache.evictions == 1
+
+def test_verify_token_is_served_from_cache():
+    token = create_access_token({"sub": "cached@example.com"})
+    assert verify_token(token)["sub"] == "cached@example.com"
+    assert verify_token(token)["sub"] == "cached@example.com"
+    assert token_cache.stats()["hits"] == 1
+    assert token_cache.stats()["misses"] == 1
+
+def test_invalid_token_is_not_cached():
+    with pytest.raises(ValueError):
+        verify_token("not-a-jwt")
+    assert len(token_cache) == 0
+
+def test_jwt_bearer_and_route_share_one_verification():
+    token = create_access_token({"sub": "nobody@example.com"})
+    client.cookies.set("access_token", token)
+    resp = client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+    client.cookies.clear()
+    assert resp.status_code == 404
+    assert token_cache.stats()["misses"] == 1
@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+
+from app.crud.user_cache import (
+    NOT_CACHED,
+    InMemoryUserCacheBackend,
+    KeyValueUserCacheBackend,
+    UserCache,
+    UserSnapshot,
+)
+from app.crud import users as crud
+from app.database import AsyncSessionLocal
+from app.schemas import UserCreate, UserUpdate
+
+class FakeKeyValueClient:
+    """Stands in for a shared redis-style client"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+@pytest.fixture(params=["memory", "shared"])
+def cache(request, monkeypatch):
+    if request.param == "memory":
+        cache = UserCache(InMemoryUserCacheBackend())
+    else:
+        cache = UserCache(KeyValueUserCacheBackend(FakeKeyValueClient()))
+    monkeypatch.setattr(crud, "user_cache", cache)
+    cache.prefix = request.param
+    return cache
+
+def run(coro_fn):
+    async def wrapper():
+        async with AsyncSessionLocal() as db:
+            return await coro_fn(db)
+    return asyncio.run(wrapper())
+
+def test_read_through_caches_snapshot_and_invalidates_on_update(cache):
+    email = f"{cache.prefix}-cache@example.com"
+    user_in = UserCreate(email=email, password="password123", full_name="Before")
+    run(lambda db: crud.create_user_async(db, user_in, "hashed"))
+
+    first = run(lambda db: crud.get_cached_user_by_email(db, email))
+    second = run(lambda db: crud.get_cached_user_by_email(db, email))
+    assert isinstance(first, UserSnapshot)
+    assert second == first
+    assert not hasattr(first, "hashed_password")
+    assert cache.stats()["hits"] == 1
+
+    run(lambda db: crud.update_user_profile_async(db, email, UserUpdate(full_name="After")))
+    updated = run(lambda db: crud.get_cached_user_by_email(db, email))
+    assert updated.full_name == "After"
+
+def test_unknown_email_is_negatively_cached_until_created(cache):
+    email = f"{cache.prefix}-ghost@example.com"
+    assert run(lambda db: crud.get_cached_user_by_email(db, email)) is None
+    assert asyncio.run(cache.get(email)) is None
+    assert cache.stats()["negative_hits"] == 1
+
+    run(lambda db: crud.create_or_update_user_async(db, email))
+    assert asyncio.run(cache.get(email)) is NOT_CACHED
+    assert run(lambda db: crud.get_cached_user_by_email(db, email)).email == email
@@ -0,0 +1,62 @@
+import asyncio
+
+from app.crud.users import (
+    create_or_update_user_async,
+    create_user_async,
+    get_user_by_email_async,
+)
+from app.database import AsyncSessionLocal
+from app.schemas import UserCreate
+from tests.conftest import run
+
+def test_create_and_fetch_user_async():
+    user_in = UserCreate(email="crud@example.com", password="password123", full_name="Crud User")
+    created = run(lambda db: create_user_async(db, user_in, "hashed"))
+    assert created.id is not None
+    assert created.username == "crud"
+
+    fetched = run(lambda db: get_user_by_email_async(db, "crud@example.com"))
+    assert fetched.id == created.id
+    assert run(lambda db: get_user_by_email_async(db, "missing@example.com")) is None
+
+def test_create_or_update_user_async_is_idempotent():
+    first = run(lambda db: create_or_update_user_async(db, "oauth@example.com"))
+    second = run(lambda db: create_or_update_user_async(db, "oauth@example.com"))
+    assert first.id == second.id
+
+def test_oauth_upsert_resolves_username_collisions():
+    first = run(lambda db: create_or_update_user_async(db, "collide@one.example.com", full_name="One"))
+    second = run(lambda db: create_or_update_user_async(db, "collide@two.example.com"))
+    assert first.username == "collide"
+    assert second.username.startswith("collide-") and len(second.username) == len("collide-") + 8
+    # Deterministic, and a repeat login keeps the row and fills in missing profile fields
+    again = run(lambda db: create_or_update_user_async(db, "collide@two.example.com", full_name="Two", profile_picture="p.png"))
+    assert again.id == second.id
+    assert again.username == second.username
+    assert (again.full_name, again.profile_picture) == ("Two", "p.png")
+    kept = run(lambda db: create_or_update_user_async(db, "collide@one.example.com", full_name="Renamed"))
+    assert kept.full_name == "One"
+
+def test_concurrent_first_oauth_logins_share_one_row():
+    async def login():
+        async with AsyncSessionLocal() as db:
+            return await create_or_update_user_async(db, "race@example.com")
+
+    async def both():
+        return await asyncio.gather(login(), login())
+    first, second = asyncio.run(both())
+    assert first.id == second.id
+
+def test_oauth_provisioning_fallback_without_upsert(monkeypatch):
+    from app.crud import users
+    monkeypatch.setattr(users, "_supports_upsert_returning", lambda dialect: False)
+    run(lambda db: create_or_update_user_async(db, "fallback@one.example.com"))
+    user = run(lambda db: create_or_update_user_async(db, "fallback@two.example.com"))
+    assert user.username.startswith("fallback-")
+    assert run(lambda db: create_or_update_user_async(db, "fallback@two.example.com")).id == user.id
+
+def test_password_users_sharing_a_local_part_get_distinct_usernames():
+    first = run(lambda db: create_user_async(db, UserCreate(email="alice@a.example.com", password="password123"), "hashed"))
+    second = run(lambda db: create_user_async(db, UserCreate(email="alice@b.example.com", password="password123"), "hashed"))
+    assert first.username == "alice"
+    assert second.username.startswith("alice-")